@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
+import io
+import os
+import tarfile
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional
+
+from cachito.common.paths import RequestBundleDir
+
+__all__ = ["BundleArchiveStream"]
+
+COMPRESS_LEVEL = 6
+READ_SIZE = 64 * 1024
+CHUNK_SIZE = 256 * 1024
+
+
+class BundleArchiveStream:
+    """
+    Generate the gzipped bundle archive of a request from its temporary bundle directory.
+
+    The archive has the same layout as the one created by the workers, but it is never written
+    to disk. The output only depends on the names, modes and contents of the files: the gzip
+    header has no timestamp, the members are sorted, and they have no modification time and no
+    ownership. This allows the workers to compute the sha256 digest of the archive beforehand, so
+    that it is sent with every download.
+
+    :param RequestBundleDir bundle_dir: the bundle directory of the request
+    :param bool include_git_dir: if False, the .git directories of the source are excluded
+    """
+
+    def __init__(self, bundle_dir: RequestBundleDir, include_git_dir: bool = False):
+        """Initialize the stream."""
+        self.bundle_dir = bundle_dir
+        self.include_git_dir = include_git_dir
+        self.hexdigest: Optional[str] = None
+        # Only used to create the TarInfo objects and to keep track of the hardlinks
+        self._tar = tarfile.open(fileobj=io.BytesIO(), mode="w")
+        self._compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+        self._hasher = hashlib.sha256()
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        """
+        Generate the chunks of the gzipped bundle archive.
+
+        The ``hexdigest`` attribute is set once the whole archive has been generated.
+
+        :raises OSError: if a file changes or cannot be read while generating the archive
+        """
+        for item in sorted(self.bundle_dir.source_dir.iterdir()):
+            yield from self._add(item, os.path.join("app", item.name), is_source=True)
+        yield from self._add(self.bundle_dir.deps_dir, "deps")
+
+        # End of archive marker, padded to a full record like tarfile does
+        self._write(tarfile.NUL * (tarfile.BLOCKSIZE * 2))
+        remainder = self._offset % tarfile.RECORDSIZE
+        if remainder:
+            self._write(tarfile.NUL * (tarfile.RECORDSIZE - remainder))
+        self._buffer += self._compressor.flush()
+        yield from self._flush(force=True)
+        self.hexdigest = self._hasher.hexdigest()
+
+    def _add(self, path: Path, arcname: str, is_source: bool = False) -> Iterator[bytes]:
+        if is_source and not self.include_git_dir and path.name == ".git":
+            return
+
+        tarinfo = self._tar.gettarinfo(str(path), arcname)
+        if tarinfo is None:
+            # Unsupported file type, e.g. a socket
+            return
+        tarinfo.mtime = 0
+        tarinfo.uid = tarinfo.gid = 0
+        tarinfo.uname = tarinfo.gname = ""
+        self._write(tarinfo.tobuf(self._tar.format, self._tar.encoding, self._tar.errors))
+
+        if tarinfo.isreg():
+            with open(path, "rb") as f:
+                remaining = tarinfo.size
+                while remaining:
+                    data = f.read(min(READ_SIZE, remaining))
+                    if not data:
+                        raise OSError(f"The file {path} was truncated while being archived")
+                    self._write(data)
+                    remaining -= len(data)
+                    yield from self._flush()
+            remainder = tarinfo.size % tarfile.BLOCKSIZE
+            if remainder:
+                self._write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+        elif tarinfo.isdir():
+            yield from self._flush()
+            for child in sorted(path.iterdir()):
+                yield from self._add(child, os.path.join(arcname, child.name), is_source)
+
+    def _write(self, data: bytes) -> None:
+        self._buffer += self._compressor.compress(data)
+        self._offset += len(data)
+
+    def _flush(self, force: bool = False) -> Iterator[bytes]:
+        if self._buffer and (force or len(self._buffer) >= CHUNK_SIZE):
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            self._hasher.update(chunk)
+            yield chunk
@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import itertools
 import json
 import logging
 import os
@@ -10,6 +11,12 @@ from cachito.errors import InvalidRequestData
 
 log = logging.getLogger(__name__)
 
+# Version 2 of the packages file adds the deduplicated dependencies of all the packages
+PACKAGES_DATA_VERSION = 2
+# Version 3 stores each distinct dependency once, and the packages refer to their dependencies by
+# index. It can't be read by the releases which only know the previous versions.
+PACKAGES_DATA_INDEXED_VERSION = 3
+
 
 def _package_sort_key(package: Dict[str, Any]) -> Tuple[str, bool, str, Optional[str]]:
     """Return the sort key for sorting packages.
@@ -69,8 +76,13 @@ class PackagesData:
 
     def __init__(self) -> None:
         """Initialize an empty PackagesData instance."""
-        self._index: Set[Tuple[str, str, str]] = set()
+        # The index of the added packages is only built when a package is added
+        self._index: Optional[Set[Tuple[str, str, str]]] = set()
         self._packages: List[Dict[str, Any]] = []
+        # The deduplicated dependencies gathered so far, and the dependencies of the packages
+        # added since then. If None, the dependencies are gathered again from every package.
+        self._dependencies: Optional[List[Dict[str, Any]]] = None
+        self._pending_dependencies: List[List[Dict[str, Any]]] = []
 
     @property
     def packages(self) -> List[Dict[str, Any]]:
@@ -81,18 +93,30 @@ class PackagesData:
     def all_dependencies(self) -> List[Dict[str, Any]]:
         """Gather dependencies together from every package.
 
+        The result is kept until the packages are sorted, and only the dependencies
+        of the packages added since the last access are merged into it.
+
         :return: a list of sorted and deduplicated dependencies gathered from
             every package. If no package is added, an empty list will be returned.
         :rtype: list[dict[str, any]]
         """
-        return list(
-            unique_packages(
-                sorted(
-                    (dep for pkg in self._packages for dep in pkg["dependencies"]),
-                    key=_package_sort_key,
-                )
+        if self._dependencies is None:
+            self._dependencies = []
+            self._pending_dependencies = [pkg["dependencies"] for pkg in self._packages]
+
+        if self._pending_dependencies:
+            # The dependencies gathered so far come first, so the sort, which is stable, keeps the
+            # same duplicate as when sorting the dependencies of every package at once. The
+            # dependencies of a package are usually sorted already, and the sort merges such runs
+            # in linear time.
+            merged = sorted(
+                itertools.chain(self._dependencies, *self._pending_dependencies),
+                key=_package_sort_key,
             )
-        )
+            self._dependencies = list(unique_packages(merged))
+            self._pending_dependencies = []
+
+        return list(self._dependencies)
 
     def add_package(self, pkg_info: Dict[str, str], path: str, deps: List[Dict[str, Any]]) -> None:
         """Add a package with deps.
@@ -106,6 +130,8 @@ class PackagesData:
         :raises InvalidRequestData: if there is a package with same name, type and version
             has been added already.
         """
+        if self._index is None:
+            self._index = {(p["name"], p["type"], p["version"]) for p in self._packages}
         key = (pkg_info["name"], pkg_info["type"], pkg_info["version"])
         if key in self._index:
             raise InvalidRequestData(f"Duplicate package: {pkg_info!r}")
@@ -119,8 +145,12 @@ class PackagesData:
         if path != os.curdir:
             package["path"] = path
         self._packages.append(package)
+        if self._dependencies is not None:
+            self._pending_dependencies.append(deps)
 
-    def write_to_file(self, file_name: Union[str, Path]) -> None:
+    def write_to_file(
+        self, file_name: Union[str, Path], with_dependencies: bool = False, indexed: bool = False
+    ) -> None:
         """Write the added packages to a file as JSON data.
 
         It ensures that the packages and every package's dependencies are sorted
@@ -130,11 +160,61 @@ class PackagesData:
             When a relative path is used, it will be opened directly and depends on the
             ``os.curdir``.
         :type file_name: str or pathlib.Path
+        :param bool with_dependencies: if True, also write the deduplicated dependencies of all
+            the packages, so they don't have to be gathered again when the file is loaded
+        :param bool indexed: if True, along with ``with_dependencies``, write every distinct
+            dependency once and make the packages refer to their dependencies by index, which
+            keeps the file small
         """
         self.sort()
         log.debug("Write packages with dependencies into file %s.", file_name)
+        data: Dict[str, Any] = {"packages": self._packages}
+        if with_dependencies and indexed:
+            packages, dependencies = self._index_dependencies()
+            data = {
+                "version": PACKAGES_DATA_INDEXED_VERSION,
+                "packages": packages,
+                "dependencies": dependencies,
+            }
+        elif with_dependencies:
+            data = {
+                "version": PACKAGES_DATA_VERSION,
+                "packages": self._packages,
+                "dependencies": self.all_dependencies,
+            }
         with open(file_name, "w", encoding="utf-8") as f:
-            json.dump({"packages": self._packages}, f)
+            json.dump(data, f, separators=(",", ":"))
+
+    def _index_dependencies(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Replace the dependencies of the packages by their index in a table of dependencies.
+
+        The table holds each distinct dependency once, sorted like the dependencies of a package.
+        The dependencies which only differ in fields other than the sort key, such as the
+        replaced module of a Go dependency, are all kept, in the order they are first found,
+        so the first of each is the one kept by ``all_dependencies``.
+
+        :return: the packages referring to their dependencies by index, and the table
+        :rtype: tuple[list[dict[str, any]], list[dict[str, any]]]
+        """
+        distinct: Dict[str, Dict[str, Any]] = {}
+        keys_by_package = []
+        for package in self._packages:
+            keys = []
+            for dep in package["dependencies"]:
+                key = json.dumps(dep, sort_keys=True)
+                distinct.setdefault(key, dep)
+                keys.append(key)
+            keys_by_package.append(keys)
+
+        # The sort is stable, so the dependencies with the same sort key stay in the order they
+        # were first found
+        table = sorted(distinct.items(), key=lambda item: _package_sort_key(item[1]))
+        indexes = {key: i for i, (key, _) in enumerate(table)}
+        packages = [
+            {**package, "dependencies": [indexes[key] for key in keys]}
+            for package, keys in zip(self._packages, keys_by_package)
+        ]
+        return packages, [dep for _, dep in table]
 
     def _clear_nfs_cache(self, file_name: Union[str, Path]) -> None:
         """
@@ -175,6 +255,22 @@ class PackagesData:
 
             log.info("Loaded file %s, found %i packages.", file_name, len(packages))
 
+            dependencies = data.get("dependencies")
+            version = data.get("version", 1)
+            if version >= PACKAGES_DATA_VERSION and dependencies is not None:
+                if version >= PACKAGES_DATA_INDEXED_VERSION:
+                    for p in packages:
+                        p["dependencies"] = [dependencies[i] for i in p["dependencies"]]
+                if not self._packages:
+                    # The packages were validated and normalized by add_package when the file was
+                    # written, so they can be used as they are. The table of dependencies is
+                    # sorted already, so only the duplicates have to be dropped.
+                    self._packages = packages
+                    self._index = None
+                    self._dependencies = list(unique_packages(dependencies))
+                    self._pending_dependencies = []
+                    return
+
             for p in packages:
                 self.add_package(p, p.get("path", os.curdir), p["dependencies"])
 
@@ -185,6 +281,7 @@ class PackagesData:
         If a package has a "dependencies" list, the packages inside it will be sorted as well.
         """
         self._packages.sort(key=_package_sort_key)
+        self._dependencies = None
         for package in self._packages:
             deps = package.get("dependencies")
             if deps:
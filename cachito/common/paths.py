@@ -58,8 +58,14 @@ class RequestBundleDir(base_path):
 
         self.bundle_archive_file = Path(root, f"{request_id}.tar.gz")
         self.bundle_archive_checksum = Path(root, f"{request_id}.checksum.sha256")
+        self.bundle_archive_index = Path(root, f"{request_id}.index.json")
+        self.bundle_archive_verification = Path(root, f"{request_id}.checksum.verified.json")
+        # Marks that the bundle archive is streamed from the bundle directory instead of stored
+        self.bundle_archive_streamed = Path(root, f"{request_id}.streamed")
 
         self.packages_data = Path(root, f"{request_id}-packages.json")
+        self.content_manifest = Path(root, f"{request_id}-content-manifest.json")
+        self.sbom_components = Path(root, f"{request_id}-sbom-components.json")
         self.gomod_packages_data = self.joinpath("gomod_packages.json")
         self.npm_packages_data = self.joinpath("npm_packages.json")
         self.pip_packages_data = self.joinpath("pip_packages.json")
@@ -1,33 +1,44 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import functools
+import hashlib
+import heapq
+import itertools
 import json
 import os
-import tempfile
 from collections import OrderedDict
-from copy import deepcopy
 from datetime import date, datetime
-from typing import Any, Dict, List, Optional, Set, Union, cast
+from http import HTTPStatus
+from typing import Any, Dict, Iterator, List, Optional, Set, Union, cast
 
 import flask
 import kombu.exceptions
 import pydantic
-from celery import chain
+from celery import Signature, chain, group
 from flask import stream_with_context
 from flask_login import current_user, login_required
 from opentelemetry import trace
 from sqlalchemy import and_, desc, func, or_
 from sqlalchemy.orm import joinedload, load_only
 from werkzeug.exceptions import BadRequest, Forbidden, Gone, InternalServerError, NotFound
+from werkzeug.http import is_resource_modified
 
+from cachito.common.bundle_stream import BundleArchiveStream
 from cachito.common.checksum import hash_file
 from cachito.common.packages_data import PackagesData
 from cachito.common.paths import RequestBundleDir
 from cachito.common.utils import b64encode, get_repo_name
 from cachito.errors import MessageBrokerError, NoWorkers, RequestErrorOrigin, ValidationError
 from cachito.web import db
-from cachito.web.content_manifest import BASE_ICM, BASE_SBOM
+from cachito.web.bundle_verification import verify_bundle_archive
+from cachito.web.content_manifest import (
+    BASE_ICM,
+    BASE_SBOM,
+    get_cache_key,
+    sbom_component_sort_key,
+)
 from cachito.web.metrics import cachito_metrics
 from cachito.web.models import (
+    REQUEST_JSON_FIELDS,
     ConfigFileBase64,
     EnvironmentVariable,
     PackageManager,
@@ -38,14 +49,26 @@ from cachito.web.models import (
     is_request_ref_valid,
     is_request_repo_valid,
 )
+from cachito.web.packages_data_cache import load_packages_data
 from cachito.web.status import status
-from cachito.web.utils import deep_sort_icm, normalize_end_date, pagination_metadata, str_to_bool
+from cachito.web.utils import (
+    SORT_KEY_BY_PURL,
+    cursor_pagination_metadata,
+    normalize_end_date,
+    pagination_metadata,
+    str_to_bool,
+    stream_json_document,
+)
 from cachito.workers import tasks
 
 api_v1 = flask.Blueprint("api_v1", __name__)
 
 tracer = trace.get_tracer(__name__)
 
+# The package managers which write the same configuration files (.npmrc and registry-ca.pem), so
+# their tasks don't run in parallel even if CACHITO_PARALLEL_PACKAGE_MANAGERS is enabled
+SERIAL_PACKAGE_MANAGERS = (("npm", "yarn"),)
+
 
 class RequestsArgs(pydantic.BaseModel):
     """Query parameters for /request endpoint."""
@@ -54,6 +77,7 @@ class RequestsArgs(pydantic.BaseModel):
     created_to: Union[datetime, date, None]
     error_origin: Union[RequestErrorOrigin, None]
     error_type: Union[str, None]
+    after_id: Union[pydantic.NonNegativeInt, None]
 
 
 def get_status():
@@ -73,6 +97,28 @@ def get_status_short():
     return flask.jsonify(retval), 200 if retval["ok"] else 503
 
 
+def _get_request_json_fields() -> Optional[Set[str]]:
+    """
+    Get the top level keys of the request JSON selected with the ``fields`` query parameter.
+
+    :return: the selected keys, or None if all of them must be included
+    :rtype: set or None
+    :raise ValidationError: if one of the keys is not valid
+    """
+    fields_arg = flask.request.args.get("fields")
+    if not fields_arg:
+        return None
+
+    fields = {field.strip() for field in fields_arg.split(",") if field.strip()}
+    invalid_fields = fields - REQUEST_JSON_FIELDS
+    if invalid_fields:
+        raise ValidationError(
+            f"The following fields are not valid: {', '.join(sorted(invalid_fields))}. "
+            f"Valid fields are: {', '.join(sorted(REQUEST_JSON_FIELDS))}"
+        )
+    return fields
+
+
 def get_requests():
     """
     Retrieve paginated details for requests.
@@ -83,10 +129,13 @@ def get_requests():
     state = flask.request.args.get("state")
     # Default verbose flag to False
     verbose = str_to_bool(flask.request.args.get("verbose", False))
+    fields = _get_request_json_fields()
     max_per_page = flask.current_app.config["CACHITO_MAX_PER_PAGE"]
     # The call to `paginate` will inspect the current HTTP request for the
     # pagination parameters `page` and `per_page`.
-    query = Request.query.order_by(Request.id.desc())
+    query = Request.query.options(*Request.to_json_options(verbose, fields)).order_by(
+        Request.id.desc()
+    )
     args = RequestsArgs(**flask.request.args)
     if args.created_from:
         query = query.filter(Request.created >= args.created_from)
@@ -142,6 +191,28 @@ def get_requests():
         per_page = int(flask.request.args.get("per_page", 10))
     except ValueError:
         per_page = 10
+    if args.after_id is not None:
+        # Keyset pagination on the primary key, its cost doesn't depend on the page depth
+        per_page = min(max(per_page, 1), max_per_page)
+        requests = (
+            query.filter(Request.id > args.after_id)
+            .order_by(None)
+            .order_by(Request.id)
+            .limit(per_page + 1)
+            .all()
+        )
+        next_after_id = requests[per_page - 1].id if len(requests) > per_page else None
+        query_params = flask.request.args.to_dict(flat=False)
+        for param in ("after_id", "page", "per_page"):
+            query_params.pop(param, None)
+        response = {
+            "items": [
+                request.to_json(verbose=verbose, fields=fields) for request in requests[:per_page]
+            ],
+            "meta": cursor_pagination_metadata(next_after_id, per_page, **query_params),
+        }
+        return flask.jsonify(response)
+
     pagination_query = query.paginate(per_page=per_page, max_per_page=max_per_page)
     requests = pagination_query.items
     query_params = {}
@@ -149,8 +220,10 @@ def get_requests():
         query_params["state"] = state
     if verbose:
         query_params["verbose"] = verbose
+    if fields is not None:
+        query_params["fields"] = flask.request.args["fields"]
     response = {
-        "items": [request.to_json(verbose=verbose) for request in requests],
+        "items": [request.to_json(verbose=verbose, fields=fields) for request in requests],
         "meta": pagination_metadata(pagination_query, **query_params),
     }
     return flask.jsonify(response)
@@ -166,11 +239,16 @@ def get_request(request_id):
     :rtype: flask.Response
     :raise NotFound: if the request is not found
     """
-    json = Request.query.get_or_404(request_id).to_json()
-
-    if json["state"] == RequestStateMapping.complete.name:
-        package_count = len(json["packages"])
-        dependency_count = len(json["dependencies"])
+    fields = _get_request_json_fields()
+    request = Request.query.options(*Request.to_json_options(fields=fields)).get_or_404(request_id)
+    json = request.to_json(fields=fields)
+
+    if request.state.state_name == RequestStateMapping.complete.name:
+        # The counts stored with the request are used when the packages are not selected
+        package_count = len(json["packages"]) if "packages" in json else request.packages_count or 0
+        dependency_count = (
+            len(json["dependencies"]) if "dependencies" in json else request.dependencies_count or 0
+        )
 
         flask.current_app.logger.info(
             "Returning data for request %i. Found %i packages and %i dependencies. "
@@ -178,7 +256,7 @@ def get_request(request_id):
             request_id,
             package_count,
             dependency_count,
-            json["pkg_managers"],
+            [pkg_manager.to_json() for pkg_manager in request.pkg_managers],
         )
 
     return flask.jsonify(json)
@@ -276,9 +354,7 @@ def get_request_content_manifest(request_id):
         raise ValidationError(
             'Content manifests are only available for requests in the "complete" or "stale" states'
         )
-    content_manifest = request.content_manifest
-    content_manifest_json = content_manifest.to_json()
-    return send_json_file_back(content_manifest_json)
+    return send_json_file_back(request.content_manifest_json())
 
 
 def get_request_environment_variables(request_id):
@@ -316,6 +392,9 @@ def download_archive(request_id):
     bundle_dir = RequestBundleDir(request.id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"])
 
     if not bundle_dir.bundle_archive_file.exists():
+        if bundle_dir.bundle_archive_streamed.exists() and bundle_dir.exists():
+            return _stream_bundle_archive(request, bundle_dir)
+
         flask.current_app.logger.error(
             "The bundle archive at %s for request %d doesn't exist",
             bundle_dir.bundle_archive_file,
@@ -323,10 +402,13 @@ def download_archive(request_id):
         )
         raise InternalServerError()
 
-    hasher = hash_file(bundle_dir.bundle_archive_file)
-    checksum = hasher.hexdigest()
     store_checksum = bundle_dir.bundle_archive_checksum.read_text(encoding="utf-8")
-    if checksum != store_checksum:
+    if _is_not_modified(store_checksum):
+        # The client already has this bundle archive, there is no need to verify it
+        return _not_modified_response(store_checksum)
+
+    verify_interval = flask.current_app.config["CACHITO_BUNDLE_VERIFY_INTERVAL"]
+    if not verify_bundle_archive(bundle_dir, verify_interval):
         msg = "Checksum of bundle archive {} has changed."
         flask.current_app.logger.error(msg.format(bundle_dir.bundle_archive_file))
         raise InternalServerError(msg.format(bundle_dir.bundle_archive_file.name))
@@ -340,8 +422,79 @@ def download_archive(request_id):
         mimetype="application/gzip",
         as_attachment=True,
         download_name=f"cachito-{request_id}.tar.gz",
+        etag=store_checksum,
+    )
+    # Allow the clients to resume interrupted downloads with range requests
+    resp.headers["Accept-Ranges"] = "bytes"
+    resp.headers["Digest"] = f"sha-256={b64encode(bytes.fromhex(store_checksum))}"
+    return resp
+
+
+def _stream_bundle_archive(request, bundle_dir):
+    """
+    Stream the bundle archive of a request generated from its temporary bundle directory.
+
+    The sha256 checksum of the archive is computed by the worker, so it is sent in the ``Digest``
+    header. If the generated archive doesn't match it, the response is aborted before its end so
+    that the client doesn't get a complete but unexpected archive.
+
+    :param Request request: the request to download the bundle archive of
+    :param RequestBundleDir bundle_dir: the bundle directory of the request
+    :return: a Flask streaming response
+    :rtype: flask.Response
+    """
+    store_checksum = bundle_dir.bundle_archive_checksum.read_text(encoding="utf-8")
+    if _is_not_modified(store_checksum):
+        return _not_modified_response(store_checksum)
+
+    include_git_dir = any(flag.name == "include-git-dir" for flag in request.flags)
+    stream = BundleArchiveStream(bundle_dir, include_git_dir=include_git_dir)
+
+    def generate():
+        # The last chunk is held back until the checksum of the whole archive is known
+        previous = None
+        for chunk in stream:
+            if previous is not None:
+                yield previous
+            previous = chunk
+        if stream.hexdigest != store_checksum:
+            msg = f"Checksum of the bundle archive streamed from {bundle_dir} has changed"
+            flask.current_app.logger.error(msg)
+            raise InternalServerError(msg)
+        if previous is not None:
+            yield previous
+
+    flask.current_app.logger.info(
+        "Streaming the bundle from %s for request %d", bundle_dir, request.id
     )
+    resp = flask.Response(stream_with_context(generate()), mimetype="application/gzip")
+    resp.headers["Content-Disposition"] = f"attachment; filename=cachito-{request.id}.tar.gz"
     resp.headers["Digest"] = f"sha-256={b64encode(bytes.fromhex(store_checksum))}"
+    resp.set_etag(store_checksum)
+    return resp
+
+
+def _is_not_modified(etag: str) -> bool:
+    """
+    Check if the client already has the representation with the given strong ETag.
+
+    :param str etag: the ETag of the current representation
+    :return: True if the If-None-Match header of the request matches the ETag
+    :rtype: bool
+    """
+    return not is_resource_modified(flask.request.environ, etag=etag)
+
+
+def _not_modified_response(etag: str) -> flask.Response:
+    """
+    Create a "304 Not Modified" response for the representation with the given ETag.
+
+    :param str etag: the ETag of the current representation
+    :return: the response without a body
+    :rtype: flask.Response
+    """
+    resp = flask.Response(status=HTTPStatus.NOT_MODIFIED)
+    resp.set_etag(etag)
     return resp
 
 
@@ -358,11 +511,50 @@ def list_packages_and_dependencies(request_id):
     state.
     """
     request = Request.query.get_or_404(request_id)
+    bundle_dir = _get_packages_file_bundle_dir(request)
 
-    bundle_dir = RequestBundleDir(request_id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"])
+    # The packages file is never modified in place, so its identity is enough for a strong ETag
+    stat = bundle_dir.packages_data.stat()
+    etag = f"{request_id}-{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    if _is_not_modified(etag):
+        return _not_modified_response(etag)
+
+    if request.state.state_name == RequestStateMapping.complete.name:
+        packages_data = load_packages_data(request_id, bundle_dir.packages_data)
+    else:
+        packages_data = PackagesData()
+        packages_data.load(bundle_dir.packages_data)
+
+    resp = flask.jsonify(
+        {"packages": packages_data.packages, "dependencies": packages_data.all_dependencies}
+    )
+    resp.set_etag(etag)
+    return resp.make_conditional(
+        flask.request, accept_ranges=True, complete_length=resp.content_length
+    )
+
+
+def _get_packages_file_bundle_dir(
+    request: Request, clear_nfs_cache: bool = False
+) -> RequestBundleDir:
+    """
+    Get the bundle directory of a request and check that its packages file exists.
+
+    :param Request request: the request to get the packages file of
+    :param bool clear_nfs_cache: if True, list the bundles directory first, so that the NFS cache
+        doesn't hide a packages file which was just written by a worker
+    :return: the bundle directory of the request
+    :rtype: RequestBundleDir
+    :raise NotFound: the file is not present. It is a valid state.
+    :raise InternalServerError: the file is not present for a completed request. This is an invalid
+    state.
+    """
+    bundle_dir = RequestBundleDir(request.id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"])
+    if clear_nfs_cache:
+        os.listdir(bundle_dir.packages_data.parent)
 
     if not bundle_dir.packages_data.exists():
-        message = f"The file at {bundle_dir.packages_data} for request {request_id} doesn't exist."
+        message = f"The file at {bundle_dir.packages_data} for request {request.id} doesn't exist."
 
         if request.state.state_name == RequestStateMapping.complete.name:
             flask.current_app.logger.error(message)
@@ -371,10 +563,69 @@ def list_packages_and_dependencies(request_id):
         flask.current_app.logger.info(message)
         raise NotFound("The packages file is not present for this request.")
 
-    packages_data = PackagesData()
-    packages_data.load(bundle_dir.packages_data)
+    return bundle_dir
+
 
-    return {"packages": packages_data.packages, "dependencies": packages_data.all_dependencies}
+def get_packages_checksum(request_id):
+    """
+    Return the checksum of the packages file for a request.
+
+    This allows the workers to verify that the API reads the packages file they wrote without
+    transferring its contents. If the checksum differs from the expected one, the NFS cache is
+    cleared and the packages file is read again before answering.
+
+    :rtype: flask.Response
+    :raise NotFound: the file is not present. It is a valid state.
+    :raise InternalServerError: the file is not present for a completed request. This is an invalid
+    state.
+    """
+    request = Request.query.get_or_404(request_id)
+    expected = flask.request.args.get("expected")
+
+    bundle_dir = RequestBundleDir(request_id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"])
+    if not bundle_dir.packages_data.exists():
+        _get_packages_file_bundle_dir(request, clear_nfs_cache=True)
+    checksum = hash_file(bundle_dir.packages_data).hexdigest()
+
+    if expected is not None and checksum != expected:
+        flask.current_app.logger.info(
+            "The checksum of the packages file for request %d is %s instead of %s, reading it "
+            "again",
+            request_id,
+            checksum,
+            expected,
+        )
+        bundle_dir = _get_packages_file_bundle_dir(request, clear_nfs_cache=True)
+        checksum = hash_file(bundle_dir.packages_data).hexdigest()
+
+    return flask.jsonify({"checksum": checksum})
+
+
+def _group_package_manager_tasks(pkg_manager_tasks: Dict[str, Signature]) -> group:
+    """
+    Group the tasks of the package managers so that they run in parallel.
+
+    The tasks of the package managers in the same entry of ``SERIAL_PACKAGE_MANAGERS`` write the
+    same configuration files of the request, so they are chained in the group instead.
+
+    :param dict pkg_manager_tasks: the task signature of each package manager of the request, in
+        the order they would run one after another
+    :return: the group of the tasks
+    :rtype: celery.group
+    """
+    serial_tasks: Dict[Any, List[Signature]] = {}
+    for pkg_manager, task in pkg_manager_tasks.items():
+        key = next(
+            (names for names in SERIAL_PACKAGE_MANAGERS if pkg_manager in names), pkg_manager
+        )
+        serial_tasks.setdefault(key, []).append(task)
+
+    return group(
+        [
+            task_list[0] if len(task_list) == 1 else chain(task_list)
+            for task_list in serial_tasks.values()
+        ]
+    )
 
 
 @login_required
@@ -448,14 +699,14 @@ def create_request():
         pkg_manager_to_dep_replacements.setdefault(type_, [])
         pkg_manager_to_dep_replacements[type_].append(dependency_replacement)
 
+    # The tasks fetching the dependencies of each package manager
+    pkg_manager_tasks = {}
     package_configs = payload.get("packages", {})
     if "gomod" in pkg_manager_names:
         go_package_configs = package_configs.get("gomod", [])
-        chain_tasks.append(
-            tasks.fetch_gomod_source.si(
-                request.id, pkg_manager_to_dep_replacements.get("gomod", []), go_package_configs
-            ).on_error(error_callback)
-        )
+        pkg_manager_tasks["gomod"] = tasks.fetch_gomod_source.si(
+            request.id, pkg_manager_to_dep_replacements.get("gomod", []), go_package_configs
+        ).on_error(error_callback)
     if "npm" in pkg_manager_names:
         if pkg_manager_to_dep_replacements.get("npm"):
             raise ValidationError(
@@ -463,42 +714,45 @@ def create_request():
             )
 
         npm_package_configs = package_configs.get("npm", [])
-        chain_tasks.append(
-            tasks.fetch_npm_source.si(request.id, npm_package_configs).on_error(error_callback)
-        )
+        pkg_manager_tasks["npm"] = tasks.fetch_npm_source.si(
+            request.id, npm_package_configs
+        ).on_error(error_callback)
     if "pip" in pkg_manager_names:
         if pkg_manager_to_dep_replacements.get("pip"):
             raise ValidationError(
                 "Dependency replacements are not yet supported for the pip package manager"
             )
         pip_package_configs = package_configs.get("pip", [])
-        chain_tasks.append(
-            tasks.fetch_pip_source.si(request.id, pip_package_configs).on_error(error_callback)
-        )
+        pkg_manager_tasks["pip"] = tasks.fetch_pip_source.si(
+            request.id, pip_package_configs
+        ).on_error(error_callback)
     if "rubygems" in pkg_manager_names:
         if pkg_manager_to_dep_replacements.get("rubygems"):
             raise ValidationError(
                 "Dependency replacements are not yet supported for the RubyGems package manager"
             )
         rubygems_package_configs = package_configs.get("rubygems", [])
-        chain_tasks.append(
-            tasks.fetch_rubygems_source.si(request.id, rubygems_package_configs).on_error(
-                error_callback
-            )
-        )
+        pkg_manager_tasks["rubygems"] = tasks.fetch_rubygems_source.si(
+            request.id, rubygems_package_configs
+        ).on_error(error_callback)
     if "git-submodule" in pkg_manager_names:
-        chain_tasks.append(
-            tasks.add_git_submodules_as_package.si(request.id).on_error(error_callback)
-        )
+        pkg_manager_tasks["git-submodule"] = tasks.add_git_submodules_as_package.si(
+            request.id
+        ).on_error(error_callback)
     if "yarn" in pkg_manager_names:
         if pkg_manager_to_dep_replacements.get("yarn"):
             raise ValidationError(
                 "Dependency replacements are not yet supported for the yarn package manager"
             )
         yarn_package_configs = package_configs.get("yarn", [])
-        chain_tasks.append(
-            tasks.fetch_yarn_source.si(request.id, yarn_package_configs).on_error(error_callback)
-        )
+        pkg_manager_tasks["yarn"] = tasks.fetch_yarn_source.si(
+            request.id, yarn_package_configs
+        ).on_error(error_callback)
+
+    if flask.current_app.config["CACHITO_PARALLEL_PACKAGE_MANAGERS"] and len(pkg_manager_tasks) > 1:
+        chain_tasks.append(_group_package_manager_tasks(pkg_manager_tasks))
+    else:
+        chain_tasks.extend(pkg_manager_tasks.values())
 
     chain_tasks.append(tasks.process_fetched_sources.si(request.id).on_error(error_callback))
     chain_tasks.append(tasks.finalize_request.s(request.id).on_error(error_callback))
@@ -661,19 +915,35 @@ def patch_request(request_id):
         request.id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"]
     )
 
-    if delete_bundle and bundle_dir.bundle_archive_file.exists():
+    if delete_bundle and (
+        bundle_dir.bundle_archive_file.exists() or bundle_dir.packages_data.exists()
+    ):
         flask.current_app.logger.info(
             "Deleting the bundle archive %s", bundle_dir.bundle_archive_file
         )
         try:
-            bundle_dir.bundle_archive_file.unlink()
-            bundle_dir.bundle_archive_checksum.unlink()
+            bundle_dir.bundle_archive_file.unlink(missing_ok=True)
+            bundle_dir.bundle_archive_checksum.unlink(missing_ok=True)
+            bundle_dir.bundle_archive_index.unlink(missing_ok=True)
+            bundle_dir.bundle_archive_verification.unlink(missing_ok=True)
+            bundle_dir.bundle_archive_streamed.unlink(missing_ok=True)
             bundle_dir.packages_data.unlink()
+            bundle_dir.content_manifest.unlink(missing_ok=True)
+            bundle_dir.sbom_components.unlink(missing_ok=True)
         except OSError:
             flask.current_app.logger.exception(
                 "Failed to delete the bundle archive %s", bundle_dir.bundle_archive_file
             )
 
+    if (
+        delete_bundle_temp
+        and payload["state"] == "complete"
+        and bundle_dir.bundle_archive_streamed.exists()
+    ):
+        # The worker didn't create the bundle archive, it is streamed from the temporary bundle
+        # directory
+        delete_bundle_temp = False
+
     if delete_bundle_temp and bundle_dir.exists():
         flask.current_app.logger.info(
             "Deleting the temporary files used to create the bundle at %s", bundle_dir
@@ -813,17 +1083,17 @@ def get_request_logs(request_id):
 
 
 def send_json_file_back(json_content: Dict[str, Any]) -> flask.Response:
-    """Send json file back to the client."""
-    debug = flask.current_app.logger.debug
-    fd, filename = tempfile.mkstemp(prefix="request-json-", text=True)
-    debug("Write json into file: %s", filename)
-    try:
-        with open(fd, "w") as f:
-            json.dump(json_content, f, sort_keys=True)
-        return flask.send_file(filename, mimetype="application/json")
-    finally:
-        debug("Json file is sent back to the client. Remove %s", filename)
-        os.unlink(filename)
+    """Send json file back to the client, with a strong ETag derived from its content."""
+    content = json.dumps(json_content, sort_keys=True).encode("utf-8")
+    etag = hashlib.sha256(content).hexdigest()
+    if _is_not_modified(etag):
+        return _not_modified_response(etag)
+
+    resp = flask.Response(content, mimetype="application/json")
+    resp.set_etag(etag)
+    return resp.make_conditional(
+        flask.request, accept_ranges=True, complete_length=resp.content_length
+    )
 
 
 def _get_valid_request_ids(all_request_ids: str) -> List[int]:
@@ -891,14 +1161,15 @@ def get_content_manifest_by_requests():
     valid_states = set([RequestStateMapping.complete.name])
     _check_requests_state(requests, valid_states)
 
-    request: Request
-    assembled_icm = deepcopy(BASE_ICM)
-    for request in requests:
-        manifest = request.content_manifest.to_json()
-        assembled_icm["image_contents"].extend(manifest["image_contents"])
-    if len(requests) > 1:
-        deep_sort_icm(assembled_icm)
-    return send_json_file_back(assembled_icm)
+    etag = _get_content_etag("content-manifest", requests)
+    if _is_not_modified(etag):
+        return _not_modified_response(etag)
+
+    # The image contents of each request are sorted by purl, merge them instead of sorting
+    image_contents = heapq.merge(
+        *(request.iter_image_contents() for request in requests), key=SORT_KEY_BY_PURL
+    )
+    return _send_json_stream(BASE_ICM, "image_contents", image_contents, etag)
 
 
 def get_sbom_by_requests() -> flask.Response:
@@ -920,25 +1191,57 @@ def get_sbom_by_requests() -> flask.Response:
     valid_states = set([RequestStateMapping.complete.name])
     _check_requests_state(requests, valid_states)
 
-    request: Request
-    assembled_sbom = deepcopy(BASE_SBOM)
+    etag = _get_content_etag("sbom", requests)
+    if _is_not_modified(etag):
+        return _not_modified_response(etag)
 
-    all_components = []
-    for request in requests:
-        sbom_components = request.content_manifest.sbom_components_list()
-        all_components.extend(sbom_components)
+    # The components of each request are sorted, merge them and drop the duplicates
+    all_components = heapq.merge(
+        *(request.iter_sbom_components() for request in requests), key=sbom_component_sort_key
+    )
+    unique_components = (component for component, _ in itertools.groupby(all_components))
+    return _send_json_stream(BASE_SBOM, "components", unique_components, etag)
 
-    unique_components: List[Dict[str, Any]] = []
 
-    all_components.sort(key=lambda c: (c["purl"], c["name"], c.get("version")))
+def _get_content_etag(kind: str, requests: List[Request]) -> str:
+    """
+    Get the strong ETag of a document generated from the packages files of the given requests.
 
-    for component in all_components:
-        if not unique_components or component != unique_components[-1]:
-            unique_components.append(component)
+    The document is not generated, the ETag is derived from the cache keys of the packages files.
 
-    assembled_sbom["components"] = unique_components
+    :param str kind: the kind of document
+    :param list[Request] requests: the requests the document is generated from, in order
+    :return: the ETag
+    :rtype: str
+    """
+    bundles_dir = flask.current_app.config["CACHITO_BUNDLES_DIR"]
+    keys = []
+    for request in requests:
+        packages_data = RequestBundleDir(request.id, root=bundles_dir).packages_data
+        try:
+            keys.append([request.id, get_cache_key(packages_data)])
+        except OSError:
+            keys.append([request.id, None])
+    return hashlib.sha256(json.dumps([kind, keys]).encode("utf-8")).hexdigest()
+
+
+def _send_json_stream(
+    document: Dict[str, Any], list_key: str, items: Iterator[Any], etag: str
+) -> flask.Response:
+    """
+    Stream a JSON document to the client, with one of its lists generated from an iterator.
 
-    return send_json_file_back(assembled_sbom)
+    :param dict document: the document to send, the value of ``list_key`` is ignored
+    :param str list_key: the key of the list to generate from the items
+    :param Iterator items: the items of the list
+    :param str etag: the strong ETag of the document
+    :return: a Flask streaming response
+    :rtype: flask.Response
+    """
+    chunks = stream_json_document(document, list_key, items)
+    resp = flask.Response(stream_with_context(chunks), mimetype="application/json")
+    resp.set_etag(etag)
+    return resp
 
 
 class RequestMetricsArgs(pydantic.BaseModel):
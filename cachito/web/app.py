@@ -37,7 +37,8 @@ from cachito.web.auth import load_user_from_request, user_loader
 from cachito.web.config import validate_cachito_config
 from cachito.web.docs import docs
 from cachito.web.errors import json_error, validation_error
-from cachito.web.metrics import init_metrics
+from cachito.web.metrics import cachito_metrics, init_metrics
+from cachito.web.packages_data_cache import PackagesDataCache
 from cachito.web.validation import ParameterValidator, RequestBodyValidator
 
 
@@ -145,6 +146,10 @@ def create_app(config_obj=None):
     app.register_error_handler(pydantic.ValidationError, validation_error)
 
     init_metrics(app)
+    app.extensions["cachito_packages_data_cache"] = PackagesDataCache(
+        app.config["CACHITO_PACKAGES_DATA_CACHE_SIZE"],
+        cachito_metrics["packages_data_cache_lookups"],
+    )
     _instrument_app(app)
     return app
 
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import json
+import logging
+import os
+import time
+
+from cachito.common.checksum import hash_file
+from cachito.common.paths import RequestBundleDir
+
+__all__ = ["verify_bundle_archive"]
+
+log = logging.getLogger(__name__)
+
+# The file attributes which change when a bundle archive is modified or replaced
+_STAT_ATTRS = ("st_ino", "st_size", "st_mtime_ns", "st_ctime_ns")
+
+
+def _get_file_state(bundle_dir: RequestBundleDir, checksum: str) -> dict:
+    stat = bundle_dir.bundle_archive_file.stat()
+    state = {attr: getattr(stat, attr) for attr in _STAT_ATTRS}
+    state["checksum"] = checksum
+    return state
+
+
+def verify_bundle_archive(bundle_dir: RequestBundleDir, max_age: float) -> bool:
+    """
+    Verify the bundle archive of a request against its stored checksum.
+
+    Hashing a large bundle archive is expensive, so the result of a successful verification is
+    stored beside the checksum file along with the inode, size, mtime and ctime of the archive.
+    The archive is only hashed again when any of them changed, or when the last verification is
+    older than ``max_age``.
+
+    :param RequestBundleDir bundle_dir: the bundle directory of the request
+    :param float max_age: the number of seconds after which the archive is hashed again even if
+        it did not change; if 0, the archive is always hashed
+    :return: True if the bundle archive matches its stored checksum, False otherwise
+    :rtype: bool
+    """
+    store_checksum = bundle_dir.bundle_archive_checksum.read_text(encoding="utf-8")
+    verification_file = bundle_dir.bundle_archive_verification
+    state = _get_file_state(bundle_dir, store_checksum)
+
+    if max_age > 0:
+        try:
+            verification = json.loads(verification_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            verification = {}
+        verified_at = verification.pop("verified_at", 0)
+        if verification == state and time.time() - verified_at < max_age:
+            log.debug("The bundle archive %s was verified recently", bundle_dir.bundle_archive_file)
+            return True
+
+    checksum = hash_file(bundle_dir.bundle_archive_file).hexdigest()
+    if checksum != store_checksum:
+        verification_file.unlink(missing_ok=True)
+        return False
+
+    state["verified_at"] = time.time()
+    tmp_verification_file = verification_file.with_name(f".{verification_file.name}.tmp")
+    try:
+        tmp_verification_file.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp_verification_file, verification_file)
+    except OSError:
+        log.exception("Failed to store the verification of %s", bundle_dir.bundle_archive_file)
+    return True
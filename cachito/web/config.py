@@ -14,6 +14,9 @@ class Config(object):
     DEBUG = False
     # Additional loggers to set to the level defined in CACHITO_LOG_LEVEL
     CACHITO_ADDITIONAL_LOGGERS: List[str] = ["cachito.common.packages_data"]
+    # Stream the bundle archives from the temporary bundle directories instead of storing them
+    # The number of seconds after which an unchanged bundle archive is hashed again on download
+    CACHITO_BUNDLE_VERIFY_INTERVAL = 24 * 60 * 60
     CACHITO_DEFAULT_PACKAGE_MANAGERS: List[str] = ["gomod"]
     # This sets the level of the "flask.app" logger, which is accessed from current_app.logger
     CACHITO_LOG_LEVEL = "INFO"
@@ -22,6 +25,12 @@ class Config(object):
     # Pairs of mutually exclusive package managers (cannot process the same package)
     CACHITO_MUTUALLY_EXCLUSIVE_PACKAGE_MANAGERS = [("npm", "yarn")]
     CACHITO_PACKAGE_MANAGERS = ["gomod"]
+    # The maximum total size in bytes of the packages files of complete requests kept parsed in
+    # memory by each web process. Set to 0 to disable the cache.
+    CACHITO_PACKAGES_DATA_CACHE_SIZE = 64 * 1024 * 1024
+    # Run the tasks of the package managers of a request in parallel. This requires a Celery result
+    # backend to join them before processing the fetched sources.
+    CACHITO_PARALLEL_PACKAGE_MANAGERS = False
     CACHITO_REQUEST_FILE_LOGS_DIR: Optional[str] = None
     # Users that are allowed to use the "user" property when creating a request
     CACHITO_USER_REPRESENTATIVES: List[str] = []
@@ -1,9 +1,11 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import json
 import os
+import tempfile
 from copy import deepcopy
 from functools import cached_property
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, TextIO
 
 import flask
 
@@ -18,6 +20,8 @@ from cachito.web.utils import deep_sort_icm
 from cachito.workers.pkg_managers import gomod
 
 VERSION = 1
+# Bump when the generated content manifests or sbom components change to invalidate the cache
+GENERATOR_VERSION = 1
 JSON_SCHEMA_URL = (
     "https://raw.githubusercontent.com/containerbuildsystem/atomic-reactor/"
     "f4abcfdaf8247a6b074f94fa84f3846f82d781c6/atomic_reactor/schemas/content_manifest.json"
@@ -47,6 +51,94 @@ BASE_SBOM = {
 }
 
 
+def get_cache_key(packages_data_path: Path) -> Dict[str, Any]:
+    """
+    Get the key of the content manifest data generated from a packages file.
+
+    :param Path packages_data_path: the path of the packages file
+    :return: the key, which changes if the packages file is replaced or the generator changes
+    :rtype: dict
+    :raises OSError: if the packages file doesn't exist
+    """
+    stat = packages_data_path.stat()
+    return {
+        "generator_version": GENERATOR_VERSION,
+        "packages_data": [stat.st_ino, stat.st_size, stat.st_mtime_ns],
+    }
+
+
+def sbom_component_sort_key(component: Dict[str, Any]) -> tuple:
+    """Get the key to sort the sbom components on."""
+    return component["purl"], component["name"], component.get("version")
+
+
+def iter_cached_content(path: Path, packages_data_path: Path) -> Optional[Iterator[Any]]:
+    """
+    Iterate over the content manifest items generated from a packages file, if cached.
+
+    The cache file is in the JSON Lines format: a header with the cache key followed by one item
+    per line, so that the items can be read one at a time. The cache is outdated if the packages
+    file was replaced or if the generator version changed.
+
+    :param Path path: the path of the cache file
+    :param Path packages_data_path: the path of the packages file the items were generated from
+    :return: an iterator over the cached items, or None if the cache is missing or outdated
+    :rtype: Iterator or None
+    """
+    try:
+        f = open(path, encoding="utf-8")
+    except OSError:
+        return None
+    try:
+        header = json.loads(f.readline())
+        key = get_cache_key(packages_data_path)
+    except (OSError, ValueError):
+        f.close()
+        return None
+    if header != {"key": key}:
+        f.close()
+        return None
+    return _iter_json_lines(f)
+
+
+def _iter_json_lines(f: TextIO) -> Iterator[Any]:
+    with f:
+        for line in f:
+            yield json.loads(line)
+
+
+def store_cached_content(path: Path, packages_data_path: Path, items: List[Any]) -> None:
+    """
+    Store the content manifest items generated from a packages file.
+
+    Nothing is stored if the packages file doesn't exist. Failing to store the items is not
+    fatal, they are generated again on the next access.
+
+    :param Path path: the path of the cache file
+    :param Path packages_data_path: the path of the packages file the items were generated from
+    :param list items: the JSON serializable items to store
+    """
+    try:
+        key = get_cache_key(packages_data_path)
+    except OSError:
+        return
+
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    except OSError:
+        flask.current_app.logger.exception("Failed to store the cached content at %s", path)
+        return
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key}) + "\n")
+            for item in items:
+                f.write(json.dumps(item) + "\n")
+        os.replace(tmp_path, path)
+    except OSError:
+        flask.current_app.logger.exception("Failed to store the cached content at %s", path)
+        Path(tmp_path).unlink(missing_ok=True)
+
+
 class ContentManifest:
     """A content manifest associated with a Cachito request."""
 
@@ -1,11 +1,17 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import re
+import sys
 import time
+from pathlib import Path
 
 import click
+import flask
 from flask.cli import FlaskGroup
 from sqlalchemy.exc import OperationalError
 
+from cachito.common.paths import RequestBundleDir
 from cachito.web.app import create_cli_app
+from cachito.web.bundle_verification import verify_bundle_archive
 from cachito.web.models import db
 
 
@@ -31,5 +37,26 @@ def wait_for_db():
             break
 
 
+@cli.command(name="verify-bundles")
+def verify_bundles():
+    """Verify the checksums of all the bundle archives, even the ones verified recently."""
+    bundles_dir = flask.current_app.config["CACHITO_BUNDLES_DIR"]
+    failed = False
+    for path in sorted(Path(bundles_dir).glob("*.tar.gz")):
+        match = re.fullmatch(r"(\d+)\.tar\.gz", path.name)
+        if not match:
+            continue
+        bundle_dir = RequestBundleDir(int(match.group(1)), root=bundles_dir)
+        if not bundle_dir.bundle_archive_checksum.exists():
+            # The bundle archive is still being created
+            continue
+        if not verify_bundle_archive(bundle_dir, 0):
+            click.echo(f"The checksum of the bundle archive {path} has changed", err=True)
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     cli()
@@ -1,7 +1,7 @@
 import os
 import socket
 
-from prometheus_client import Gauge, Summary, multiprocess
+from prometheus_client import Counter, Gauge, Summary, multiprocess
 from prometheus_client.core import CollectorRegistry
 from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
 
@@ -34,3 +34,9 @@ def init_metrics(app):
     )
     cachito_metrics["gauge_state"] = gauge_state
     cachito_metrics["request_duration"] = request_duration
+    packages_data_cache_lookups = Counter(
+        "cachito_packages_data_cache_lookups",
+        "Lookups in the cache of the parsed packages files",
+        ["result"],
+    )
+    cachito_metrics["packages_data_cache_lookups"] = packages_data_cache_lookups
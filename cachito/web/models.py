@@ -6,12 +6,13 @@ import re
 from collections import OrderedDict
 from copy import deepcopy
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 import flask
 from flask_login import UserMixin, current_user
 from sqlalchemy import TIMESTAMP, func
 from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql import expression
 from sqlalchemy.types import DateTime
 from werkzeug.exceptions import Forbidden
@@ -20,8 +21,36 @@ from cachito.common.packages_data import PackagesData
 from cachito.common.paths import RequestBundleDir
 from cachito.errors import RequestErrorOrigin, ValidationError
 from cachito.web import content_manifest, db
+from cachito.web.packages_data_cache import load_packages_data
 from cachito.web.validation import validate_dependency_replacements
 
+# The top level keys of the JSON representation of a request
+REQUEST_JSON_FIELDS = frozenset(
+    (
+        "configuration_files",
+        "content_manifest",
+        "created",
+        "dependencies",
+        "environment_variables",
+        "environment_variables_info",
+        "error_origin",
+        "error_type",
+        "flags",
+        "id",
+        "logs",
+        "packages",
+        "pkg_managers",
+        "ref",
+        "repo",
+        "state",
+        "state_history",
+        "state_reason",
+        "submitted_by",
+        "updated",
+        "user",
+    )
+)
+
 
 def is_request_ref_valid(ref: str) -> bool:
     """Check if a string is a valid git ref in the expected format."""
@@ -291,6 +320,13 @@ def _validate_gitsubmodule_exclusivity(pkg_manager_paths, mutually_exclusive):
             raise ValidationError(msg)
 
 
+def _with_replaces(dependency: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the dependency with the ``replaces`` key, which defaults to ``None``."""
+    if "replaces" in dependency:
+        return dependency
+    return {**dependency, "replaces": None}
+
+
 class utcnow(expression.FunctionElement):
     """Get current DateTime object in UTC timezone."""
 
@@ -374,32 +410,118 @@ class Request(db.Model):  # type: ignore[name-defined]
 
         return content_manifest.ContentManifest(self, packages)
 
+    def content_manifest_json(self) -> Dict[str, Any]:
+        """
+        Get the JSON representation of the Image Content Manifest for a request.
+
+        :return: the JSON form of the content manifest
+        :rtype: dict
+        """
+        icm: Dict[str, Any] = deepcopy(content_manifest.BASE_ICM)
+        icm["image_contents"] = list(self.iter_image_contents())
+        return icm
+
+    def iter_image_contents(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the top level components of the Image Content Manifest, sorted by purl.
+
+        The components of a complete request are generated once and then read one at a time from
+        a cache file next to its packages file.
+
+        :return: an iterator over the ``image_contents`` of the content manifest
+        :rtype: Iterator[dict]
+        """
+        return self._iter_cached_content(
+            "content_manifest", lambda cm: cm.to_json()["image_contents"]
+        )
+
+    def iter_sbom_components(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the CycloneDX sbom components, sorted by purl, name and version.
+
+        The components of a complete request are generated once and then read one at a time from
+        a cache file next to its packages file.
+
+        :return: an iterator over the sbom components
+        :rtype: Iterator[dict]
+        """
+        return self._iter_cached_content(
+            "sbom_components",
+            lambda cm: sorted(
+                cm.sbom_components_list(), key=content_manifest.sbom_component_sort_key
+            ),
+        )
+
+    def _iter_cached_content(self, cache_attr, generate):
+        if not self._is_complete():
+            return iter(generate(self.content_manifest))
+
+        bundle_dir = RequestBundleDir(self.id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"])
+        cache_path = getattr(bundle_dir, cache_attr)
+        items = content_manifest.iter_cached_content(cache_path, bundle_dir.packages_data)
+        if items is None:
+            content = generate(self.content_manifest)
+            content_manifest.store_cached_content(cache_path, bundle_dir.packages_data, content)
+            items = iter(content)
+        return items
+
     def _is_complete(self):
-        if len(self.states) > 0:
-            latest_state = self.states[-1]
-            return latest_state.state_name == RequestStateMapping.complete.name
+        # Use the latest state relationship, the state history may not be loaded
+        if self.state is not None:
+            return self.state.state_name == RequestStateMapping.complete.name
 
         return False
 
     def _get_packages_data(self):
-        packages_data = PackagesData()
+        if not self._is_complete():
+            return PackagesData()
 
-        if self._is_complete():
-            bundle_dir = RequestBundleDir(
-                self.id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"]
-            )
-            packages_data.load(bundle_dir.packages_data)
+        bundle_dir = RequestBundleDir(self.id, root=flask.current_app.config["CACHITO_BUNDLES_DIR"])
+        return load_packages_data(self.id, bundle_dir.packages_data)
 
-        return packages_data
+    @staticmethod
+    def to_json_options(verbose=True, fields=None):
+        """
+        Get the query options which load the relationships used by ``to_json`` in advance.
 
-    def to_json(self, verbose=True):
+        Each relationship is loaded with a single query for all the requests of the query result,
+        so the number of queries to serialize a list of requests doesn't depend on its length.
+
+        :param bool verbose: determines if the relationships only used in the verbose JSON are
+            loaded too
+        :param set fields: the top level keys to include in the JSON, or None for all of them
+        :return: the loader options to pass to ``Query.options``
+        :rtype: list
+        """
+        options = [
+            selectinload(Request.pkg_managers),
+            selectinload(Request.user),
+            selectinload(Request.submitted_by),
+            selectinload(Request.environment_variables),
+            selectinload(Request.flags),
+            selectinload(Request.error),
+        ]
+        if verbose and (fields is None or "state_history" in fields):
+            options.append(selectinload(Request.states))
+        else:
+            # Only the latest state is used
+            options.append(selectinload(Request.state))
+        return options
+
+    def to_json(self, verbose=True, fields=None):
         """
         Generate the JSON representation of the request.
 
         :param bool verbose: determines if the JSON should have verbose details
+        :param set fields: the top level keys to include in the JSON, or None for all of them;
+            the expensive values of the other keys are not computed
         :return: the JSON representation of the request
         :rtype: dict
         """
+
+        def wanted(*keys):
+            return fields is None or not fields.isdisjoint(keys)
+
         pkg_managers = [pkg_manager.to_json() for pkg_manager in self.pkg_managers]
         user = None
         # If auth is disabled, there will not be a user associated with this request
@@ -442,41 +564,45 @@ class Request(db.Model):  # type: ignore[name-defined]
             }
 
         if verbose:
-            rv["configuration_files"] = flask.url_for(
-                "/api/v1.cachito_web_api_v1_get_request_config_files",
-                request_id=self.id,
-                _external=True,
-            )
-            rv["content_manifest"] = flask.url_for(
-                "/api/v1.cachito_web_api_v1_get_request_content_manifest",
-                request_id=self.id,
-                _external=True,
-            )
-            rv["environment_variables_info"] = flask.url_for(
-                "/api/v1.cachito_web_api_v1_get_request_environment_variables",
-                request_id=self.id,
-                _external=True,
-            )
-            # Use this list comprehension instead of a RequestState.to_json method to avoid
-            # including redundant information about the request itself
-            states = [_state_to_json(state) for state in self.states]
-            # Reverse the list since the latest states should be first
-            states = list(reversed(states))
-            latest_state = states[0]
-            rv["state_history"] = states
-
-            packages_data = self._get_packages_data()
-            rv["packages"] = packages_data.packages
-            rv["dependencies"] = packages_data.all_dependencies
-
-            dep: Dict[str, Any]
-            for dep in itertools.chain(
-                rv["dependencies"],
-                (pkg_dep for pkg in rv["packages"] for pkg_dep in pkg["dependencies"]),
-            ):
-                dep.setdefault("replaces", None)
-
-            if flask.current_app.config["CACHITO_REQUEST_FILE_LOGS_DIR"]:
+            if wanted("configuration_files"):
+                rv["configuration_files"] = flask.url_for(
+                    "/api/v1.cachito_web_api_v1_get_request_config_files",
+                    request_id=self.id,
+                    _external=True,
+                )
+            if wanted("content_manifest"):
+                rv["content_manifest"] = flask.url_for(
+                    "/api/v1.cachito_web_api_v1_get_request_content_manifest",
+                    request_id=self.id,
+                    _external=True,
+                )
+            if wanted("environment_variables_info"):
+                rv["environment_variables_info"] = flask.url_for(
+                    "/api/v1.cachito_web_api_v1_get_request_environment_variables",
+                    request_id=self.id,
+                    _external=True,
+                )
+            if wanted("state_history"):
+                # Use this list comprehension instead of a RequestState.to_json method to avoid
+                # including redundant information about the request itself
+                states = [_state_to_json(state) for state in self.states]
+                # Reverse the list since the latest states should be first
+                states = list(reversed(states))
+                latest_state = states[0]
+                rv["state_history"] = states
+            else:
+                latest_state = _state_to_json(self.state)
+
+            if wanted("packages", "dependencies"):
+                # The packages data may be shared through the cache, so it must not be modified
+                packages_data = self._get_packages_data()
+                rv["packages"] = [
+                    {**pkg, "dependencies": [_with_replaces(dep) for dep in pkg["dependencies"]]}
+                    for pkg in packages_data.packages
+                ]
+                rv["dependencies"] = [_with_replaces(dep) for dep in packages_data.all_dependencies]
+
+            if flask.current_app.config["CACHITO_REQUEST_FILE_LOGS_DIR"] and wanted("logs"):
                 rv["logs"] = {
                     "url": flask.url_for(
                         "/api/v1.cachito_web_api_v1_get_request_logs",
@@ -496,6 +622,8 @@ class Request(db.Model):  # type: ignore[name-defined]
 
         # Show the latest state information in the first level of the JSON
         rv.update(latest_state)
+        if fields is not None:
+            rv = {key: value for key, value in rv.items() if key in fields}
         return rv
 
     @classmethod
@@ -0,0 +1,104 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+
+import flask
+
+from cachito.common.packages_data import PackagesData
+
+__all__ = ["PackagesDataCache", "load_packages_data"]
+
+log = logging.getLogger(__name__)
+
+
+class PackagesDataCache:
+    """
+    A bounded LRU cache of the parsed packages files of the complete requests.
+
+    The packages file of a complete request never changes, so there is no need to read and parse it
+    on every access. The entries are keyed on the request ID and on the inode, size and mtime of
+    the packages file, so a replaced packages file is loaded again. The size of an entry is
+    approximated by the size of its packages file, and the least recently used entries are evicted
+    once the total size exceeds ``max_size``.
+
+    The cached packages data is shared by all the callers and must not be modified.
+
+    :param int max_size: the maximum total size in bytes of the cached packages files; if 0,
+        nothing is cached
+    :param lookups: an optional Prometheus counter with a ``result`` label, incremented with the
+        ``hit`` or ``miss`` label on each lookup
+    """
+
+    def __init__(self, max_size: int, lookups: Optional[Any] = None):
+        """Initialize the cache."""
+        self.max_size = max_size
+        self._lookups = lookups
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, int, int], PackagesData]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _count(self, result: str) -> None:
+        if self._lookups is not None:
+            self._lookups.labels(result=result).inc()
+
+    def load(self, request_id: int, path: Union[str, Path]) -> PackagesData:
+        """
+        Load the packages file of a complete request, from the cache if possible.
+
+        :param int request_id: the ID of the request
+        :param (str | Path) path: the path of the packages file of the request
+        :return: the packages data, empty if the packages file doesn't exist
+        :rtype: PackagesData
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or self.max_size <= 0:
+            packages_data = PackagesData()
+            packages_data.load(path)
+            return packages_data
+
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(request_id)
+                self._count("hit")
+                return entry[1]
+
+        self._count("miss")
+        packages_data = PackagesData()
+        packages_data.load(path)
+        if stat.st_size > self.max_size:
+            log.debug("The packages file %s is too large to be cached", path)
+            return packages_data
+
+        with self._lock:
+            previous = self._entries.pop(request_id, None)
+            if previous is not None:
+                self._size -= previous[0][1]
+            self._entries[request_id] = (key, packages_data)
+            self._size += stat.st_size
+            while self._size > self.max_size:
+                _, (evicted_key, _) = self._entries.popitem(last=False)
+                self._size -= evicted_key[1]
+
+        return packages_data
+
+
+def load_packages_data(request_id: int, path: Union[str, Path]) -> PackagesData:
+    """
+    Load the packages file of a complete request with the cache of the current Flask app.
+
+    :param int request_id: the ID of the request
+    :param (str | Path) path: the path of the packages file of the request
+    :return: the packages data, which must not be modified
+    :rtype: PackagesData
+    """
+    cache: PackagesDataCache = flask.current_app.extensions["cachito_packages_data_cache"]
+    return cache.load(request_id, path)
@@ -1,13 +1,15 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import json
 from datetime import date, datetime, time
 from operator import itemgetter
-from typing import Union
+from typing import Any, Dict, Iterable, Iterator, Union
 
 from flask import request, url_for
 
 CONTAINER_TYPES = (dict, list)
 SORT_KEY_BY_PURL = itemgetter("purl")
+JSON_CHUNK_SIZE = 64 * 1024
 
 
 def deep_sort_icm(orig_item):
@@ -88,6 +90,26 @@ def pagination_metadata(pagination_query, **kwargs):
     return pagination_data
 
 
+def cursor_pagination_metadata(next_after_id, per_page, **kwargs):
+    """
+    Return a dictionary containing metadata about a query paginated with a cursor.
+
+    This must be run as part of a Flask request.
+
+    :param int next_after_id: the ID of the last item of the page, or None if it's the last page
+    :param int per_page: the number of items per page
+    :param dict kwargs: the query parameters to add to the URLs
+    :return: a dictionary containing metadata about the paginated query
+    """
+    pagination_data = {"next": None, "per_page": per_page}
+    if next_after_id is not None:
+        pagination_data["next"] = url_for(
+            request.endpoint, after_id=next_after_id, per_page=per_page, _external=True, **kwargs
+        )
+
+    return pagination_data
+
+
 def str_to_bool(item):
     """
     Convert a string to a boolean.
@@ -114,3 +136,44 @@ def normalize_end_date(value: Union[datetime, date, None]):
     if isinstance(value, date) and not isinstance(value, datetime):
         return datetime.combine(value, time.max)
     return value
+
+
+def stream_json_document(
+    document: Dict[str, Any], list_key: str, items: Iterable[Any]
+) -> Iterator[bytes]:
+    """
+    Serialize a JSON document incrementally, with one of its lists generated from an iterator.
+
+    Only one item of the list is in memory at a time. The output is the same as
+    ``json.dumps(document, sort_keys=True)`` with ``document[list_key]`` set to the items.
+
+    :param dict document: the document to serialize, the value of ``list_key`` is ignored
+    :param str list_key: the key of the list to generate from the items
+    :param Iterable items: the items of the list
+    :return: an iterator over the chunks of the serialized document
+    :rtype: Iterator[bytes]
+    """
+
+    def generate_parts():
+        yield "{"
+        for i, key in enumerate(sorted(document)):
+            yield f"{', ' if i else ''}{json.dumps(key)}: "
+            if key != list_key:
+                yield json.dumps(document[key], sort_keys=True)
+                continue
+            yield "["
+            for j, item in enumerate(items):
+                yield f"{', ' if j else ''}{json.dumps(item, sort_keys=True)}"
+            yield "]"
+        yield "}"
+
+    buffer = []
+    size = 0
+    for part in generate_parts():
+        buffer.append(part)
+        size += len(part)
+        if size >= JSON_CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    yield "".join(buffer).encode("utf-8")
@@ -0,0 +1,157 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from cachito.common.checksum import hash_file
+from cachito.workers.config import get_worker_config
+
+__all__ = ["BlobStore", "get_blob_store"]
+
+log = logging.getLogger(__name__)
+
+SHA256_RE = re.compile(r"^[a-f0-9]{64}$")
+
+
+class BlobStore:
+    """
+    A content-addressed store of dependency files shared by all the requests.
+
+    Blobs are keyed on their sha256 digest and the files in the request bundle directories are
+    hardlinks to them. The link count of a blob is therefore its reference count: a blob with a
+    single link is no longer used by any request and can be pruned.
+
+    :param (str | Path) root: the root directory of the blob store
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        """Initialize the blob store."""
+        self.root = Path(root)
+
+    def blob_path(self, digest: str) -> Path:
+        """
+        Get the path of the blob with the given digest.
+
+        :param str digest: the sha256 hex digest of the blob
+        :return: the path of the blob
+        :rtype: Path
+        :raises ValueError: if the digest is not a valid sha256 hex digest
+        """
+        if not SHA256_RE.match(digest):
+            raise ValueError(f"Invalid sha256 digest: {digest!r}")
+        return self.root / "sha256" / digest[:2] / digest
+
+    def link(self, digest: str, dest: Union[str, Path]) -> bool:
+        """
+        Link the blob with the given digest to the destination path, if the blob exists.
+
+        :param str digest: the sha256 hex digest of the blob
+        :param (str | Path) dest: the path to link the blob to, it is replaced if it exists
+        :return: True if the blob was linked, False if it is not in the store
+        :rtype: bool
+        """
+        dest = Path(dest)
+        tmp_path = dest.with_name(f".{dest.name}.blob")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(self.blob_path(digest), tmp_path)
+        except FileNotFoundError:
+            return False
+
+        os.replace(tmp_path, dest)
+        log.debug("Linked the blob %s to %s", digest, dest)
+        return True
+
+    def add(self, path: Union[str, Path]) -> str:
+        """
+        Add a file to the store and replace it with a link to the stored blob.
+
+        If a blob with the same content already exists, the file is replaced with a link to it.
+        Otherwise, the file itself becomes the blob.
+
+        :param (str | Path) path: the path of the file to add
+        :return: the sha256 hex digest of the file
+        :rtype: str
+        """
+        path = Path(path)
+        digest = hash_file(path).hexdigest()
+        self._add(path, digest)
+        return digest
+
+    def _add(self, path: Path, digest: str) -> None:
+        blob = self.blob_path(digest)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, blob)
+            log.debug("Stored %s as the blob %s", path, digest)
+        except FileExistsError:
+            if not os.path.samefile(path, blob) and not self.link(digest, path):
+                # The blob was pruned in the meantime, keep the file as is
+                log.debug("The blob %s disappeared while linking it to %s", digest, path)
+
+    def add_tree(self, root: Union[str, Path]) -> int:
+        """
+        Add all the regular files in a directory tree which are not linked to a blob yet.
+
+        A file may have other links than to a blob, such as the files linked from the Go module
+        cache, so every file is hashed to find out if it is linked to its blob. Each file is only
+        hashed once though, even if it is linked several times in the tree.
+
+        :param (str | Path) root: the directory tree to deduplicate
+        :return: the number of files added
+        :rtype: int
+        """
+        added = 0
+        digests: Dict[Tuple[int, int], str] = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = Path(dirpath, filename)
+                if path.is_symlink():
+                    continue
+                stat = path.stat()
+                inode = (stat.st_dev, stat.st_ino)
+                digest = digests.get(inode)
+                if digest is None:
+                    digest = digests[inode] = hash_file(path).hexdigest()
+                blob = self.blob_path(digest)
+                if stat.st_nlink > 1 and blob.exists() and os.path.samefile(path, blob):
+                    continue
+                self._add(path, digest)
+                added += 1
+        return added
+
+    def prune(self, min_age: float) -> List[Path]:
+        """
+        Remove the blobs which are not linked from any request bundle directory.
+
+        :param float min_age: only prune blobs which have not been linked or unlinked in the
+            last ``min_age`` seconds, so that blobs which are being linked are kept
+        :return: the paths of the pruned blobs
+        :rtype: list[Path]
+        """
+        pruned = []
+        threshold = time.time() - min_age
+        for blob in self.root.glob("sha256/*/*"):
+            stat = blob.stat()
+            # The ctime is updated each time the link count changes
+            if stat.st_nlink == 1 and stat.st_ctime < threshold:
+                log.debug("Pruning the unreferenced blob %s", blob)
+                blob.unlink()
+                pruned.append(blob)
+        return pruned
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """
+    Get the blob store of the bundles directory, if enabled in the worker configuration.
+
+    :return: the blob store or None if disabled
+    :rtype: BlobStore
+    """
+    config = get_worker_config()
+    if not config.cachito_blob_store_enabled:
+        return None
+    return BlobStore(Path(config.cachito_bundles_dir, "blobs"))
@@ -0,0 +1,456 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import collections
+import json
+import logging
+import os
+import struct
+import tarfile
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+
+from cachito.common.checksum import hash_file
+from cachito.workers.config import get_worker_config
+
+__all__ = [
+    "BUNDLE_WRITERS",
+    "GzipMembersFile",
+    "IncrementalBundleArchive",
+    "ParallelGzipFile",
+    "open_bundle_archive",
+]
+
+log = logging.getLogger(__name__)
+
+# The same compression level tarfile uses by default for "w:gz"
+COMPRESS_LEVEL = 9
+# Size of the uncompressed blocks handed over to the compression threads (same as pigz)
+DEFAULT_BLOCK_SIZE = 128 * 1024
+# Size of the deflate window; the tail of the previous block is used as the dictionary of the next
+_DICT_SIZE = 32 * 1024
+# Files smaller than this are not worth a gzip member of their own in incremental bundles
+INCREMENTAL_MIN_MEMBER_SIZE = 16 * 1024
+INCREMENTAL_INDEX_VERSION = 1
+
+
+def _gzip_header() -> bytes:
+    # Magic number, deflate, no flags, mtime, no extra flags, unknown OS
+    return struct.pack("<BBBBLBB", 0x1F, 0x8B, 8, 0, int(time.time()), 0, 255)
+
+
+def _compress_block(data: bytes, zdict: bytes, level: int, last: bool) -> bytes:
+    """
+    Compress a block of data into a raw deflate fragment.
+
+    Fragments of consecutive blocks concatenated together form a single deflate stream. All but
+    the last one end with a sync flush so that they are byte aligned and not marked as final.
+
+    :param bytes data: the uncompressed block
+    :param bytes zdict: the uncompressed data preceding this block, used as the preset dictionary
+    :param int level: the compression level
+    :param bool last: whether this is the last block of the stream
+    :return: the compressed fragment
+    :rtype: bytes
+    """
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    flush_mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    return compressor.compress(data) + compressor.flush(flush_mode)
+
+
+class ParallelGzipFile:
+    """
+    A write-only file object producing a gzip file with blocks compressed in parallel.
+
+    Like pigz, the input is split into fixed size blocks which are compressed by a pool of threads
+    (zlib releases the GIL while compressing), using the tail of the previous block as the
+    dictionary. The compressed fragments are written in order, resulting in a standard single
+    member gzip file.
+
+    :param (str | Path) path: the path of the gzip file to create
+    :param int threads: the number of compression threads
+    :param int block_size: the size of the uncompressed blocks
+    :param int level: the compression level
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        threads: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        level: int = COMPRESS_LEVEL,
+    ):
+        """Open the gzip file for writing and start the compression threads."""
+        self.name = str(path)
+        self._threads = threads or os.cpu_count() or 1
+        self._block_size = block_size
+        self._level = level
+        self._buffer = bytearray()
+        self._dict = b""
+        self._crc = 0
+        self._size = 0
+        self._pending: Deque[Future] = collections.deque()
+        self._executor = ThreadPoolExecutor(max_workers=self._threads)
+        self._file = open(path, "wb")
+        self._file.write(_gzip_header())
+        self.closed = False
+
+    def _submit(self, data: bytes, last: bool = False) -> None:
+        self._pending.append(
+            self._executor.submit(_compress_block, data, self._dict, self._level, last)
+        )
+        self._dict = data[-_DICT_SIZE:]
+        # Bound the memory used by blocks waiting to be written out
+        while len(self._pending) > 2 * self._threads:
+            self._file.write(self._pending.popleft().result())
+
+    def write(self, data: bytes) -> int:
+        """
+        Write the uncompressed data.
+
+        :param bytes data: the data to compress
+        :return: the number of bytes written
+        :rtype: int
+        :raises ValueError: if the file is closed
+        """
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[: self._block_size])
+            del self._buffer[: self._block_size]
+            self._submit(block)
+
+        return len(data)
+
+    def tell(self) -> int:
+        """Return the number of uncompressed bytes written so far."""
+        return self._size
+
+    def close(self) -> None:
+        """Compress the remaining data, write the gzip trailer and close the file."""
+        if self.closed:
+            return
+
+        try:
+            self._submit(bytes(self._buffer), last=True)
+            self._buffer.clear()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+            self._file.write(struct.pack("<LL", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self._close_file()
+
+    def _close_file(self) -> None:
+        self.closed = True
+        self._executor.shutdown(cancel_futures=True)
+        self._file.close()
+
+    def __enter__(self) -> "ParallelGzipFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        elif not self.closed:
+            # Don't write the trailer of a file which failed to be written, so that the truncated
+            # gzip file can't pass for a complete one
+            self._close_file()
+
+
+class GzipMembersFile:
+    """
+    A write-only file object producing a gzip file made of several members.
+
+    The caller decides where a member ends. A member can also be copied verbatim from another
+    gzip file, which is how incremental bundles reuse the compressed data of a previous bundle.
+
+    :param (str | Path) path: the path of the gzip file to create
+    :param int level: the compression level
+    """
+
+    def __init__(self, path: Union[str, Path], level: int = COMPRESS_LEVEL):
+        """Open the gzip file for writing."""
+        self.name = str(path)
+        self._level = level
+        self._compressor: Optional["zlib._Compress"] = None
+        self._member_offset = 0
+        self._member_crc = 0
+        self._member_size = 0
+        self._size = 0
+        self._file = open(path, "wb")
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        """
+        Write the uncompressed data to the current member, starting a new one if needed.
+
+        :param bytes data: the data to compress
+        :return: the number of bytes written
+        :rtype: int
+        :raises ValueError: if the file is closed
+        """
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        if self._compressor is None:
+            self._member_offset = self._file.tell()
+            self._member_crc = 0
+            self._member_size = 0
+            self._compressor = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._file.write(_gzip_header())
+
+        self._member_crc = zlib.crc32(data, self._member_crc)
+        self._member_size += len(data)
+        self._size += len(data)
+        self._file.write(self._compressor.compress(data))
+        return len(data)
+
+    def end_member(self) -> Optional[Tuple[int, int, int]]:
+        """
+        End the current member, if any.
+
+        :return: the offset and length of the compressed member and its uncompressed size, or
+            None if no member was started
+        :rtype: tuple[int, int, int]
+        """
+        if self._compressor is None:
+            return None
+
+        self._file.write(self._compressor.flush())
+        self._file.write(struct.pack("<LL", self._member_crc, self._member_size & 0xFFFFFFFF))
+        self._compressor = None
+        return self._member_offset, self._file.tell() - self._member_offset, self._member_size
+
+    def copy_member(self, src: BinaryIO, offset: int, length: int, size: int) -> int:
+        """
+        Copy a compressed member from another gzip file, ending the current member first.
+
+        :param BinaryIO src: the gzip file to copy the member from
+        :param int offset: the offset of the member in the source file
+        :param int length: the length of the compressed member
+        :param int size: the uncompressed size of the member
+        :return: the offset of the copied member in this file
+        :rtype: int
+        """
+        self.end_member()
+        new_offset = self._file.tell()
+        src.seek(offset)
+        remaining = length
+        while remaining:
+            chunk = src.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                raise EOFError(f"Unexpected end of file while copying a member from {src.name}")
+            self._file.write(chunk)
+            remaining -= len(chunk)
+        self._size += size
+        return new_offset
+
+    def tell(self) -> int:
+        """Return the number of uncompressed bytes written so far."""
+        return self._size
+
+    def close(self) -> None:
+        """End the current member and close the file."""
+        if self.closed:
+            return
+
+        try:
+            self.end_member()
+        finally:
+            self.closed = True
+            self._file.close()
+
+    def __enter__(self) -> "GzipMembersFile":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class IncrementalBundleArchive:
+    """
+    A bundle archive reusing the compressed files of a previous bundle.
+
+    Each large enough regular file is written as a gzip member of its own, recorded in an index
+    keyed on the file name, mode and content digest. When the previous bundle of the same
+    repository has a member for the same key, its compressed bytes are copied as is instead of
+    compressing the file again, so reused entries keep the modification time they had in the
+    previous bundle. The uncompressed stream of the concatenated members is a valid tar archive
+    since every member holds whole tar entries.
+
+    :param Path path: the path of the bundle archive to create
+    :param Path index_path: the path to write the index of the bundle archive to
+    :param Path previous_path: the path of the previous bundle archive
+    :param Path previous_index_path: the path of the index of the previous bundle archive
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        index_path: Path,
+        previous_path: Optional[Path] = None,
+        previous_index_path: Optional[Path] = None,
+    ):
+        """Open the bundle archive for writing."""
+        self._index_path = index_path
+        self._index: Dict[str, Tuple[int, int, int]] = {}
+        self._previous_file: Optional[BinaryIO] = None
+        self._previous_index: Dict[str, Tuple[int, int, int]] = {}
+        if previous_path and previous_index_path:
+            self._open_previous(previous_path, previous_index_path)
+        self.reused_count = 0
+        self._fileobj = GzipMembersFile(path)
+        self._tar = tarfile.open(fileobj=cast(BinaryIO, self._fileobj), mode="w")
+
+    def _open_previous(self, previous_path: Path, previous_index_path: Path) -> None:
+        try:
+            previous_file = open(previous_path, "rb")
+            index = json.loads(previous_index_path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning("Not reusing the previous bundle archive %s: %s", previous_path, e)
+            return
+
+        if (
+            index.get("version") != INCREMENTAL_INDEX_VERSION
+            or index.get("archive_size") != os.fstat(previous_file.fileno()).st_size
+        ):
+            log.warning("The index %s doesn't match %s", previous_index_path, previous_path)
+            previous_file.close()
+            return
+
+        self._previous_file = previous_file
+        self._previous_index = {key: tuple(value) for key, value in index["members"].items()}
+
+    def add(self, name: str, arcname: str, filter: Optional[Callable] = None) -> None:
+        """
+        Add a file or a directory tree to the archive, like ``TarFile.add``.
+
+        :param str name: the path of the file or directory to add
+        :param str arcname: the name of the file or directory in the archive
+        :param filter: a function taking a ``TarInfo`` and returning it, possibly modified, or
+            None to exclude it
+        """
+        tarinfo = self._tar.gettarinfo(name, arcname)
+        if tarinfo is None:
+            log.warning("Skipping the unsupported file %s", name)
+            return
+        if filter is not None:
+            tarinfo = filter(tarinfo)
+            if tarinfo is None:
+                return
+
+        if tarinfo.isreg():
+            self._add_file(name, tarinfo)
+        elif tarinfo.isdir():
+            self._tar.addfile(tarinfo)
+            for entry in sorted(os.listdir(name)):
+                self.add(os.path.join(name, entry), os.path.join(arcname, entry), filter)
+        else:
+            self._tar.addfile(tarinfo)
+
+    def _add_file(self, name: str, tarinfo: tarfile.TarInfo) -> None:
+        if tarinfo.size < INCREMENTAL_MIN_MEMBER_SIZE:
+            with open(name, "rb") as f:
+                self._tar.addfile(tarinfo, f)
+            return
+
+        key = f"{tarinfo.name}:{tarinfo.mode:o}:{hash_file(name).hexdigest()}"
+        previous_member = self._previous_index.get(key)
+        if previous_member and self._previous_file:
+            offset, length, size = previous_member
+            new_offset = self._fileobj.copy_member(self._previous_file, offset, length, size)
+            # Keep the tar offset in sync with the uncompressed data copied behind its back
+            self._tar.offset += size
+            self._index[key] = (new_offset, length, size)
+            self.reused_count += 1
+            return
+
+        self._fileobj.end_member()
+        with open(name, "rb") as f:
+            self._tar.addfile(tarinfo, f)
+        member = self._fileobj.end_member()
+        if member:
+            self._index[key] = member
+
+    def _close_files(self) -> None:
+        self._fileobj.close()
+        if self._previous_file:
+            self._previous_file.close()
+
+    def close(self) -> None:
+        """Finish the archive and write its index."""
+        try:
+            self._tar.close()
+        finally:
+            self._close_files()
+
+        log.info("Reused %d files from the previous bundle archive", self.reused_count)
+        index = {
+            "version": INCREMENTAL_INDEX_VERSION,
+            "archive_size": os.path.getsize(self._fileobj.name),
+            "members": self._index,
+        }
+        self._index_path.write_text(json.dumps(index))
+
+    def __enter__(self) -> "IncrementalBundleArchive":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Like TarFile, don't finish an archive which failed to be written
+            self._close_files()
+
+
+@contextmanager
+def _gzip_writer(path: Path) -> Iterator[tarfile.TarFile]:
+    with tarfile.open(path, mode="w:gz") as archive:
+        yield archive
+
+
+@contextmanager
+def _parallel_gzip_writer(path: Path) -> Iterator[tarfile.TarFile]:
+    threads = get_worker_config().cachito_bundle_compression_threads
+    with ParallelGzipFile(path, threads=threads) as fileobj:
+        with tarfile.open(fileobj=cast(BinaryIO, fileobj), mode="w") as archive:
+            yield archive
+
+
+# Names accepted by the cachito_bundle_writer configuration
+BUNDLE_WRITERS: Dict[str, Callable[[Path], ContextManager[tarfile.TarFile]]] = {
+    "gzip": _gzip_writer,
+    "parallel-gzip": _parallel_gzip_writer,
+}
+
+
+def open_bundle_archive(path: Path) -> ContextManager[tarfile.TarFile]:
+    """
+    Open a bundle archive for writing with the writer set in the worker configuration.
+
+    :param Path path: the path of the bundle archive to create
+    :return: a context manager yielding the ``TarFile`` to add the bundle contents to
+    """
+    writer = get_worker_config().cachito_bundle_writer
+    log.debug("Using the %s writer for %s", writer, path)
+    return BUNDLE_WRITERS[writer](path)
@@ -5,8 +5,10 @@ from datetime import datetime, timedelta
 import requests
 
 from cachito.errors import NetworkError
+from cachito.workers.blob_store import get_blob_store
 from cachito.workers.config import get_worker_config
 from cachito.workers.requests import get_requests_session
+from cachito.workers.scm import prune_git_mirrors
 
 log = logging.getLogger(__name__)
 
@@ -27,6 +29,16 @@ def main():
         stale_candidate_requests = find_all_requests_in_state(state)
         identify_and_mark_stale_requests(stale_candidate_requests)
 
+    blob_store = get_blob_store()
+    if blob_store:
+        pruned = blob_store.prune(
+            timedelta(config.cachito_blob_store_prune_age_days).total_seconds()
+        )
+        log.info("Pruned %d unreferenced blobs from %s", len(pruned), blob_store.root)
+
+    pruned = prune_git_mirrors(timedelta(config.cachito_git_mirror_prune_age_days).total_seconds())
+    log.info("Pruned %d unused Git mirrors from %s", len(pruned), config.cachito_sources_dir)
+
 
 def find_all_requests_in_state(state):
     """
@@ -39,9 +51,11 @@ def find_all_requests_in_state(state):
     found_requests = []
 
     url = f"{config.cachito_api_url.rstrip('/')}/requests"
+    # Use cursor pagination, the next URLs contain all the query parameters
+    params = {"state": state, "after_id": 0}
     while url:
         try:
-            response = session.get(url, params={"state": state}, timeout=config.cachito_api_timeout)
+            response = session.get(url, params=params, timeout=config.cachito_api_timeout)
         except requests.RequestException:
             msg = f"The connection failed when querying {url}"
             log.exception(msg)
@@ -61,10 +75,9 @@ def find_all_requests_in_state(state):
         json_response = response.json()
         found_requests.extend(json_response["items"])
         url = json_response["meta"]["next"]
+        params = None
 
-    # Remove potential duplicates found due to the dynamic behaviour of pagination
-    deduplicated = {request["id"]: request for request in found_requests}
-    return list(deduplicated.values())
+    return found_requests
 
 
 def identify_and_mark_stale_requests(requests_json):
@@ -28,6 +28,12 @@ class Config(object):
     cachito_archives_default_age_days = 730
     cachito_archives_minimum_age_days = 365
     cachito_auth_type: Optional[str] = None
+    cachito_blob_store_enabled = False
+    cachito_blob_store_prune_age_days = 1
+    cachito_bundle_compression_threads: Optional[int] = None
+    cachito_bundle_incremental = False
+    cachito_bundle_streaming = False
+    cachito_bundle_writer = "gzip"
     cachito_default_environment_variables = {
         "gomod": {
             "GOSUMDB": {"value": "off", "kind": "literal"},
@@ -40,6 +46,9 @@ class Config(object):
         },
     }
     cachito_deps_patch_batch_size = 50
+    cachito_git_mirror_prune_age_days = 30
+    cachito_gomod_cache_dir: Optional[str] = None
+    cachito_gomod_cache_max_size = 10 * 1024 * 1024 * 1024
     cachito_gomod_download_max_tries = 5
     cachito_gomod_ignore_missing_gomod_file = True
     cachito_gomod_strict_vendor = False
@@ -62,6 +71,8 @@ class Config(object):
     cachito_nexus_request_repo_prefix = "cachito-"
     cachito_nexus_timeout = 60
     cachito_nexus_username = "cachito"
+    cachito_packages_data_indexed = False
+    cachito_pip_concurrency_limit = 5
     cachito_npm_file_deps_allowlist: Dict[str, List[str]] = {}
     cachito_yarn_file_deps_allowlist: Dict[str, List[str]] = {}
     cachito_request_file_logs_dir: Optional[str] = None
@@ -72,6 +83,8 @@ class Config(object):
     cachito_request_file_logs_perm = 0o660
     cachito_request_lifetime = 1
     cachito_request_lifetime_failed = 7
+    cachito_rubygems_concurrency_limit = 5
+    cachito_subpaths_concurrency_limit = 1
     cachito_subprocess_timeout = 3600  # 1 hour
     cachito_task_log_format = (
         "[%(asctime)s #%(request_id)s %(name)s %(levelname)s %(module)s.%(funcName)s] %(message)s"
@@ -218,6 +231,17 @@ def validate_celery_config(conf, **kwargs):
     if not conf.get("cachito_api_url"):
         raise ConfigError('The configuration "cachito_api_url" must be set')
 
+    if conf.get("cachito_bundle_writer", "gzip") not in ("gzip", "parallel-gzip"):
+        raise ConfigError(
+            'The configuration "cachito_bundle_writer" must be one of "gzip" or "parallel-gzip"'
+        )
+
+    if conf.get("cachito_bundle_streaming") and conf.get("cachito_bundle_incremental"):
+        raise ConfigError(
+            'The configurations "cachito_bundle_streaming" and "cachito_bundle_incremental" '
+            "can't be both set, the incremental bundle archives are never created when streaming"
+        )
+
     hoster_username = conf.get("cachito_nexus_hoster_username")
     hoster_password = conf.get("cachito_nexus_hoster_password")
     if (hoster_username or hoster_password) and not (hoster_username and hoster_password):
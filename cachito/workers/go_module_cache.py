@@ -0,0 +1,225 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from cachito.workers.config import get_worker_config
+
+__all__ = ["GoModuleCache", "get_go_module_cache"]
+
+log = logging.getLogger(__name__)
+
+# The files of the GOPROXY protocol which never change for a given module version
+MODULE_FILE_SUFFIXES = (".info", ".mod", ".zip")
+
+
+class GoModuleCache:
+    """
+    A long-lived cache of Go modules and of the Go build cache shared by the gomod requests.
+
+    The downloaded modules are stored in the layout of the GOPROXY protocol, so the cache is used
+    as a ``file://`` proxy in front of Athens. Each request still downloads its modules to its own
+    module cache, whose ``cache/download`` tree is added to the bundle, but the modules already in
+    this cache are copied from the local filesystem instead of being fetched from Athens.
+
+    The cache also stores the output of ``go list`` for the module graphs it has already seen, so
+    that repeated requests for the same sources do not need to load the package graph again.
+
+    The least recently used module versions are evicted once the cache exceeds ``max_size``, at
+    the end of each request. Files are only ever added and removed atomically, so eviction can run
+    while other requests use the cache: a module which disappears is fetched from Athens instead,
+    and the files which are already open can still be read. Only one eviction runs at a time.
+
+    :param (str | Path) root: the root directory of the cache
+    :param int max_size: the maximum total size in bytes of the cached modules and package lists
+    """
+
+    def __init__(self, root: Union[str, Path], max_size: int):
+        """Initialize the cache."""
+        self.root = Path(root)
+        self.max_size = max_size
+
+    @property
+    def download_dir(self) -> Path:
+        """Get the directory of the cached modules, in the layout of the GOPROXY protocol."""
+        return self.root / "download"
+
+    @property
+    def build_cache_dir(self) -> Path:
+        """Get the directory to use as GOCACHE, which the Go toolchain trims by itself."""
+        return self.root / "build"
+
+    @property
+    def package_lists_dir(self) -> Path:
+        """Get the directory of the cached go list output."""
+        return self.root / "lists"
+
+    @property
+    def proxy_url(self) -> str:
+        """Get the URL to add to GOPROXY to use the cached modules."""
+        return self.download_dir.absolute().as_uri()
+
+    @contextlib.contextmanager
+    def _evict_lock(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".evict.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            yield
+
+    @contextlib.contextmanager
+    def use(self) -> Iterator["GoModuleCache"]:
+        """
+        Use the cache for the duration of a request, then evict modules if it is too large.
+
+        :return: a context manager yielding the cache
+        """
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        self.build_cache_dir.mkdir(parents=True, exist_ok=True)
+        yield self
+
+        try:
+            self.evict()
+        except BlockingIOError:
+            log.debug("The Go module cache is being evicted by another request")
+
+    def add(self, download_dir: Union[str, Path]) -> int:
+        """
+        Add the modules downloaded by a request to the cache.
+
+        The modules already in the cache are marked as recently used. The version lists are not
+        added, so that queries for the latest versions are always answered by Athens. The files are
+        hardlinked into the cache when it is on the same filesystem, and copied otherwise.
+
+        :param (str | Path) download_dir: the ``cache/download`` directory of a Go module cache
+        :return: the number of files added
+        :rtype: int
+        """
+        added = 0
+        for path in _iter_module_files(download_dir):
+            dest = self.download_dir / path.relative_to(download_dir)
+            try:
+                os.utime(dest)
+                continue
+            except FileNotFoundError:
+                pass
+
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = dest.with_name(f".{dest.name}.tmp{os.getpid()}")
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            # Readers never see a partially written file
+            os.replace(tmp_path, dest)
+            added += 1
+
+        log.debug("Added %d files to the Go module cache", added)
+        return added
+
+    def load_package_list(self, key: str) -> Optional[dict[str, Any]]:
+        """
+        Load the cached go list output for a key and mark it as recently used.
+
+        :param str key: the key computed from the inputs of go list
+        :return: the cached output or None if it is not in the cache
+        :rtype: dict
+        """
+        path = self.package_lists_dir / f"{key}.json"
+        try:
+            with open(path) as f:
+                package_list = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return package_list
+
+    def store_package_list(self, key: str, package_list: dict[str, Any]) -> None:
+        """
+        Store the go list output for a key in the cache.
+
+        :param str key: the key computed from the inputs of go list
+        :param dict package_list: the output to cache, which must be serializable to JSON
+        """
+        path = self.package_lists_dir / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            json.dump(package_list, f)
+        os.replace(tmp_path, path)
+
+    def evict(self) -> List[Path]:
+        """
+        Remove the least recently used entries until the cache fits its maximum size.
+
+        The files of a module version are evicted together, as of the latest use of any of them.
+        The ``.info`` file is removed first, so that Go never finds a version without its
+        metadata.
+
+        :return: the paths of the evicted files
+        :rtype: list[Path]
+        :raises BlockingIOError: if another eviction is running
+        """
+        with self._evict_lock():
+            groups: Dict[Tuple[Path, str], List[Path]] = defaultdict(list)
+            for path in _iter_module_files(self.download_dir):
+                groups[path.parent, path.stem].append(path)
+            for path in self.package_lists_dir.glob("*.json"):
+                groups[path.parent, path.stem].append(path)
+
+            entries = []
+            total_size = 0
+            for paths in groups.values():
+                # The suffixes sort as .info, .mod then .zip
+                paths.sort()
+                try:
+                    stats = [path.stat() for path in paths]
+                except FileNotFoundError:
+                    # The file was replaced or removed since it was listed, keep it for now
+                    continue
+                size = sum(stat.st_size for stat in stats)
+                entries.append((max(stat.st_mtime for stat in stats), size, paths))
+                total_size += size
+
+            evicted = []
+            entries.sort(key=lambda entry: entry[0])
+            for _, size, paths in entries:
+                if total_size <= self.max_size:
+                    break
+                for path in paths:
+                    log.debug("Evicting %s from the Go module cache", path)
+                    path.unlink(missing_ok=True)
+                    evicted.append(path)
+                total_size -= size
+
+        return evicted
+
+
+def _iter_module_files(download_dir: Union[str, Path]) -> Iterator[Path]:
+    """Iterate over the module files in a directory with the layout of the GOPROXY protocol."""
+    for dirpath, _, filenames in os.walk(download_dir):
+        # The checksum database is not part of the modules
+        if Path(dirpath).name != "@v":
+            continue
+        for filename in filenames:
+            if filename.endswith(MODULE_FILE_SUFFIXES) and not filename.startswith("."):
+                yield Path(dirpath, filename)
+
+
+def get_go_module_cache() -> Optional[GoModuleCache]:
+    """
+    Get the shared Go module cache, if enabled in the worker configuration.
+
+    :return: the Go module cache or None if disabled
+    :rtype: GoModuleCache
+    """
+    config = get_worker_config()
+    if not config.cachito_gomod_cache_dir:
+        return None
+    return GoModuleCache(config.cachito_gomod_cache_dir, config.cachito_gomod_cache_max_size)
@@ -57,6 +57,8 @@ class SourcesDir(base_path):
         repo_relative_dir = pathlib.Path(*repo_name.split("/"))
         self.package_dir = self.joinpath(repo_relative_dir)
         self.archive_path = self.joinpath(repo_relative_dir, f"{ref}.tar.gz")
+        self.mirror_path = self.joinpath(repo_relative_dir, "mirror.git")
+        self.mirror_lock_path = self.joinpath(repo_relative_dir, "mirror.lock")
 
         log.debug("Ensure directory %s exists.", self.package_dir)
         self.package_dir.mkdir(parents=True, exist_ok=True)
@@ -1,10 +1,14 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
 import collections
 import logging
 import os
+import shutil
+import tempfile
 import urllib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar, Union
 
 import aiohttp
 import aiohttp_retry
@@ -14,6 +18,7 @@ from opentelemetry import trace
 from cachito.common.checksum import hash_file
 from cachito.errors import InvalidChecksum, InvalidRequestData, NetworkError, UnknownHashAlgorithm
 from cachito.workers import nexus
+from cachito.workers.blob_store import SHA256_RE, get_blob_store
 from cachito.workers.config import get_worker_config
 from cachito.workers.requests import (
     SAFE_REQUEST_METHODS,
@@ -34,6 +39,9 @@ ChecksumInfo = collections.namedtuple("ChecksumInfo", "algorithm hexdigest")
 
 pkg_requests_session = get_requests_session(retry_options={"allowed_methods": SAFE_REQUEST_METHODS})
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 def _get_request_url(request_id):
     """
@@ -144,17 +152,29 @@ def verify_checksum(file_path: str, checksum_info: ChecksumInfo, chunk_size: int
 
 
 @tracer.start_as_current_span("download_binary_file")
-def download_binary_file(url, download_path, auth=None, insecure=False, chunk_size=8192):
+def download_binary_file(
+    url, download_path, auth=None, insecure=False, chunk_size=8192, sha256=None
+):
     """
     Download a binary file (such as a TAR archive) from a URL.
 
+    If the blob store is enabled, the downloaded file is added to it. When the expected sha256
+    digest is known and the blob store already has it, the blob is linked instead of downloaded.
+
     :param str url: URL for file download
     :param (str | Path) download_path: Path to download file to
     :param requests.auth.AuthBase auth: Authentication for the URL
     :param bool insecure: Do not verify SSL for the URL
     :param int chunk_size: Chunk size param for Response.iter_content()
+    :param str sha256: the expected sha256 hex digest of the file, if known
     :raise NetworkError: If download failed
     """
+    blob_store = get_blob_store()
+    if blob_store and sha256 and SHA256_RE.match(sha256):
+        if blob_store.link(sha256, download_path):
+            log.debug("Found %s in the blob store, skipping the download", url)
+            return
+
     try:
         resp = pkg_requests_session.get(
             url, stream=True, verify=not insecure, auth=auth
@@ -163,10 +183,46 @@ def download_binary_file(url, download_path, auth=None, insecure=False, chunk_si
     except requests.RequestException as e:
         raise NetworkError(f"Could not download {url}: {e}")
 
-    with open(download_path, "wb") as f:
+    with replace_file(download_path) as f:
         for chunk in resp.iter_content(chunk_size=chunk_size):
             f.write(chunk)
 
+    if blob_store:
+        blob_store.add(download_path)
+
+
+@contextmanager
+def replace_file(path: Union[str, Path]) -> Iterator[BinaryIO]:
+    """
+    Open a temporary file for writing, which replaces the file at the given path once written.
+
+    The files of the request bundle directories may be links to blobs shared by all the requests,
+    so they must never be modified in place. If writing the file fails, the file at the given path
+    is left untouched.
+
+    :param (str | Path) path: the path of the file to write
+    :return: a context manager yielding the temporary file opened for binary writing
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def copy_file(src_path: Union[str, Path], dst_path: Union[str, Path]) -> None:
+    """
+    Copy a file without modifying the destination file in place, see replace_file().
+
+    :param (str | Path) src_path: the path of the file to copy
+    :param (str | Path) dst_path: the path of the copy
+    """
+    with open(src_path, "rb") as src, replace_file(dst_path) as dst:
+        shutil.copyfileobj(src, dst)
+
 
 async def async_download_binary_file(
     session: aiohttp_retry.RetryClient,
@@ -190,7 +246,7 @@ async def async_download_binary_file(
     try:
         log.debug(f"Download started - {tarball_name}")
         async with session.get(url, auth=auth, raise_for_status=True) as resp:
-            with open(os.path.join(download_dir, tarball_name), "wb") as f:
+            with replace_file(os.path.join(download_dir, tarball_name)) as f:
                 while True:
                     chunk = await resp.content.read(chunk_size)
                     if not chunk:
@@ -211,6 +267,50 @@ async def async_download_binary_file(
     log.debug(f"Download completed - {tarball_name}")
 
 
+def download_concurrently(
+    download: Callable[[T], R], items: Iterable[T], concurrency_limit: int
+) -> List[R]:
+    """
+    Call a blocking download function on each item, with a limited number of concurrent calls.
+
+    The calls run in worker threads of an asyncio event loop and are started in the order of the
+    items. Once a call fails, no new call is started. The running calls are awaited, then the
+    exception of the first failed item in the order of the items is raised, so the reported error
+    doesn't depend on the order in which the downloads complete.
+
+    :param download: the function downloading a single item
+    :param items: the items to download
+    :param int concurrency_limit: the maximum number of concurrent calls
+    :return: the return values of the calls, in the order of the items
+    """
+    return asyncio.run(_download_concurrently(download, list(items), max(concurrency_limit, 1)))
+
+
+async def _download_concurrently(
+    download: Callable[[T], R], items: List[T], concurrency_limit: int
+) -> List[R]:
+    semaphore = asyncio.Semaphore(concurrency_limit)
+    failed = False
+
+    async def download_item(item: T) -> Optional[R]:
+        nonlocal failed
+        async with semaphore:
+            if failed:
+                return None
+            try:
+                # The context is copied to the thread, which keeps the tracing context
+                return await asyncio.to_thread(download, item)
+            except Exception:
+                failed = True
+                raise
+
+    results = await asyncio.gather(*map(download_item, items), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
 @tracer.start_as_current_span("download_raw_component")
 def download_raw_component(raw_component_name, raw_repo_name, download_path, nexus_auth):
     """
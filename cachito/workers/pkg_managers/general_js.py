@@ -13,6 +13,7 @@ import shutil
 import tarfile
 import tempfile
 import textwrap
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Collection, Dict, List, NoReturn, Optional, Set, Union
@@ -63,6 +64,9 @@ tracer = trace.get_tracer(__name__)
 
 NPM_REGISTRY_CNAMES = ("registry.npmjs.org", "registry.yarnpkg.com")
 
+# Guards the skip_deps sets shared by the subpaths of a request processed concurrently
+_skip_deps_lock = threading.Lock()
+
 
 def is_from_npm_registry(pkg_url):
     """
@@ -210,7 +214,8 @@ def download_dependencies(
     :type deps: list[dict[str, any]]
     :param str proxy_repo_url: the Nexus proxy repository URL to use as the registry
     :param set[str] skip_deps: a set of dependency identifiers to not download because they've
-        already been downloaded for this request.
+        already been downloaded for this request. The identifiers of the dependencies downloaded
+        by this call are added to it, so the same set can be shared by concurrent calls.
     :param str pkg_manager: the name of the package manager to download dependencies for, affects
         destination directory and logging output (npm is used to do the actual download regardless)
     :return: a set of dependency identifiers that were downloaded
@@ -245,7 +250,11 @@ def download_dependencies(
         elif dep["version"].startswith("file:"):
             log.debug("Not downloading %s since it is a file dependency", dep_identifier)
             continue
-        elif dep_identifier in skip_deps:
+
+        with _skip_deps_lock:
+            already_downloaded = dep_identifier in skip_deps
+            skip_deps.add(dep_identifier)
+        if already_downloaded:
             log.debug(
                 "Not downloading %s since it was already downloaded previously", dep_identifier
             )
@@ -1,16 +1,23 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import contextlib
+import fcntl
 import functools
+import hashlib
+import heapq
+import json
 import logging
 import os
 import os.path
+import platform
 import re
 import shutil
+import sys
 import tempfile
 from dataclasses import dataclass
 from datetime import datetime
 from itertools import chain
 from pathlib import Path, PureWindowsPath
-from typing import Any, Iterable, Iterator, List, Literal, Optional, Tuple, Union
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
 
 import backoff
 import git
@@ -32,6 +39,7 @@ from cachito.errors import (
 from cachito.workers import load_json_stream, run_cmd
 from cachito.workers.config import get_worker_config
 from cachito.workers.errors import CachitoCalledProcessError
+from cachito.workers.go_module_cache import get_go_module_cache
 from cachito.workers.paths import RequestBundleDir
 
 __all__ = [
@@ -47,6 +55,11 @@ tracer = trace.get_tracer(__name__)
 
 MODULE_VERSION_RE = re.compile(r"/v\d+$")
 
+# The files besides the Go sources which determine the output of go list
+GO_LIST_INPUT_FILES = {"go.mod", "go.sum", "go.work", "go.work.sum", "modules.txt"}
+# The version of the go list output stored in the Go module cache, to bump when its format changes
+GO_LIST_CACHE_VERSION = 1
+
 
 class _GolangModel(pydantic.BaseModel):
     """Attributes automatically get PascalCase aliases to make parsing Golang JSON easier.
@@ -111,12 +124,16 @@ class LocalModules:
 
     @staticmethod
     def from_json_stream(modules_json_stream: str, app_source_path: Path) -> "LocalModules":
+        return LocalModules.from_modules(
+            map(GoModule.parse_obj, load_json_stream(modules_json_stream)), app_source_path
+        )
+
+    @staticmethod
+    def from_modules(modules: Iterable[GoModule], app_source_path: Path) -> "LocalModules":
         main_module = None
         workspaces = []
 
-        for item in load_json_stream(modules_json_stream):
-            module = GoModule.parse_obj(item)
-
+        for module in modules:
             if module.dir == app_source_path:
                 main_module = module
             else:
@@ -347,7 +364,9 @@ def resolve_gomod(
 
     worker_config = get_worker_config()
     athens_url = worker_config.cachito_athens_url
-    with GoCacheTemporaryDirectory(prefix="cachito-") as temp_dir:
+    go_module_cache = get_go_module_cache()
+    with contextlib.ExitStack() as stack:
+        temp_dir = stack.enter_context(GoCacheTemporaryDirectory(prefix="cachito-"))
         env = {
             "GOPATH": temp_dir,
             "GO111MODULE": "on",
@@ -357,6 +376,11 @@ def resolve_gomod(
             "GOMODCACHE": "{}/pkg/mod".format(temp_dir),
             "GOTOOLCHAIN": "auto",
         }
+        if go_module_cache:
+            # Fall back to Athens for the modules which are not in the shared cache yet
+            stack.enter_context(go_module_cache.use())
+            env["GOPROXY"] = f"{go_module_cache.proxy_url},{env['GOPROXY']}"
+            env["GOCACHE"] = str(go_module_cache.build_cache_dir)
         if "cgo-disable" in request.get("flags", []):
             env["CGO_ENABLED"] = "0"
 
@@ -398,6 +422,10 @@ def resolve_gomod(
         if "force-gomod-tidy" in flags or dep_replacements:
             go(["mod", "tidy"], run_params)
 
+        tmp_download_cache_dir = os.path.join(temp_dir, RequestBundleDir.go_mod_cache_download_part)
+        if go_module_cache and os.path.exists(tmp_download_cache_dir):
+            go_module_cache.add(tmp_download_cache_dir)
+
         bundle_dir = RequestBundleDir(request["id"])
         if should_vendor:
             # Create an empty gomod cache in the bundle directory so that any Cachito
@@ -405,9 +433,6 @@ def resolve_gomod(
             bundle_dir.gomod_download_dir.mkdir(exist_ok=True, parents=True)
         else:
             # Add the gomod cache to the bundle the user will later download
-            tmp_download_cache_dir = os.path.join(
-                temp_dir, RequestBundleDir.go_mod_cache_download_part
-            )
             if not os.path.exists(tmp_download_cache_dir):
                 os.makedirs(tmp_download_cache_dir, exist_ok=True)
 
@@ -423,26 +448,39 @@ def resolve_gomod(
             # Make Go ignore the vendor dir even if there is one
             go_list.extend(["-mod", "readonly"])
 
-        local_modules = LocalModules.from_json_stream(
-            go([*go_list, "-m", "-json"], run_params).rstrip(),
+        package_list = None
+        if go_module_cache:
+            cache_key = _go_list_cache_key(go, go_list, run_params, app_source_path, git_dir_path)
+            package_list = go_module_cache.load_package_list(cache_key)
+            if package_list is not None and not _is_valid_cached_package_list(package_list):
+                log.warning("Ignoring the invalid cached package list %s", cache_key)
+                package_list = None
+            if package_list is not None:
+                log.info("Using the cached package list %s", cache_key)
+        if package_list is None:
+            package_list = _go_list(go, go_list, run_params, git_dir_path)
+            if go_module_cache:
+                go_module_cache.store_package_list(cache_key, package_list)
+
+        local_modules = LocalModules.from_modules(
+            (
+                GoModule.parse_obj(
+                    {**module, "Dir": os.path.normpath(os.path.join(git_dir_path, module["Dir"]))}
+                )
+                for module in package_list["modules"]
+            ),
             app_source_path,
         )
 
         _set_local_modules_versions(local_modules, git_dir_path, request)
 
-        def go_list_deps(pattern: Literal["./...", "all"]) -> Iterator[GoPackage]:
-            """Run go list -deps -json and return the parsed list of packages.
-
-            The "./..." pattern returns the list of packages compiled into the final binary.
-
-            The "all" pattern includes dependencies needed only for tests. Use it to get a more
-            complete module list (roughly matching the list of downloaded modules).
-            """
-            opts = [*go_list, "-deps", "-json=ImportPath,Module,Standard,Deps", pattern]
-            return map(GoPackage.parse_obj, load_json_stream(go(opts, run_params)))
-
+        # The "all" pattern includes dependencies needed only for tests, which gives a more
+        # complete module list (roughly matching the list of downloaded modules)
+        all_packages = {
+            pkg.import_path: pkg for pkg in _parse_go_packages(package_list["packages"])
+        }
         package_modules = (
-            mod for pkg in go_list_deps("all") if (mod := pkg.module) and not mod.main
+            mod for pkg in all_packages.values() if (mod := pkg.module) and not mod.main
         )
         main_module_deps = _deduplicate_to_gomod_dicts(
             chain(package_modules, downloaded_modules, local_modules.workspaces), deps_to_replace
@@ -451,7 +489,6 @@ def resolve_gomod(
         log.info("Retrieving the list of packages")
         main_packages: list[dict[str, Any]] = []
         main_packages_deps = set()
-        all_packages = {pkg.import_path: pkg for pkg in go_list_deps("./...")}
 
         # The go list -deps command lists dependencies first and then the package which
         # depends on them. We want the opposite order: package first, then its dependencies.
@@ -459,6 +496,9 @@ def resolve_gomod(
             if not pkg.module or not pkg.module.main:
                 continue  # This is a dependency, not a top-level package
 
+            if pkg.module.path != local_modules.main.path:
+                continue  # This is a package of a workspace module, which "./..." does not match
+
             if pkg.import_path in main_packages_deps:
                 # If a top-level package is already listed as a dependency, we do not list it here,
                 # since its dependencies are already listed in the parent package.
@@ -510,6 +550,153 @@ def resolve_gomod(
         }
 
 
+def _go_list(
+    go: Go, go_list: list[str], run_params: dict[str, Any], git_dir_path: Path
+) -> dict[str, Any]:
+    """
+    List the local modules and the packages of the module graph.
+
+    The packages are listed with the "all" pattern, whose -deps output also contains every package
+    matched by "./...", so the package graph is loaded only once. Only the fields used by Cachito
+    are kept, and the module directories are made relative to the git repository, so that the
+    result can be cached and reused for another copy of the same sources.
+
+    :param Go go: the Go toolchain to run
+    :param list go_list: the go list command and the options common to all its calls
+    :param dict run_params: the parameters of the go commands
+    :param Path git_dir_path: the full path to the application's git repository
+    :return: a dict with the list of the local modules ("modules" key), the list of packages
+        in the order listed by go list ("packages" key) and the version of this format ("version"
+        key)
+    :rtype: dict
+    """
+    modules = [
+        {
+            "Path": module["Path"],
+            "Version": module.get("Version"),
+            "Main": module.get("Main", False),
+            "Dir": os.path.relpath(module["Dir"], git_dir_path),
+        }
+        for module in load_json_stream(go([*go_list, "-m", "-json"], run_params))
+    ]
+
+    opts = [*go_list, "-deps", "-json=ImportPath,Module,Standard,Deps", "all"]
+    packages = []
+    for pkg in load_json_stream(go(opts, run_params)):
+        trimmed_pkg = {"ImportPath": pkg["ImportPath"]}
+        if pkg.get("Standard"):
+            trimmed_pkg["Standard"] = True
+        if module := pkg.get("Module"):
+            trimmed_pkg["Module"] = _trim_go_module(module)
+        if deps := pkg.get("Deps"):
+            trimmed_pkg["Deps"] = deps
+        packages.append(trimmed_pkg)
+
+    return {"version": GO_LIST_CACHE_VERSION, "modules": modules, "packages": packages}
+
+
+def _is_valid_cached_package_list(package_list: Any) -> bool:
+    """
+    Check that a go list output loaded from the Go module cache can be used.
+
+    The packages are not validated when they are parsed, so the output must have been stored in
+    the current format, by a worker which ran go list itself.
+    """
+    return (
+        isinstance(package_list, dict)
+        and package_list.get("version") == GO_LIST_CACHE_VERSION
+        and isinstance(package_list.get("modules"), list)
+        and isinstance(package_list.get("packages"), list)
+    )
+
+
+def _trim_go_module(module: dict[str, Any]) -> dict[str, Any]:
+    trimmed_module = {key: module[key] for key in ("Path", "Version", "Main") if key in module}
+    if replace := module.get("Replace"):
+        trimmed_module["Replace"] = _trim_go_module(replace)
+    return trimmed_module
+
+
+def _parse_go_packages(packages: Iterable[dict[str, Any]]) -> Iterator[GoPackage]:
+    """
+    Create the GoPackage objects for the packages listed by go list, without validating them.
+
+    A module graph can have tens of thousands of packages, which are trusted output of the Go
+    toolchain, so the validation would only slow down the parsing.
+    """
+
+    def construct_module(module: dict[str, Any]) -> GoModule:
+        replace = module.get("Replace")
+        return GoModule.construct(
+            path=module["Path"],
+            version=module.get("Version"),
+            main=module.get("Main", False),
+            replace=construct_module(replace) if replace else None,
+        )
+
+    for pkg in packages:
+        module = pkg.get("Module")
+        yield GoPackage.construct(
+            import_path=pkg["ImportPath"],
+            standard=pkg.get("Standard", False),
+            module=construct_module(module) if module else None,
+            deps=pkg.get("Deps", []),
+        )
+
+
+def _go_list_cache_key(
+    go: Go,
+    go_list: list[str],
+    run_params: dict[str, Any],
+    app_source_path: Path,
+    git_dir_path: Path,
+) -> str:
+    """
+    Compute the key of the go list output in the Go module cache.
+
+    Besides the go.mod and go.sum files, the package graph depends on the imports of the Go source
+    files, including the local replacements and the vendored packages, on the Go release, and on
+    the target platform and options of the build.
+
+    The committed sources are identified by the tree of the checked out commit, so only the files
+    which differ from it, such as the go.mod file edited for the dependency replacements or an
+    ignored vendor directory, are read and hashed.
+
+    :return: the hexadecimal SHA-256 digest of all the inputs of go list
+    :rtype: str
+    """
+    hasher = hashlib.sha256()
+    params = {
+        "cache_version": GO_LIST_CACHE_VERSION,
+        "release": go.release,
+        "go_list": go_list,
+        "cgo_enabled": run_params["env"].get("CGO_ENABLED"),
+        "platform": [sys.platform, platform.machine()],
+        "subpath": os.path.relpath(app_source_path, git_dir_path),
+    }
+    hasher.update(json.dumps(params, sort_keys=True).encode())
+
+    repo = git.Repo(git_dir_path)
+    hasher.update(repo.head.commit.tree.hexsha.encode())
+    status = repo.git.status(
+        "--porcelain", "-z", "--untracked-files=all", "--ignored", "--no-renames"
+    )
+    # Each entry is the two letters of the status, a space and the path
+    changed_paths = sorted({entry[3:] for entry in status.split("\0") if entry})
+    for relpath in changed_paths:
+        if not relpath.endswith(".go") and os.path.basename(relpath) not in GO_LIST_INPUT_FILES:
+            continue
+        hasher.update(relpath.encode() + b"\0")
+        try:
+            with open(os.path.join(git_dir_path, relpath), "rb") as f:
+                hasher.update(hashlib.sha256(f.read()).digest())
+        except FileNotFoundError:
+            # The file was deleted from the checkout
+            hasher.update(b"\0")
+
+    return hasher.hexdigest()
+
+
 def _vet_workspace_vendoring(go: Go, run_params: dict[str, Any]) -> None:
     go_work_file = go(["env", "GOWORK"], run_params).rstrip()
 
@@ -528,6 +715,8 @@ def _set_local_modules_versions(
     request: dict[str, Any],
 ) -> None:
     """Update the local modules with their corresponding versions."""
+    # The tags are indexed once for all the modules of the repository
+    tag_index = GitTagIndex.load(git_dir_path)
     for module in local_modules.all():
         if module.dir and module.dir != git_dir_path:
             subpath = str(module.dir.relative_to(git_dir_path))
@@ -540,6 +729,7 @@ def _set_local_modules_versions(
             request["ref"],
             update_tags=True,
             subpath=subpath,
+            tag_index=tag_index,
         )
 
 
@@ -773,8 +963,8 @@ def _merge_bundle_dirs(root_src_dir, root_dst_dir):
     """
     Merge two bundle directories together.
 
-    The contents of root_src_dir will be copied into root_dst_dir, overwriting any files
-    that might already be present. For a description of the algorithm, see
+    The contents of root_src_dir will be transferred into root_dst_dir, without overwriting any
+    files that might already be present. For a description of the algorithm, see
     https://lukelogbook.tech/2018/01/25/merging-two-folders-in-python/
 
     In addition to that merge algorithm, however, we also need to make sure that we merge
@@ -782,6 +972,8 @@ def _merge_bundle_dirs(root_src_dir, root_dst_dir):
     extra files, we are also checking for the presence of the list.lock file since it should
     be present according to https://github.com/golang/go/issues/29434
 
+    The files are transferred without copying their content when possible, see _transfer_file().
+
     :param str root_src_dir: the root path to the source directory
     :param str root_dst_dir: the root path to the destination directory
     :return: None
@@ -804,7 +996,47 @@ def _merge_bundle_dirs(root_src_dir, root_dst_dir):
                 ):
                     _merge_files(src_file, dst_file)
                 continue
-            shutil.copy2(src_file, dst_dir)
+            _transfer_file(src_file, dst_file)
+
+
+# The FICLONE ioctl of Linux, which makes the destination file share the extents of the source
+_FICLONE = 0x40049409
+
+# The files of a module version in the Go module cache, which Go never modifies once written. The
+# @v/list and list.lock files are not in there, since Go appends to the list of a module when it
+# downloads another version of it.
+_IMMUTABLE_MODULE_FILE_SUFFIXES = (".info", ".mod", ".zip", ".ziphash")
+
+
+def _transfer_file(src_file, dst_file):
+    """
+    Transfer a file to a destination path which does not exist yet, as cheaply as possible.
+
+    The immutable files of a module version are hardlinked if both paths are on the same
+    filesystem. The other files, or the immutable files if the hardlink fails, are reflinked on
+    filesystems supporting it, then copied as a last resort. A reflink shares the content until
+    either file is modified, so it is safe for the list files too. The source file is kept since
+    Go still reads it afterwards.
+
+    :param str src_file: the path of the source file
+    :param str dst_file: the path of the destination file
+    """
+    if src_file.endswith(_IMMUTABLE_MODULE_FILE_SUFFIXES):
+        try:
+            os.link(src_file, dst_file)
+            return
+        except OSError:
+            pass
+
+    try:
+        with open(src_file, "rb") as src, open(dst_file, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(src_file, dst_file)
+        return
+    except OSError:
+        pass
+
+    shutil.copy2(src_file, dst_file)
 
 
 def _merge_files(src_file, dst_file):
@@ -812,22 +1044,37 @@ def _merge_files(src_file, dst_file):
     Merge two files so that we ensure that all packages are represented.
 
     The dst_file will be updated by inserting the lines from the src_file,
-    sorting all lines, and removing duplicate lines.
+    sorting all lines, and removing duplicate lines. The sorted lines of both
+    files are merged as a stream into a temporary file which then replaces
+    dst_file, so dst_file is never left partially written.
 
     :param str src_file: the source file (to be merged)
     :param str dst_file: the destination file (to be merged into)
     :return: None
     """
-    with open(src_file, "r") as file1:
-        source_content = [line.rstrip() for line in file1.readlines()]
-    with open(dst_file, "r") as file2:
-        dest_content = [line.rstrip() for line in file2.readlines()]
-
-    with open(dst_file, "w") as target:
-        for line in sorted(set(source_content + dest_content)):
-            if line == "":
-                continue
-            target.write(str(line) + "\n")
+
+    def sorted_lines(path):
+        with open(path, "r") as f:
+            # The list files written by Go are in download order, not sorted
+            return sorted(line.rstrip() for line in f)
+
+    previous = None
+    dst_dir, dst_name = os.path.split(dst_file)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=dst_dir, prefix=f".{dst_name}.", delete=False
+    ) as target:
+        try:
+            for line in heapq.merge(sorted_lines(src_file), sorted_lines(dst_file)):
+                if line == "" or line == previous:
+                    continue
+                target.write(line + "\n")
+                previous = line
+        except BaseException:
+            os.unlink(target.name)
+            raise
+
+    shutil.copymode(dst_file, target.name)
+    os.replace(target.name, dst_file)
 
 
 def _get_golang_pseudo_version(commit, tag=None, module_major_version=None, subpath=None):
@@ -874,23 +1121,149 @@ def _get_golang_pseudo_version(commit, tag=None, module_major_version=None, subp
     return f"v{pseudo_semantic_version}{version_seperator}0.{commit_timestamp}-{commit_hash}"
 
 
-@tracer.start_as_current_span("_get_highest_semver_tag")
-def _get_highest_semver_tag(repo, target_commit, major_version, all_reachable=False, subpath=None):
+@dataclass(frozen=True)
+class _IndexedTag:
+    """A tag in a GitTagIndex."""
+
+    name: str
+    # The object the tag ref points to, which is the tag object for annotated tags
+    ref_sha: str
+    commit_sha: str
+    subpath: str
+    # The precedence key of the semantic version, None if the tag is not a semantic version
+    precedence: Optional[tuple[Union[int, str], ...]]
+
+
+class GitTagIndex:
     """
-    Get the highest semantic version tag related to the input commit.
+    An index of the semantic version tags of a Git repository, used to compute the Go versions.
 
-    :param Git.Repo repo: the Git repository object to search
-    :param int major_version: the major version of the Go module as in the go.mod file to use as a
-        filter for major version tags
-    :param bool all_reachable: if False, the search is constrained to the input commit. If True,
-        then the search is constrained to the input commit and preceding commits.
-    :param str subpath: path to the module, relative to the root repository folder
-    :return: the highest semantic version tag if one is found
-    :rtype: git.Tag
+    Each tag is indexed with the commit it points to, the subpath of the module it versions and
+    the precedence of its semantic version. The tags of each subpath and major version are sorted
+    from the highest version, so a lookup stops at the first tag on (or merged into) the target
+    commit.
+
+    The index is kept in memory for the request and updated incrementally: all the tags are
+    listed with a single git call, but only the new or moved tags are parsed. The tags merged into
+    a commit are kept as well until the tags change, so computing the versions of all the modules
+    in a repository walks the history of the commit only once.
+
+    :param git.Repo repo: the Git repository to index
     """
-    try:
-        g = git.Git(repo.working_dir)
+
+    def __init__(self, repo: git.Repo):
+        """Initialize an empty index, use GitTagIndex.load to get an up-to-date index."""
+        self.repo = repo
+        self._tags: dict[str, _IndexedTag] = {}
+        self._merged_tags: dict[str, list[str]] = {}
+        self._sorted_tags: dict[tuple[str, int], list[_IndexedTag]] = {}
+
+    @classmethod
+    def load(cls, git_path: Union[str, Path]) -> "GitTagIndex":
+        """
+        Index the current tags of a repository.
+
+        :param (str | Path) git_path: the path to the Git repository to index
+        :return: the up-to-date index
+        :rtype: GitTagIndex
+        :raises RepositoryAccessError: if the tags of the repository can't be listed
+        """
+        index = cls(git.Repo(git_path))
+        index.update()
+        return index
+
+    def update(self) -> bool:
+        """
+        Update the index with the current tags of the repository.
+
+        :return: True if the tags changed since the index was last updated
+        :rtype: bool
+        :raises RepositoryAccessError: if the tags of the repository can't be listed
+        """
+        # Unlike git for-each-ref, git show-ref gets the commits of the annotated tags from the
+        # packed refs instead of reading every tag object
+        cmd = ["git", "show-ref", "--tags", "--dereference"]
+        status, output, _ = git.Git(self.repo.working_dir).execute(
+            cmd, with_extended_output=True, with_exceptions=False
+        )
+        # git show-ref exits with 1 and no output when there are no tags
+        if status != 0 and (status != 1 or output):
+            msg = f"Failed to list the tags of the repository at {self.repo.working_dir}"
+            log.error("%s: %s", msg, output)
+            raise RepositoryAccessError(msg)
+
+        ref_shas = {}
+        commit_shas = {}
+        for line in output.splitlines():
+            sha, ref = line.split(" ", 1)
+            name = ref.removeprefix("refs/tags/")
+            if name.endswith("^{}"):
+                commit_shas[name[:-3]] = sha
+            else:
+                ref_shas[name] = sha
+
+        tags = {}
+        for name, ref_sha in ref_shas.items():
+            tag = self._tags.get(name)
+            if tag is None or tag.ref_sha != ref_sha:
+                tag = _index_tag(name, ref_sha, commit_shas.get(name, ref_sha))
+            tags[name] = tag
+
+        changed = tags != self._tags
+        if changed:
+            self._tags = tags
+            self._merged_tags = {}
+
+        self._sorted_tags = {}
+        # Tags with equal versions keep the order of their names, since the sort is stable
+        for tag in sorted(self._tags.values(), key=lambda tag: tag.name):
+            if tag.precedence:
+                # The major version is the first item of the precedence key
+                key = (tag.subpath, tag.precedence[0])
+                self._sorted_tags.setdefault(key, []).append(tag)
+        for sorted_tags in self._sorted_tags.values():
+            sorted_tags.sort(key=lambda tag: tag.precedence, reverse=True)
+
+        return changed
+
+    @tracer.start_as_current_span("GitTagIndex.get_highest_semver_tag")
+    def get_highest_semver_tag(
+        self,
+        target_commit: git.Commit,
+        major_version: int,
+        all_reachable: bool = False,
+        subpath: Optional[str] = None,
+    ) -> Optional[git.TagReference]:
+        """
+        Get the highest semantic version tag related to the input commit.
+
+        :param git.Commit target_commit: the commit to get the tag for
+        :param int major_version: the major version of the Go module as in the go.mod file to use
+            as a filter for major version tags
+        :param bool all_reachable: if False, the search is constrained to the input commit. If
+            True, then the search is constrained to the input commit and preceding commits.
+        :param str subpath: path to the module, relative to the root repository folder
+        :return: the highest semantic version tag if one is found
+        :rtype: git.TagReference
+        :raises RepositoryAccessError: if the tags merged into the commit can't be listed
+        """
+        sorted_tags = self._sorted_tags.get((subpath or "", major_version), [])
         if all_reachable:
+            merged_tags = set(self._get_merged_tags(target_commit))
+            matches = (tag for tag in sorted_tags if tag.name in merged_tags)
+        else:
+            matches = (tag for tag in sorted_tags if tag.commit_sha == target_commit.hexsha)
+
+        highest = next(matches, None)
+        if highest is None:
+            return None
+        return git.TagReference(self.repo, f"refs/tags/{highest.name}")
+
+    def _get_merged_tags(self, target_commit: git.Commit) -> list[str]:
+        if (merged_tags := self._merged_tags.get(target_commit.hexsha)) is not None:
+            return merged_tags
+
+        try:
             # Get all the tags on the input commit and all that precede it.
             # This is based on:
             # https://github.com/golang/go/blob/0ac8739ad5394c3fe0420cf53232954fefb2418f/src/cmd/go/internal/modfetch/codehost/git.go#L659-L695
@@ -903,41 +1276,53 @@ def _get_highest_semver_tag(repo, target_commit, major_version, all_reachable=Fa
                 "--merged",
                 target_commit.hexsha,
             ]
-        else:
-            # Get the tags that point to this commit
-            cmd = ["git", "tag", "--points-at", target_commit.hexsha]
-        tag_names = g.execute(cmd).splitlines()
-    except git.GitCommandError:
-        msg = f"Failed to get the tags associated with the reference {target_commit.hexsha}"
-        log.exception(msg)
-        raise RepositoryAccessError(msg)
-
-    # Keep only semantic version tags related to the path being processed
-    prefix = f"{subpath}/v" if subpath else "v"
-    filtered_tags = [tag_name for tag_name in tag_names if tag_name.startswith(prefix)]
-
-    not_semver_tag_msg = "%s is not a semantic version tag"
-    highest = None
-
-    for tag_name in filtered_tags:
+            merged_tags = git.Git(self.repo.working_dir).execute(cmd).splitlines()
+        except git.GitCommandError:
+            msg = f"Failed to get the tags associated with the reference {target_commit.hexsha}"
+            log.exception(msg)
+            raise RepositoryAccessError(msg)
+
+        self._merged_tags[target_commit.hexsha] = merged_tags
+        return merged_tags
+
+
+def _index_tag(name: str, ref_sha: str, commit_sha: str) -> _IndexedTag:
+    """Parse the subpath and the semantic version of a tag."""
+    subpath, _, version = name.rpartition("/")
+    precedence = None
+    # Keep only semantic version tags, such as v1.0.0 or subpath/v1.0.0
+    if version.startswith("v"):
         try:
-            semantic_version = _get_semantic_version_from_tag(tag_name, subpath)
+            semantic_version = _get_semantic_version_from_tag(name, subpath or None)
         except ValueError:
-            log.debug(not_semver_tag_msg, tag_name)
-            continue
+            log.debug("%s is not a semantic version tag", name)
+        else:
+            precedence = _get_semver_precedence(semantic_version)
 
-        # If the major version of the semantic version tag doesn't match the Go module's major
-        # version, then ignore it
-        if semantic_version.major != major_version:
-            continue
+    return _IndexedTag(name, ref_sha, commit_sha, subpath, precedence)
 
-        if highest is None or semantic_version > highest["semver"]:
-            highest = {"tag": tag_name, "semver": semantic_version}
 
-    if highest:
-        return repo.tags[highest["tag"]]
+def _get_semver_precedence(semantic_version: semver.VersionInfo) -> tuple[Union[int, str], ...]:
+    """
+    Get a key which sorts semantic versions by precedence, much faster to compare than them.
 
-    return None
+    A version without a prerelease has a higher precedence than the same version with one. The
+    identifiers of a prerelease are compared one by one, numeric identifiers numerically and lower
+    than alphanumeric ones, and a prerelease with more identifiers has a higher precedence than
+    its prefix. Each identifier adds a (kind, number, string) triple, so the flat tuples compare
+    the same way.
+    """
+    major, minor, patch, prerelease, _ = semantic_version
+    if not prerelease:
+        return (major, minor, patch, 1)
+
+    precedence: list[Union[int, str]] = [major, minor, patch, 0]
+    for identifier in prerelease.split("."):
+        if identifier.isdigit():
+            precedence.extend((0, int(identifier), ""))
+        else:
+            precedence.extend((1, 0, identifier))
+    return tuple(precedence)
 
 
 def _get_semantic_version_from_tag(tag_name, subpath=None):
@@ -963,7 +1348,9 @@ def _get_semantic_version_from_tag(tag_name, subpath=None):
 
 
 @tracer.start_as_current_span("get_golang_version")
-def get_golang_version(module_name, git_path, commit_sha, update_tags=False, subpath=None):
+def get_golang_version(
+    module_name, git_path, commit_sha, update_tags=False, subpath=None, tag_index=None
+):
     """
     Get the version of the Go module in the input Git repository in the same format as `go list`.
 
@@ -976,6 +1363,8 @@ def get_golang_version(module_name, git_path, commit_sha, update_tags=False, sub
     :param bool update_tags: determines if `git fetch --tags --force` should be run before
         determining the version. If this fails, it will be logged as a warning.
     :param str subpath: path to the module, relative to the root repository folder
+    :param GitTagIndex tag_index: the tag index of the Git repository, which is updated if the
+        tags are fetched. If this isn't specified, the index is loaded from the repository.
     :return: a version as `go list` would provide
     :rtype: str
     :raises RepositoryAccessError: if failed to fetch the tags on the Git repository
@@ -1005,10 +1394,15 @@ def get_golang_version(module_name, git_path, commit_sha, update_tags=False, sub
         # Prefer v1.x.x tags but fallback to v0.x.x tags if both are present
         major_versions_to_try = (1, 0)
 
+    if tag_index is None:
+        tag_index = GitTagIndex.load(git_path)
+    elif update_tags:
+        tag_index.update()
+
     commit = repo.commit(commit_sha)
     for major_version in major_versions_to_try:
         # Get the highest semantic version tag on the commit with a matching major version
-        tag_on_commit = _get_highest_semver_tag(repo, commit, major_version, subpath=subpath)
+        tag_on_commit = tag_index.get_highest_semver_tag(commit, major_version, subpath=subpath)
         if not tag_on_commit:
             continue
 
@@ -1025,8 +1419,8 @@ def get_golang_version(module_name, git_path, commit_sha, update_tags=False, sub
     # https://github.com/golang/go/blob/a23f9afd9899160b525dbc10d01045d9a3f072a0/src/cmd/go/internal/modfetch/coderepo.go#L511-L521
     for major_version in major_versions_to_try:
         # Get the highest semantic version tag before the commit with a matching major version
-        pseudo_base_tag = _get_highest_semver_tag(
-            repo, commit, major_version, all_reachable=True, subpath=subpath
+        pseudo_base_tag = tag_index.get_highest_semver_tag(
+            commit, major_version, all_reachable=True, subpath=subpath
         )
         if not pseudo_base_tag:
             continue
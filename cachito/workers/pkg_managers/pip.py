@@ -6,8 +6,8 @@ import os.path
 import random
 import re
 import secrets
-import shutil
 import tarfile
+import threading
 import urllib
 import zipfile
 from abc import ABC, abstractmethod
@@ -36,6 +36,7 @@ from cachito.workers.paths import RequestBundleDir
 from cachito.workers.pkg_managers import general
 from cachito.workers.pkg_managers.general import (
     ChecksumInfo,
+    copy_file,
     download_raw_component,
     extract_git_info,
     pkg_requests_session,
@@ -1271,7 +1272,7 @@ def finalize_nexus_for_pip_request(pip_repo_name, raw_repo_name, username):
 
 
 @tracer.start_as_current_span("download_dependencies")
-def download_dependencies(request_id, requirements_file):
+def download_dependencies(request_id, requirements_file, raw_component_locks=None):
     """
     Download sdists (source distributions) of all dependencies in a requirements.txt file.
 
@@ -1279,8 +1280,13 @@ def download_dependencies(request_id, requirements_file):
     were not already present. PyPI dependencies get cached automatically just by being
     downloaded from the right URL, see _download_pypi_package().
 
+    Up to ``cachito_pip_concurrency_limit`` dependencies are downloaded at the same time.
+
     :param int request_id: ID of the request these dependencies are being downloaded for
     :param PipRequirementsFile requirements_file: A requirements.txt file
+    :param dict raw_component_locks: the locks of the VCS and URL dependencies, keyed on their
+        Nexus raw component name; pass the same dict for all the requirements files of a request
+        downloaded concurrently
     :return: Info about downloaded packages; all items will contain "kind" and "path" keys
         (and more based on kind, see _download_*_package functions for more details)
     :rtype: list[dict]
@@ -1315,9 +1321,19 @@ def download_dependencies(request_id, requirements_file):
     nexus_auth = requests.auth.HTTPBasicAuth(nexus_username, nexus_password)
     pypi_proxy_auth = nexus_auth
 
-    downloads = []
+    # The same VCS or URL dependency is fetched into the same path and uploaded to the same raw
+    # component, do it only once at a time
+    if raw_component_locks is None:
+        raw_component_locks = {}
+
+    def download(req):
+        if req.kind in ("vcs", "url"):
+            raw_component_name = get_raw_component_name(req)
+            with raw_component_locks.setdefault(raw_component_name, threading.Lock()):
+                return _download(req)
+        return _download(req)
 
-    for req in requirements_file.requirements:
+    def _download(req):
         log.info("Downloading %s", req.download_line)
 
         if req.kind == "pypi":
@@ -1365,9 +1381,11 @@ def download_dependencies(request_id, requirements_file):
             )
 
         download_info["kind"] = req.kind
-        downloads.append(download_info)
+        return download_info
 
-    return downloads
+    return general.download_concurrently(
+        download, requirements_file.requirements, config.cachito_pip_concurrency_limit
+    )
 
 
 def _process_options(options):
@@ -1580,7 +1598,14 @@ def _download_pypi_package(requirement, pip_deps_dir, pypi_proxy_url, pypi_proxy
 
     # Nexus turns package URLs into relative URLs
     proxied_url = f"{package_url.rstrip('/')}/{sdist['url']}"
-    general.download_binary_file(proxied_url, download_path, auth=pypi_proxy_auth)
+    # The index may provide the digest of the file in the URL fragment (PEP 503)
+    algorithm, _, digest = urllib.parse.urldefrag(sdist["url"]).fragment.partition("=")
+    general.download_binary_file(
+        proxied_url,
+        download_path,
+        auth=pypi_proxy_auth,
+        sha256=digest if algorithm == "sha256" else None,
+    )
 
     return {
         "package": sdist["name"],
@@ -1702,7 +1727,7 @@ def _download_vcs_package(requirement, pip_deps_dir, pip_raw_repo_name, nexus_au
         repo = Git(git_info["url"], ref)
         repo.fetch_source(gitsubmodule=False)
         # Copy downloaded archive to expected download path
-        shutil.copy(repo.sources_dir.archive_path, download_path)
+        copy_file(repo.sources_dir.archive_path, download_path)
 
     return {
         "package": requirement.package,
@@ -1928,12 +1953,14 @@ def get_index_url(nexus_pypi_hosted_repo_url, username, password):
 
 
 @tracer.start_as_current_span("_download_from_requirement_files")
-def _download_from_requirement_files(request_id, files):
+def _download_from_requirement_files(request_id, files, raw_component_locks=None):
     """
     Download dependencies listed in the requirement files.
 
     :param int request_id: ID of the request these dependencies are being downloaded for
     :param list files: list of str, each representing the absolute path of a pip requirement file
+    :param dict raw_component_locks: the locks of the VCS and URL dependencies, see
+        download_dependencies
     :return: Info about downloaded packages; see download_dependencies return docs for further
         reference
     :rtype: list[dict]
@@ -1943,7 +1970,9 @@ def _download_from_requirement_files(request_id, files):
     for req_file in files:
         if not os.path.exists(req_file):
             raise FileAccessError(f"Following requirement file has an invalid path: {req_file}")
-        requirements.extend(download_dependencies(request_id, PipRequirementsFile(req_file)))
+        requirements.extend(
+            download_dependencies(request_id, PipRequirementsFile(req_file), raw_component_locks)
+        )
     return requirements
 
 
@@ -2034,7 +2063,9 @@ def _push_downloaded_requirement(requirement, pip_repo_name, raw_repo_name):
 
 
 @tracer.start_as_current_span("resolve_pip")
-def resolve_pip(path, request, requirement_files=None, build_requirement_files=None):
+def resolve_pip(
+    path, request, requirement_files=None, build_requirement_files=None, raw_component_locks=None
+):
     """
     Resolve and fetch pip dependencies for the given app source archive.
 
@@ -2044,6 +2075,8 @@ def resolve_pip(path, request, requirement_files=None, build_requirement_files=N
         to be used to compile a list of dependencies to be fetched
     :param list build_requirement_files: a list of str representing paths to the Python build
         requirement files to be used to compile a list of build dependencies to be fetched
+    :param dict raw_component_locks: the locks of the VCS and URL dependencies shared by the
+        packages of the request, see download_dependencies
     :return: a dictionary that has the following keys:
         ``package`` which is the dict representing the main Package,
         ``dependencies`` which is a list of dicts representing the package Dependencies
@@ -2071,8 +2104,12 @@ def resolve_pip(path, request, requirement_files=None, build_requirement_files=N
     else:
         build_requirement_files = _get_absolute_pkg_file_paths(path, build_requirement_files)
 
-    requires = _download_from_requirement_files(request["id"], requirement_files)
-    buildrequires = _download_from_requirement_files(request["id"], build_requirement_files)
+    requires = _download_from_requirement_files(
+        request["id"], requirement_files, raw_component_locks
+    )
+    buildrequires = _download_from_requirement_files(
+        request["id"], build_requirement_files, raw_component_locks
+    )
 
     # Mark all build dependencies as Cachito dev dependencies
     for dependency in buildrequires:
@@ -5,6 +5,7 @@ import random
 import re
 import secrets
 import shutil
+import threading
 import urllib.parse
 from dataclasses import dataclass
 from pathlib import Path
@@ -22,7 +23,9 @@ from cachito.workers import get_worker_config, nexus
 from cachito.workers.errors import NexusScriptError, UploadError
 from cachito.workers.paths import RequestBundleDir
 from cachito.workers.pkg_managers.general import (
+    copy_file,
     download_binary_file,
+    download_concurrently,
     download_raw_component,
     extract_git_info,
     upload_raw_package,
@@ -191,7 +194,7 @@ def finalize_nexus_for_rubygems_request(rubygems_repo_name, username):
 
 
 @tracer.start_as_current_span("download_dependencies")
-def download_dependencies(request_id, dependencies, package_root):
+def download_dependencies(request_id, dependencies, package_root, git_locks=None):
     """
     Download all dependencies from Gemfile.lock with its sources.
 
@@ -199,9 +202,13 @@ def download_dependencies(request_id, dependencies, package_root):
     present. Dependencies from rubygems.org get cached automatically just by being downloaded
     from the right URL, see _download_rubygems_package().
 
+    Up to ``cachito_rubygems_concurrency_limit`` dependencies are downloaded at the same time.
+
     :param int request_id: ID of the request these dependencies are being downloaded for
     :param list[GemMetadata] dependencies: List of dependencies
     :param package_root: path to the root of the processed package
+    :param dict git_locks: the locks of the git dependencies, keyed on their repository and
+        revision; pass the same dict for all the packages of a request downloaded concurrently
     :return: Info about downloaded packages; all items will contain "kind" and "path" keys
         (and more based on kind, see _download_*_package functions for more details)
     :rtype: list[dict]
@@ -216,9 +223,11 @@ def download_dependencies(request_id, dependencies, package_root):
     nexus_username, nexus_password = nexus.get_nexus_hoster_credentials()
     nexus_auth = requests.auth.HTTPBasicAuth(nexus_username, nexus_password)
 
-    downloads = []
+    # The gems of a git repository share the same archive, fetch and upload it only once at a time
+    if git_locks is None:
+        git_locks = {}
 
-    for dep in dependencies:
+    def download(dep):
         log.info("Downloading %s (%s)", dep.name, dep.version)
 
         if dep.type == "GEM":
@@ -226,9 +235,11 @@ def download_dependencies(request_id, dependencies, package_root):
                 dep, bundle_dir.rubygems_deps_dir, rubygems_proxy_url, nexus_auth
             )
         elif dep.type == "GIT":
-            download_info = _download_git_package(
-                dep, bundle_dir.rubygems_deps_dir, rubygems_raw_repo_name, nexus_auth
-            )
+            with git_locks.setdefault((dep.source, dep.version), threading.Lock()):
+                download_info = _download_git_package(
+                    dep, bundle_dir.rubygems_deps_dir, rubygems_raw_repo_name, nexus_auth
+                )
+                _upload_git_package(download_info, rubygems_raw_repo_name)
         elif dep.type == "PATH":
             download_info = _get_path_package_info(dep, package_root)
         else:
@@ -243,28 +254,38 @@ def download_dependencies(request_id, dependencies, package_root):
                 download_info["path"].relative_to(bundle_dir),
             )
 
-        # If the raw component is not in the Nexus hoster instance, upload it there
-        if dep.type == "GIT" and not download_info["have_raw_component"]:
-            log.debug(
-                "Uploading %r to %r as %r",
-                download_info["path"].name,
-                rubygems_raw_repo_name,
-                download_info["raw_component_name"],
-            )
-            dest_dir, filename = download_info["raw_component_name"].rsplit("/", 1)
-            upload_raw_package(
-                rubygems_raw_repo_name,
-                download_info["path"],
-                dest_dir,
-                filename,
-                is_request_repository=False,
-            )
-
         download_info["kind"] = dep.type
         download_info["type"] = "rubygems"
-        downloads.append(download_info)
+        return download_info
+
+    return download_concurrently(download, dependencies, config.cachito_rubygems_concurrency_limit)
+
 
-    return downloads
+def _upload_git_package(download_info, rubygems_raw_repo_name):
+    """
+    Upload a downloaded GIT dependency to the Nexus raw repo if it is not already present there.
+
+    :param dict download_info: the download info returned by _download_git_package()
+    :param str rubygems_raw_repo_name: Name of the Nexus raw repository for RubyGems
+    """
+    # If the raw component is not in the Nexus hoster instance, upload it there
+    if download_info["have_raw_component"]:
+        return
+
+    log.debug(
+        "Uploading %r to %r as %r",
+        download_info["path"].name,
+        rubygems_raw_repo_name,
+        download_info["raw_component_name"],
+    )
+    dest_dir, filename = download_info["raw_component_name"].rsplit("/", 1)
+    upload_raw_package(
+        rubygems_raw_repo_name,
+        download_info["path"],
+        dest_dir,
+        filename,
+        is_request_repository=False,
+    )
 
 
 @tracer.start_as_current_span("_download_rubygems_package")
@@ -331,7 +352,7 @@ def _download_git_package(gem, rubygems_deps_dir, rubygems_raw_repo_name, nexus_
         repo_name = Git(gem.source, gem.version)
         repo_name.fetch_source(gitsubmodule=False)
         # Copy downloaded archive to expected download path
-        shutil.copy(repo_name.sources_dir.archive_path, download_path)
+        copy_file(repo_name.sources_dir.archive_path, download_path)
 
     url = gem.source
     ref = gem.version.lower()
@@ -363,12 +384,14 @@ def _get_path_package_info(dep, package_root):
 
 
 @tracer.start_as_current_span("resolve_rubygems")
-def resolve_rubygems(package_root, request):
+def resolve_rubygems(package_root, request, git_locks=None):
     """
     Resolve and fetch RubyGems dependencies for the given app source archive.
 
     :param Path package_root: the full path to the package root
     :param dict request: the Cachito request to resolve RubyGems dependencies for
+    :param dict git_locks: the locks of the git dependencies shared by the packages of the
+        request, see download_dependencies
     :return: a dictionary that has the following keys:
         ``dependencies`` which is a list of dicts representing the package Dependencies
         ``gemfile_lock`` an absolute path to the Gemfile.lock
@@ -382,7 +405,7 @@ def resolve_rubygems(package_root, request):
     gemlock_path = package_root / GEMFILE_LOCK
     dependencies = parse_gemlock(bundle_dir.source_root_dir, gemlock_path)
 
-    dependencies = download_dependencies(request["id"], dependencies, package_root)
+    dependencies = download_dependencies(request["id"], dependencies, package_root, git_locks)
 
     rubygems_repo_name = get_rubygems_hosted_repo_name(request["id"])
     for dependency in dependencies:
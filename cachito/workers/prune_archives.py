@@ -170,6 +170,8 @@ def _process_stale_archives(
         if delete:
             log.info(f"Deleting {archive.path}")
             archive.path.unlink()
+            # The verification of the archive is stored beside it by cachito.workers.scm.Git
+            archive.path.with_name(f"{archive.path.name}.verified").unlink(missing_ok=True)
 
 
 def _validate_older_than(older_than: Optional[datetime]) -> datetime:
@@ -1,14 +1,22 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import fcntl
+import json
 import logging
 import os
+import shutil
 import subprocess  # nosec
 import tarfile
 import tempfile
+import time
 import zlib
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
 
 import git
 
+from cachito.common.checksum import hash_file
 from cachito.common.utils import get_repo_name
 from cachito.errors import (
     FileAccessError,
@@ -16,11 +24,17 @@ from cachito.errors import (
     RepositoryAccessError,
     SubprocessCallError,
 )
-from cachito.workers import run_cmd, safe_extract
+from cachito.workers import run_cmd
+from cachito.workers.config import get_worker_config
 from cachito.workers.paths import SourcesDir
 
 log = logging.getLogger(__name__)
 
+# The file attributes which change when a source archive is modified or replaced
+_STAT_ATTRS = ("st_ino", "st_size", "st_mtime_ns", "st_ctime_ns")
+# The references of the remote repository which are kept in the mirrors
+_MIRROR_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+
 
 class SCM(ABC):
     """The base class for interacting with source control."""
@@ -75,10 +89,49 @@ class Git(SCM):
                 f'of "{self.ref}" is valid.'
             )
 
+    @property
+    def _archive_verification_path(self):
+        archive_path = self.sources_dir.archive_path
+        return archive_path.with_name(f"{archive_path.name}.verified")
+
+    def _get_archive_state(self):
+        stat = self.sources_dir.archive_path.stat()
+        return {attr: getattr(stat, attr) for attr in _STAT_ATTRS}
+
+    def _store_archive_verification(self, state):
+        verification_path = self._archive_verification_path
+        tmp_verification_path = verification_path.with_name(f".{verification_path.name}.tmp")
+        try:
+            tmp_verification_path.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp_verification_path, verification_path)
+        except OSError:
+            log.exception("Failed to store the verification of %s", self.sources_dir.archive_path)
+
+    def _extract_git_dir(self, dest_dir):
+        """
+        Extract only the .git directory of the archive, reading the archive as a stream.
+
+        :param str dest_dir: the directory to extract the .git directory to
+        :raises tarfile.ExtractError: if there is a path traversal attempt in the archive
+        """
+        abs_dest_dir = Path(dest_dir).resolve()
+        with tarfile.open(self.sources_dir.archive_path, mode="r|gz") as tar:
+            for member in tar:
+                if member.name != "app/.git" and not member.name.startswith("app/.git/"):
+                    continue
+                if not Path(dest_dir, member.name).resolve().is_relative_to(abs_dest_dir):
+                    raise tarfile.ExtractError("Attempted Path Traversal in Tar File")
+                tar.extract(member, dest_dir)
+
     def _verify_archive(self):
         """
         Verify the archive containing the git repository.
 
+        Only the .git directory of the archive is extracted to run 'git fsck'. The result of a
+        successful verification is stored beside the archive along with its checksum and its
+        inode, size, mtime and ctime. The archive is not verified again while none of them change,
+        and 'git fsck' is skipped if the archive changed but its checksum did not.
+
         :raises FileAccessError: if the archive is not found
         :raises SubprocessCallError: if 'git fsck' fails for the extracted sources
         """
@@ -90,31 +143,51 @@ class Git(SCM):
             log.exception(err_msg)
             raise FileAccessError(err_msg)
 
+        try:
+            verification = json.loads(self._archive_verification_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            verification = {}
+        verified_checksum = verification.pop("checksum", None)
+        state = self._get_archive_state()
+        if verification == state:
+            log.debug("The archive at %s was already verified", self.sources_dir.archive_path)
+            return
+
+        state["checksum"] = hash_file(self.sources_dir.archive_path).hexdigest()
+        if state["checksum"] == verified_checksum:
+            log.debug("The archive at %s is unchanged", self.sources_dir.archive_path)
+            self._store_archive_verification(state)
+            return
+
         err_msg = {
             "log": "Cachito found an error when verifying the generated archive at %s. %s",
             "exception": f"Invalid archive at {self.sources_dir.archive_path!s}",
         }
         with tempfile.TemporaryDirectory(prefix="cachito-") as temp_dir:
-            cmd = ["git", "fsck"]
-            repo_path = os.path.join(temp_dir, "app")
+            cmd = ["git", "--git-dir", os.path.join(temp_dir, "app", ".git"), "fsck"]
             try:
-                with tarfile.open(self.sources_dir.archive_path, mode="r:gz") as tar:
-                    safe_extract(tar, temp_dir)
-            except (tarfile.ExtractError, zlib.error, OSError) as exc:
+                self._extract_git_dir(temp_dir)
+            except (tarfile.TarError, EOFError, zlib.error, OSError) as exc:
                 log.error(err_msg["log"], self.sources_dir.archive_path, exc)
                 raise SubprocessCallError(err_msg["exception"])
 
             try:
-                run_cmd(cmd, {"cwd": repo_path, "check": True})
+                run_cmd(cmd, {"cwd": temp_dir, "check": True})
             except subprocess.CalledProcessError as exc:
                 msg = f"{err_msg['log']}. STDERR: %s"
                 log.error(msg, self.sources_dir.archive_path, exc, exc.stderr)
                 raise SubprocessCallError(err_msg["exception"])
 
+        self._store_archive_verification(state)
+
     def _create_archive(self, from_dir):
         """
         Create a verified archive from a specified directory.
 
+        The Git repository in the directory is checked with 'git fsck' before it is archived, so
+        the new archive doesn't need to be extracted to be verified. Its verification is stored
+        right away along with its checksum.
+
         We first create the archive in a temporary path so other tasks will not
         use it while it is being written. Note that this operation must be done
         in the same filesystem to avoid copy operations to be performed, which
@@ -124,8 +197,20 @@ class Git(SCM):
         :param str from_dir: path to a directory from where to create the archive.
         :raises FileAccessError/SubprocessCallError: if the archive verification fails
         """
+        log.debug("Verifying the Git repository at %s", from_dir)
+        cmd = ["git", "--git-dir", os.path.join(from_dir, ".git"), "fsck"]
+        try:
+            run_cmd(cmd, {"cwd": from_dir, "check": True})
+        except subprocess.CalledProcessError as exc:
+            log.error(
+                "Cachito found an error when verifying the Git repository at %s. STDERR: %s",
+                from_dir,
+                exc.stderr,
+            )
+            raise SubprocessCallError(f"Invalid Git repository for {self.sources_dir.archive_path}")
+
         temp_archive_prefix = "tmp-archive-"
-        # files ending in .tar.gz will be used by update_and_archive
+        # files ending in .tar.gz are source archives
         temp_archive_suffix = ".tgz.temp"
         with tempfile.NamedTemporaryFile(
             "wb",
@@ -142,84 +227,158 @@ class Git(SCM):
             try:
                 log.debug("Moving the archive to %s", self.sources_dir.archive_path)
                 os.link(tmp.name, self.sources_dir.archive_path)
+                created = True
             except FileExistsError:
                 # This may happen often for large archives. It should be safe to proceed
                 log.warning(
                     "%s was created while this task was running. Will proceed with that archive",
                     self.sources_dir.archive_path,
                 )
+                created = False
+
+        if created:
+            # The state is read once the temporary link is removed, since it changes the ctime
+            state = self._get_archive_state()
+            state["checksum"] = hash_file(self.sources_dir.archive_path).hexdigest()
+            self._store_archive_verification(state)
+            return
+
         try:
             self._verify_archive()
         except (FileAccessError, SubprocessCallError):
             log.debug("Removing invalid archive at %s", self.sources_dir.archive_path)
             os.unlink(self.sources_dir.archive_path)
+            self._archive_verification_path.unlink(missing_ok=True)
             raise
 
-    def clone_and_archive(self, gitsubmodule=False):
+    @contextmanager
+    def _locked_mirror(self):
         """
-        Clone the git repository and create the compressed source archive.
+        Hold an exclusive lock on the mirror of the repository.
 
-        :param bool gitsubmodule: a bool to determine whether git submodules need to be processed.
-        :raises RepositoryAccessError: if cloning the repository fails or archive can't be created
+        The lock is shared by all the workers using the same sources directory. The modification
+        time of the lock file is updated each time the mirror is used, see ``prune_git_mirrors``.
         """
-        with tempfile.TemporaryDirectory(prefix="cachito-") as temp_dir:
-            log.debug("Cloning the Git repository from %s", self.url)
-            clone_path = os.path.join(temp_dir, "repo")
-            try:
-                repo = git.repo.Repo.clone_from(
-                    self.url,
-                    clone_path,
-                    no_checkout=True,
-                    filter="blob:none",
-                    # Don't allow git to prompt for a username if we don't have access
-                    env={"GIT_TERMINAL_PROMPT": "0"},
-                )
-            except Exception as ex:
-                log.exception(
-                    "Failed cloning the Git repository from %s, ref: %s, exception: %s",
-                    self.url,
-                    self.ref,
-                    type(ex).__name__,
-                )
-                raise RepositoryAccessError("Failed cloning the Git repository")
+        with open(self.sources_dir.mirror_lock_path, "w") as lock_file:
+            log.debug("Locking the mirror at %s", self.sources_dir.mirror_path)
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            os.utime(lock_file.fileno())
+            yield
 
-            self._reset_git_head(repo)
+    def _create_mirror(self):
+        """
+        Create an empty bare mirror of the git repository in the sources directory.
 
-            if gitsubmodule:
-                self.update_git_submodules(repo)
+        The mirror is created in a temporary directory next to its final path and then moved in
+        place, so an interrupted creation doesn't leave a partial mirror behind. The working
+        clones are created from the mirror with a blob filter and fetch the requested commit by
+        its SHA, which the mirror must allow.
+        """
+        log.debug("Creating the mirror of the Git repository at %s", self.sources_dir.mirror_path)
+        with tempfile.TemporaryDirectory(
+            prefix="tmp-mirror-", dir=self.sources_dir.package_dir
+        ) as temp_dir:
+            mirror_path = os.path.join(temp_dir, "mirror.git")
+            mirror = git.Repo.init(mirror_path, bare=True)
+            mirror.create_remote("origin", self.url)
+            with mirror.config_writer() as config:
+                # Otherwise, the fetched branches are also stored as remote-tracking branches
+                config.set_value('remote "origin"', "fetch", _MIRROR_REFSPECS[0])
+                config.add_value('remote "origin"', "fetch", _MIRROR_REFSPECS[1])
+                config.set_value("uploadpack", "allowFilter", "true")
+                config.set_value("uploadpack", "allowAnySHA1InWant", "true")
+            os.rename(mirror_path, self.sources_dir.mirror_path)
+
+    def _update_mirror(self):
+        """
+        Fetch the branches, the tags and the Git reference to the mirror of the repository.
 
-            repo.git.gc("--prune=now")
-            self._create_archive(repo.working_dir)
+        Only the branches and the tags are kept in the mirror, the other references of the remote
+        repository such as the pull requests are not fetched. The mirror is created first if it
+        doesn't exist yet or if it is not a valid mirror. This must be called while holding the
+        lock on the mirror.
 
-    def update_and_archive(self, previous_archive, gitsubmodule=False):
+        :raises RepositoryAccessError: if fetching from the remote repository fails
         """
-        Update the existing Git history and create a source archive.
+        mirror_path = self.sources_dir.mirror_path
+        try:
+            mirror = git.Repo(mirror_path)
+            config = mirror.config_reader()
+            # A partial clone lacks the blobs, which the clones would fetch from the remote. A
+            # mirror clone has all the references of the remote repository.
+            if config.has_option('remote "origin"', "promisor") or config.has_option(
+                'remote "origin"', "mirror"
+            ):
+                raise git.exc.InvalidGitRepositoryError(f"{mirror_path} is not a valid mirror")
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
+            if mirror_path.exists():
+                log.warning('The mirror at "%s" is invalid and will be re-created', mirror_path)
+                shutil.rmtree(mirror_path)
+            self._create_mirror()
+            mirror = git.Repo(mirror_path)
+
+        try:
+            remote = mirror.remote()
+            # Repositories with the same name may be requested from different URLs
+            if remote.url != self.url:
+                remote.set_url(self.url)
+            # The reference must be specified to handle commits which are not part
+            # of a branch.
+            # Don't allow git to prompt for a username if we don't have access
+            with mirror.git.custom_environment(GIT_TERMINAL_PROMPT="0"):
+                remote.fetch(refspec=[*_MIRROR_REFSPECS, self.ref], force=True, prune=True)
+        except Exception as ex:
+            log.exception(
+                "Failed to fetch from remote %s, ref: %s, exception: %s",
+                self.url,
+                self.ref,
+                type(ex).__name__,
+            )
+            raise RepositoryAccessError("Failed to fetch from the remote Git repository")
+
+    def _clone_from_mirror(self, clone_path):
+        """
+        Clone the mirror of the repository to a working repository, without checking it out.
+
+        Like when cloning the remote repository directly, only the commits and the trees are
+        cloned and the blobs are fetched on checkout, but from the mirror. The Git reference is
+        fetched as well, since it may not be part of a branch. This must be called while holding
+        the lock on the mirror.
+
+        :param str clone_path: the path to clone the mirror to
+        :return: the working repository
+        :rtype: git.Repo
+        """
+        log.debug("Cloning the mirror at %s to %s", self.sources_dir.mirror_path, clone_path)
+        repo = git.repo.Repo.clone_from(
+            str(self.sources_dir.mirror_path),
+            clone_path,
+            no_local=True,
+            no_checkout=True,
+            filter="blob:none",
+        )
+        repo.remote().fetch(refspec=self.ref)
+        return repo
+
+    def clone_and_archive(self, gitsubmodule=False):
+        """
+        Update the mirror of the Git repository and create the compressed source archive.
 
-        :param str previous_archive: path to an archive file created before.
         :param bool gitsubmodule: a bool to determine whether git submodules need to be processed.
-        :raises RepositoryAccessError: if pulling the Git history from the remote repo or
-            the checkout of the target Git ref fails.
+        :raises RepositoryAccessError: if cloning the repository or fetching the Git reference
+            from the remote repository fails
+        :raises InvalidRequestData: if the checkout of the target Git ref fails
         """
         with tempfile.TemporaryDirectory(prefix="cachito-") as temp_dir:
-            with tarfile.open(previous_archive, mode="r:gz") as tar:
-                safe_extract(tar, temp_dir)
+            clone_path = os.path.join(temp_dir, "repo")
+            with self._locked_mirror():
+                self._update_mirror()
+                repo = self._clone_from_mirror(clone_path)
+                self._reset_git_head(repo)
 
-            repo = git.Repo(os.path.join(temp_dir, "app"))
-            try:
-                # The reference must be specified to handle commits which are not part
-                # of a branch.
-                repo.remote().fetch(refspec=self.ref, tags=True, force=True)
-
-            except Exception as ex:
-                log.exception(
-                    "Failed to fetch from remote %s, ref: %s, exception: %s",
-                    self.url,
-                    self.ref,
-                    type(ex).__name__,
-                )
-                raise RepositoryAccessError("Failed to fetch from the remote Git repository")
+            # The mirror is not part of the source archive
+            repo.remote().set_url(self.url)
 
-            self._reset_git_head(repo)
             if gitsubmodule:
                 self.update_git_submodules(repo)
 
@@ -229,6 +388,9 @@ class Git(SCM):
     def fetch_source(self, gitsubmodule=False):
         """Fetch the repo, create a compressed tar file, and put it in long-term storage.
 
+        The Git history is kept in a mirror of the repository shared by all the requests for the
+        same repository, only the missing objects are fetched from the remote repository.
+
         :param bool gitsubmodule: a bool to determine whether git submodules need to be processed.
         """
         if gitsubmodule:
@@ -244,39 +406,6 @@ class Git(SCM):
             except (FileAccessError, SubprocessCallError):
                 log.warning('The archive at "%s" is invalid and will be re-created', archive_path)
 
-        # Find a previous archive created by a previous request
-        #
-        # The previous archive does not mean the one just before the request that
-        # schedules current task. The only reason for finding out such a file is
-        # to access the git history. So, anyone is ok.
-        previous_archives = sorted(
-            self.sources_dir.package_dir.glob("*.tar.gz"), key=os.path.getctime, reverse=True
-        )
-        for previous_archive in previous_archives:
-            # Excluding previous archives with submodules since there is
-            # no straight-forward way to get rid of the previously included
-            # submodules
-            if "-with-submodules" in str(previous_archive):
-                continue
-            try:
-                self.update_and_archive(previous_archive, gitsubmodule=gitsubmodule)
-                return
-            except (
-                git.exc.InvalidGitRepositoryError,
-                tarfile.ExtractError,
-                OSError,  # raised by tarfile when an FS operation fails
-            ) as exc:
-                log.warning(
-                    "Error handling archived artifact '%s': %s - %s",
-                    previous_archive,
-                    repr(exc),
-                    exc,
-                )
-                log.info(
-                    "Existing archive at '%s' may be corrupted and will not be used. Recovering...",
-                    previous_archive,
-                )
-
         self.clone_and_archive(gitsubmodule=gitsubmodule)
 
     def update_git_submodules(self, repo):
@@ -315,3 +444,32 @@ class Git(SCM):
             log.debug('Parsed the repository name "%s" from %s', self._repo_name, self.url)
 
         return self._repo_name
+
+
+def prune_git_mirrors(min_age: float) -> List[Path]:
+    """
+    Remove the Git mirrors in the sources directory which were not used recently.
+
+    The mirrors which are locked by a request are skipped. The lock files are kept, since a
+    request may already be waiting for them.
+
+    :param float min_age: only prune the mirrors which were not used in the last ``min_age``
+        seconds
+    :return: the paths of the pruned mirrors
+    :rtype: list[Path]
+    """
+    pruned = []
+    threshold = time.time() - min_age
+    for lock_path in Path(get_worker_config().cachito_sources_dir).glob("**/mirror.lock"):
+        mirror_path = lock_path.with_name("mirror.git")
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                log.debug("Skipping the mirror at %s which is in use", mirror_path)
+                continue
+            if os.fstat(lock_file.fileno()).st_mtime < threshold and mirror_path.exists():
+                log.debug("Pruning the unused mirror at %s", mirror_path)
+                shutil.rmtree(mirror_path)
+                pruned.append(mirror_path)
+    return pruned
@@ -2,12 +2,13 @@
 import logging
 import os
 import shutil
-import tarfile
 from pathlib import Path
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, ContextManager, List, Optional, cast
 
 import requests
 
+from cachito.common import paths
+from cachito.common.bundle_stream import BundleArchiveStream
 from cachito.common.checksum import hash_file
 from cachito.common.packages_data import PackagesData
 from cachito.errors import (
@@ -21,12 +22,17 @@ from cachito.errors import (
     SubprocessCallError,
     ValidationError,
 )
+from cachito.workers.blob_store import get_blob_store
+from cachito.workers.bundle_writer import IncrementalBundleArchive, open_bundle_archive
+from cachito.workers.config import get_worker_config
 from cachito.workers.paths import RequestBundleDir
 from cachito.workers.scm import Git
 from cachito.workers.tasks.celery import app
 from cachito.workers.tasks.utils import (
+    get_latest_complete_request,
     get_request,
     get_request_packages_and_dependencies,
+    get_request_packages_checksum,
     runs_if_request_in_progress,
     set_packages_and_deps_counts,
     set_request_state,
@@ -40,6 +46,7 @@ __all__ = [
     "finalize_request",
     "get_request",
     "save_bundle_archive_checksum",
+    "save_streamed_bundle_archive_checksum",
     "process_fetched_sources",
 ]
 log = logging.getLogger(__name__)
@@ -143,12 +150,16 @@ def failed_request_callback(context, exc, traceback, request_id):
     set_request_state(request_id, "failed", msg, error_origin, error_type)
 
 
-def create_bundle_archive(request_id: int, flags: List[str]) -> None:
+def create_bundle_archive(
+    request_id: int, flags: List[str], previous_request_id: Optional[int] = None
+) -> None:
     """
     Create the bundle archive to be downloaded by the user.
 
     :param int request_id: the request the bundle is for
     :param list[str] flags: the list of request flags.
+    :param int previous_request_id: the request whose bundle archive can be reused when the
+        ``cachito_bundle_incremental`` configuration is set
     """
     set_request_state(request_id, "in_progress", "Assembling the bundle archive")
     bundle_dir = RequestBundleDir(request_id)
@@ -164,7 +175,28 @@ def create_bundle_archive(request_id: int, flags: List[str]) -> None:
     if "include-git-dir" in flags:
         tar_filter = None
 
-    with tarfile.open(bundle_dir.bundle_archive_file, mode="w:gz") as bundle_archive:
+    config = get_worker_config()
+    bundle_archive_cm: ContextManager[Any]
+    if config.cachito_bundle_incremental:
+        previous_archive = previous_index = None
+        if previous_request_id:
+            # Don't use the worker RequestBundleDir, it would create the previous temp directory
+            previous_bundle_dir = paths.RequestBundleDir(
+                previous_request_id, config.cachito_bundles_dir
+            )
+            previous_archive = previous_bundle_dir.bundle_archive_file
+            previous_index = previous_bundle_dir.bundle_archive_index
+            log.info("Reusing the bundle archive of request %d when possible", previous_request_id)
+        bundle_archive_cm = IncrementalBundleArchive(
+            bundle_dir.bundle_archive_file,
+            bundle_dir.bundle_archive_index,
+            previous_archive,
+            previous_index,
+        )
+    else:
+        bundle_archive_cm = open_bundle_archive(bundle_dir.bundle_archive_file)
+
+    with bundle_archive_cm as bundle_archive:
         # Add the source to the bundle. This is done one file/directory at a time in the parent
         # directory in order to exclude the app/.git folder.
         for item in bundle_dir.source_dir.iterdir():
@@ -189,7 +221,11 @@ def aggregate_packages_data(request_id: int, pkg_managers: List[str]) -> Package
         aggregated_data.load(data_file)
 
     log.debug("Write request %s packages data into %s", request_id, bundle_dir.packages_data)
-    aggregated_data.write_to_file(str(bundle_dir.packages_data))
+    aggregated_data.write_to_file(
+        str(bundle_dir.packages_data),
+        with_dependencies=True,
+        indexed=get_worker_config().cachito_packages_data_indexed,
+    )
 
     return aggregated_data
 
@@ -208,21 +244,71 @@ def save_bundle_archive_checksum(request_id: int) -> None:
     bundle_dir.bundle_archive_checksum.write_text(checksum, encoding="utf-8")
 
 
+def save_streamed_bundle_archive_checksum(request_id: int, flags: List[str]) -> None:
+    """
+    Compute and store the checksum of the bundle archive which the API streams to the users.
+
+    The archive is generated without being written, then the bundle directory is marked as
+    streamed so that the API keeps it and streams the archive from it.
+
+    :param int request_id: the request id.
+    :param list[str] flags: the list of request flags.
+    """
+    set_request_state(request_id, "in_progress", "Computing the checksum of the bundle archive")
+    bundle_dir = RequestBundleDir(request_id)
+    stream = BundleArchiveStream(bundle_dir, include_git_dir="include-git-dir" in flags)
+    for _ in stream:
+        pass
+    bundle_dir.bundle_archive_checksum.write_text(cast(str, stream.hexdigest), encoding="utf-8")
+    bundle_dir.bundle_archive_streamed.touch()
+
+
+def _get_previous_request_id(repo: str) -> Optional[int]:
+    """
+    Get the ID of the latest complete request for the repository, if any.
+
+    Failing to find it is not fatal, the bundle archive is then created from scratch.
+
+    :param str repo: the URL of the repository
+    :return: the request ID or None
+    """
+    try:
+        previous_request = get_latest_complete_request(repo)
+    except NetworkError:
+        log.warning("Failed to find the previous request for %s, not reusing its bundle", repo)
+        return None
+    return previous_request["id"] if previous_request else None
+
+
 @app.task
 @runs_if_request_in_progress
 def process_fetched_sources(request_id):
     """Generate files for request and updates the request with packages/dependencies counts."""
     request = get_request(request_id)
-    create_bundle_archive(request_id, request.get("flags", []))
-    save_bundle_archive_checksum(request_id)
+    blob_store = get_blob_store()
+    if blob_store:
+        deps_dir = RequestBundleDir(request_id).deps_dir
+        added = blob_store.add_tree(deps_dir)
+        log.debug("Added %d files from %s to the blob store", added, deps_dir)
+    config = get_worker_config()
+    if config.cachito_bundle_streaming:
+        log.info("Not creating the bundle archive of request %d, the API streams it", request_id)
+        save_streamed_bundle_archive_checksum(request_id, request.get("flags", []))
+    else:
+        previous_request_id = None
+        if config.cachito_bundle_incremental:
+            previous_request_id = _get_previous_request_id(request["repo"])
+        create_bundle_archive(request_id, request.get("flags", []), previous_request_id)
+        save_bundle_archive_checksum(request_id)
     data = aggregate_packages_data(request_id, request["pkg_managers"])
 
     packages_count = len(data.packages)
     dependencies_count = len(data.all_dependencies)
+    checksum = hash_file(RequestBundleDir(request_id).packages_data).hexdigest()
 
     set_packages_and_deps_counts(request_id, packages_count, dependencies_count)
 
-    return packages_count, dependencies_count
+    return packages_count, dependencies_count, checksum
 
 
 def _check_packages_data_on_api(
@@ -244,12 +330,31 @@ def _check_packages_data_on_api(
     raise InvalidRequestData(f"Error checking packages data for request {request_id}.")
 
 
+def _check_packages_checksum_on_api(request_id: int, checksum: str) -> None:
+    actual_checksum = get_request_packages_checksum(request_id, checksum)
+
+    log.info(
+        f"Checking the packages file checksum for request {request_id}. "
+        f"Expected {checksum}, got {actual_checksum}."
+    )
+
+    if actual_checksum == checksum:
+        return
+
+    raise InvalidRequestData(f"Error checking packages data for request {request_id}.")
+
+
 @app.task(priority=10)
 @runs_if_request_in_progress
 def finalize_request(counts, request_id):
     """Check if the packages file can be read by the API and set the request state to complete."""
-    packages_count = counts[0]
-    dependencies_count = counts[1]
+    if len(counts) > 2:
+        _check_packages_checksum_on_api(request_id, counts[2])
+    else:
+        # The packages file checksum is missing from the results of the tasks queued before it
+        # was added, so check the contents of the packages file instead
+        packages_count = counts[0]
+        dependencies_count = counts[1]
+        _check_packages_data_on_api(request_id, packages_count, dependencies_count)
 
-    _check_packages_data_on_api(request_id, packages_count, dependencies_count)
     set_request_state(request_id, "complete", "Completed successfully")
@@ -2,7 +2,7 @@
 import json
 import logging
 import os
-from typing import List, Optional
+from typing import List, Optional, Set
 
 from cachito.common.packages_data import PackagesData
 from cachito.errors import FileAccessError, InvalidRepoStructure, ValidationError
@@ -28,6 +28,7 @@ from cachito.workers.tasks.celery import app
 from cachito.workers.tasks.utils import (
     get_request,
     make_base64_config_file,
+    map_subpaths,
     runs_if_request_in_progress,
     set_request_state,
 )
@@ -126,29 +127,28 @@ def fetch_npm_source(request_id, package_configs=None):
     repo_name = get_npm_proxy_repo_name(request_id)
     prepare_nexus_for_js_request(repo_name)
 
-    npm_config_files = []
-    downloaded_deps = set()
-    packages_json_data = PackagesData()
+    request = get_request(request_id)
+    # Shared by the subpaths so that each dependency is only downloaded once for the request
+    downloaded_deps: Set[str] = set()
 
-    for i, subpath in enumerate(subpaths):
+    def resolve_subpath(subpath: str) -> dict:
         log.info("Fetching the npm dependencies for request %d in subpath %s", request_id, subpath)
         set_request_state(
             request_id,
             "in_progress",
             f'Fetching the npm dependencies at the "{subpath}" directory"',
         )
-        request = get_request(request_id)
         package_source_path = str(bundle_dir.app_subpath(subpath).source_dir)
         try:
-            package_and_deps_info = resolve_npm(
-                package_source_path, request, skip_deps=downloaded_deps
-            )
+            return resolve_npm(package_source_path, request, skip_deps=downloaded_deps)
         except (FileAccessError, ValidationError):
             log.exception("Failed to fetch npm dependencies for request %d", request_id)
             raise
 
-        downloaded_deps = downloaded_deps | package_and_deps_info["downloaded_deps"]
+    npm_config_files = []
+    packages_json_data = PackagesData()
 
+    for subpath, package_and_deps_info in zip(subpaths, map_subpaths(resolve_subpath, subpaths)):
         log.info(
             "Generating the npm configuration files for request %d in subpath %s",
             request_id,
@@ -166,14 +166,13 @@ def fetch_npm_source(request_id, package_configs=None):
             lock_file_path = os.path.join(remote_package_source_path, lock_file_name)
             npm_config_files.append(make_base64_config_file(package_lock_str, lock_file_path))
 
-        if i == 0:
-            env_vars = get_worker_config().cachito_default_environment_variables.get("npm", {})
-            update_request_env_vars(request_id, env_vars)
-
         pkg_info = package_and_deps_info["package"]
         pkg_deps = package_and_deps_info["deps"]
         packages_json_data.add_package(pkg_info, subpath, pkg_deps)
 
+    env_vars = get_worker_config().cachito_default_environment_variables.get("npm", {})
+    update_request_env_vars(request_id, env_vars)
+
     packages_json_data.write_to_file(bundle_dir.npm_packages_data)
 
     log.info("Finalizing the Nexus configuration for npm for the request %d", request_id)
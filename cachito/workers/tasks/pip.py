@@ -28,6 +28,7 @@ from cachito.workers.tasks.celery import app
 from cachito.workers.tasks.utils import (
     get_request,
     make_base64_config_file,
+    map_subpaths,
     runs_if_request_in_progress,
     set_request_state,
 )
@@ -70,9 +71,11 @@ def fetch_pip_source(request_id, package_configs=None):
 
     log.info("Fetching dependencies for request %d", request_id)
     package_configs = package_configs or [{}]
-    packages_data = []
-    requirement_file_paths = []
-    for pkg_cfg in package_configs:
+    request = get_request(request_id)
+    # The packages are resolved concurrently and may depend on the same VCS or URL dependencies
+    raw_component_locks: dict = {}
+
+    def resolve_package(pkg_cfg: dict) -> dict:
         pkg_path = os.path.normpath(pkg_cfg.get("path", "."))
         source_dir = bundle_dir.app_subpath(pkg_path).source_dir
         set_request_state(
@@ -80,14 +83,17 @@ def fetch_pip_source(request_id, package_configs=None):
             "in_progress",
             f"Fetching dependencies at the {pkg_path!r} directory",
         )
-        request = get_request(request_id)
-        pkg_and_deps_info = resolve_pip(
+        return resolve_pip(
             source_dir,
             request,
             requirement_files=pkg_cfg.get("requirements_files"),
             build_requirement_files=pkg_cfg.get("requirements_build_files"),
+            raw_component_locks=raw_component_locks,
         )
 
+    packages_data = []
+    requirement_file_paths = []
+    for pkg_and_deps_info in map_subpaths(resolve_package, package_configs):
         # defer custom requirement files creation to use the Nexus password in the URLs
         for requirement_file_path in pkg_and_deps_info.pop("requirements"):
             requirement_file_paths.append(requirement_file_path)
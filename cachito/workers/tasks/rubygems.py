@@ -24,6 +24,7 @@ from cachito.workers.tasks.celery import app
 from cachito.workers.tasks.utils import (
     get_request,
     make_base64_config_file,
+    map_subpaths,
     runs_if_request_in_progress,
     set_request_state,
 )
@@ -61,22 +62,21 @@ def fetch_rubygems_source(request_id: int, package_configs: Optional[list[dict]]
 
     log.info("Fetching dependencies for request %d", request_id)
     package_configs = package_configs or [{}]
-    packages_data = []
-    for pkg_cfg in package_configs:
-        pkg_path = os.path.normpath(pkg_cfg.get("path", "."))
-        package_source_dir = bundle_dir.app_subpath(pkg_path).source_dir
+    subpaths = [os.path.normpath(pkg_cfg.get("path", ".")) for pkg_cfg in package_configs]
+    request = get_request(request_id)
+    # The subpaths are resolved concurrently and may depend on the same git repositories
+    git_locks: dict = {}
+
+    def resolve_subpath(subpath: str) -> dict:
+        package_source_dir = bundle_dir.app_subpath(subpath).source_dir
         set_request_state(
             request_id,
             "in_progress",
-            f"Fetching dependencies at the {pkg_path!r} directory",
-        )
-        request = get_request(request_id)
-        pkg_and_deps_info = resolve_rubygems(
-            package_source_dir,
-            request,
+            f"Fetching dependencies at the {subpath!r} directory",
         )
+        return resolve_rubygems(package_source_dir, request, git_locks)
 
-        packages_data.append(pkg_and_deps_info)
+    packages_data = map_subpaths(resolve_subpath, subpaths)
 
     log.info("Finalizing the Nexus configuration for RubyGems for the request %d", request_id)
     set_request_state(request_id, "in_progress", "Finalizing the Nexus configuration for RubyGems")
@@ -92,20 +92,18 @@ def fetch_rubygems_source(request_id: int, package_configs: Optional[list[dict]]
     else:
         ca_cert_path = None
 
-    for pkg_data, pkg_cfg in zip(packages_data, package_configs):
-        pkg_path = os.path.normpath(pkg_cfg.get("path", "."))
-        package_source_dir = bundle_dir.app_subpath(pkg_path).source_dir
+    for pkg_data, subpath in zip(packages_data, subpaths):
+        package_source_dir = bundle_dir.app_subpath(subpath).source_dir
         config_file = _get_config_file_for_given_package(
             pkg_data["dependencies"], bundle_dir, package_source_dir, hosted_url, ca_cert_path
         )
         rubygems_config_files.append(config_file)
 
     packages_json_data = PackagesData()
-    for pkg_data, pkg_cfg in zip(packages_data, package_configs):
-        pkg_subpath = os.path.normpath(pkg_cfg.get("path", "."))
+    for pkg_data, subpath in zip(packages_data, subpaths):
         pkg_info = pkg_data["package"]
         pkg_deps = cleanup_metadata(pkg_data["dependencies"])
-        packages_json_data.add_package(pkg_info, pkg_subpath, pkg_deps)
+        packages_json_data.add_package(pkg_info, subpath, pkg_deps)
     packages_json_data.write_to_file(bundle_dir.rubygems_packages_data)
 
     if rubygems_config_files:
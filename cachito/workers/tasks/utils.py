@@ -1,9 +1,11 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import base64
+import concurrent.futures
+import contextvars
 import functools
 import logging
 from pathlib import Path
-from typing import Callable, Optional, Union
+from typing import Callable, List, Optional, TypeVar, Union
 
 import requests
 
@@ -16,14 +18,19 @@ __all__ = [
     "make_base64_config_file",
     "AssertPackageFiles",
     "runs_if_request_in_progress",
+    "get_latest_complete_request",
     "get_request",
     "get_request_state",
+    "map_subpaths",
     "set_packages_and_deps_counts",
     "set_request_state",
 ]
 
 log = logging.getLogger(__name__)
 
+S = TypeVar("S")
+T = TypeVar("T")
+
 
 def make_base64_config_file(content: str, dest_relpath: Union[str, Path]) -> dict:
     """
@@ -116,6 +123,35 @@ class AssertPackageFiles:
             raise ValidationError(f"File check failed for {self._pkg_manager}: {err_msg}")
 
 
+def map_subpaths(func: Callable[[S], T], subpaths: List[S]) -> List[T]:
+    """
+    Call a function on each package subpath of a request, concurrently if configured.
+
+    At most ``cachito_subpaths_concurrency_limit`` subpaths are processed at the same time. The
+    results are returned in the order of the subpaths so that the caller can merge them
+    deterministically. If a call fails, the subpaths which are not processed yet are skipped and
+    the exception is raised once the running calls end.
+
+    :param func: the function to call with each subpath
+    :param subpaths: the package subpaths of the request, or the package configurations which
+        hold them
+    :return: the return values of the calls, in the order of the subpaths
+    """
+    max_workers = min(get_worker_config().cachito_subpaths_concurrency_limit, len(subpaths))
+    if max_workers <= 1:
+        return [func(subpath) for subpath in subpaths]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Run each call in a copy of the current context to keep the tracing context
+        futures = [
+            executor.submit(contextvars.copy_context().run, func, subpath) for subpath in subpaths
+        ]
+        concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+        for future in futures:
+            future.cancel()
+        return [future.result() for future in futures]
+
+
 def runs_if_request_in_progress(task_fn):
     """
     Decorate a task to make it check request state before proceeding.
@@ -164,6 +200,30 @@ def get_request(request_id: int) -> dict:
     return request
 
 
+def get_latest_complete_request(repo: str) -> Optional[dict]:
+    """
+    Get the JSON representation of the latest complete request for a repository.
+
+    :param str repo: the URL of the repository, as set in the request
+    :return: JSON representation of the request or None if there is no complete request
+    :raises NetworkError: if the connection fails or the API returns an error response
+    """
+    config = get_worker_config()
+    url = f'{config.cachito_api_url.rstrip("/")}/requests'
+    params = {"repo": repo, "state": "complete", "per_page": 1}
+    log.debug("Getting the latest complete request for %s", repo)
+    try:
+        rv = requests_session.get(url, params=params, timeout=config.cachito_api_timeout)
+        rv.raise_for_status()
+    except requests.RequestException as e:
+        msg = f"Failed to get the latest complete request for {repo}: {e}"
+        log.exception(msg)
+        raise NetworkError(msg)
+
+    items = rv.json()["items"]
+    return items[0] if items else None
+
+
 def get_request_state(request_id):
     """
     Get the state of the request.
@@ -200,6 +260,30 @@ def get_request_packages_and_dependencies(request_id: int):
     return request
 
 
+def get_request_packages_checksum(request_id: int, expected_checksum: str) -> str:
+    """
+    Get the checksum of the packages file from the Cachito API.
+
+    :param request_id: the Cachito request ID this is for
+    :param expected_checksum: the SHA-256 checksum of the packages file written by the worker
+    :return: the SHA-256 checksum of the packages file read by the API
+    :raises NetworkError: if the connection fails or the API returns an error response
+    """
+    log.info("Getting the packages file checksum for request %d", request_id)
+    rv = _get_request_or_fail(
+        request_id,
+        connect_error_msg=(
+            "The connection failed while getting the packages file checksum for request "
+            f"{request_id}: {{exc}}"
+        ),
+        status_error_msg=(
+            f"Packages file checksum could not be loaded for request {request_id}: {{exc}}"
+        ),
+        endpoint=f"packages/checksum?expected={expected_checksum}",
+    )
+    return rv["checksum"]
+
+
 def set_request_state(request_id, state, state_reason, error_origin=None, error_type=None):
     """
     Set the state of the request using the Cachito API.
@@ -31,6 +31,7 @@ from cachito.workers.tasks.utils import (
     AssertPackageFiles,
     get_request,
     make_base64_config_file,
+    map_subpaths,
     runs_if_request_in_progress,
     set_request_state,
 )
@@ -142,29 +143,28 @@ def fetch_yarn_source(request_id: int, package_configs: Optional[List[dict]] = N
     repo_name = get_yarn_proxy_repo_name(request_id)
     prepare_nexus_for_js_request(repo_name)
 
-    yarn_config_files = []
+    request = get_request(request_id)
+    # Shared by the subpaths so that each dependency is only downloaded once for the request
     downloaded_deps: Set[str] = set()
-    packages_json_data = PackagesData()
 
-    for i, subpath in enumerate(subpaths):
+    def resolve_subpath(subpath: str) -> dict:
         log.info("Fetching the yarn dependencies for request %d in subpath %s", request_id, subpath)
         set_request_state(
             request_id,
             "in_progress",
             f'Fetching the yarn dependencies at the "{subpath}" directory',
         )
-        request = get_request(request_id)
         package_source_path = str(bundle_dir.app_subpath(subpath).source_dir)
         try:
-            package_and_deps_info = resolve_yarn(
-                package_source_path, request, skip_deps=downloaded_deps
-            )
+            return resolve_yarn(package_source_path, request, skip_deps=downloaded_deps)
         except (InvalidRequestData, NexusError):
             log.exception("Failed to fetch yarn dependencies for request %d", request_id)
             raise
 
-        downloaded_deps = downloaded_deps | package_and_deps_info["downloaded_deps"]
+    yarn_config_files = []
+    packages_json_data = PackagesData()
 
+    for subpath, package_and_deps_info in zip(subpaths, map_subpaths(resolve_subpath, subpaths)):
         log.info(
             "Generating the yarn configuration files for request %d in subpath %s",
             request_id,
@@ -181,15 +181,14 @@ def fetch_yarn_source(request_id: int, package_configs: Optional[List[dict]] = N
             yarn_lock_path = os.path.join(remote_package_source_path, "yarn.lock")
             yarn_config_files.append(make_base64_config_file(yarn_lock_str, yarn_lock_path))
 
-        if i == 0:
-            default_env = get_worker_config().cachito_default_environment_variables
-            env_vars = {**default_env.get("npm", {}), **default_env.get("yarn", {})}
-            update_request_env_vars(request_id, env_vars)
-
         pkg_info = package_and_deps_info["package"]
         pkg_deps = package_and_deps_info["deps"]
         packages_json_data.add_package(pkg_info, subpath, pkg_deps)
 
+    default_env = get_worker_config().cachito_default_environment_variables
+    env_vars = {**default_env.get("npm", {}), **default_env.get("yarn", {})}
+    update_request_env_vars(request_id, env_vars)
+
     packages_json_data.write_to_file(bundle_dir.yarn_packages_data)
 
     log.info("Finalizing the Nexus configuration for yarn for the request %d", request_id)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Compare the throughput of the bundle archive writers on a synthetic bundle.
+
+The synthetic bundle is a mix of compressible source-like files and incompressible binary
+files, similar to an application source with vendored dependency archives.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from cachito.workers.bundle_writer import BUNDLE_WRITERS, open_bundle_archive
+from cachito.workers.config import get_worker_config
+
+FILE_SIZE = 1024 * 1024
+WORDS = [
+    b"import",
+    b"return",
+    b"function",
+    b"const",
+    b"package",
+    b"require",
+    b"module",
+    b"exports",
+    b"dependencies",
+    b"version",
+]
+
+
+def _create_bundle_dir(root: Path, size: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    written = 0
+    i = 0
+    while written < size:
+        subdir = root / "deps" / f"pkg-{i // 100}"
+        subdir.mkdir(parents=True, exist_ok=True)
+        if i % 4 == 0:
+            # Already compressed dependency archives
+            data = rng.randbytes(FILE_SIZE)
+        else:
+            data = b" ".join(rng.choices(WORDS, k=FILE_SIZE // 6))[:FILE_SIZE]
+        (subdir / f"file-{i}").write_bytes(data)
+        written += len(data)
+        i += 1
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=2048, help="size of the synthetic bundle")
+    parser.add_argument("--threads", type=int, default=None, help="parallel compression threads")
+    parser.add_argument("--tmpdir", default=None, help="where to create the synthetic bundle")
+    args = parser.parse_args()
+
+    conf = get_worker_config()
+    conf.cachito_bundle_compression_threads = args.threads
+
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+        bundle_dir = Path(tmpdir, "bundle")
+        size = args.size_mb * 1024 * 1024
+        print(f"Creating a synthetic bundle of {args.size_mb} MiB in {bundle_dir}")
+        _create_bundle_dir(bundle_dir, size)
+
+        for writer in BUNDLE_WRITERS:
+            conf.cachito_bundle_writer = writer
+            archive_path = Path(tmpdir, f"{writer}.tar.gz")
+            start = time.monotonic()
+            with open_bundle_archive(archive_path) as archive:
+                archive.add(str(bundle_dir / "deps"), "deps")
+            elapsed = time.monotonic() - start
+            compressed = archive_path.stat().st_size
+            print(
+                f"{writer:>14}: {elapsed:8.2f}s {size / elapsed / 1024 / 1024:8.1f} MiB/s "
+                f"ratio {compressed / size:.3f}"
+            )
+            os.unlink(archive_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare copying and linking when merging a Go module cache into a request bundle.
+
+The synthetic module cache has the layout of the cache/download directory of GOMODCACHE. Half
+of its modules are already present in the destination, so their list files are merged.
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from cachito.workers.pkg_managers import gomod
+
+
+def _create_download_dir(root: Path, modules: int, zip_size: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    for i in range(modules):
+        module_dir = root / "github.com" / f"org-{i % 50}" / f"module-{i}" / "@v"
+        module_dir.mkdir(parents=True)
+        versions = [f"v1.{minor}.0" for minor in rng.sample(range(20), 3)]
+        (module_dir / "list").write_text("".join(f"{version}\n" for version in versions))
+        (module_dir / "list.lock").touch()
+        version = versions[-1]
+        (module_dir / f"{version}.info").write_text(f'{{"Version":"{version}"}}')
+        (module_dir / f"{version}.mod").write_text(f"module github.com/org-{i % 50}/module-{i}\n")
+        (module_dir / f"{version}.zip").write_bytes(rng.randbytes(zip_size))
+        (module_dir / f"{version}.ziphash").write_text("h1:0000")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", type=int, default=5000, help="number of modules")
+    parser.add_argument("--zip-kb", type=int, default=64, help="size of each module zip")
+    parser.add_argument("--tmpdir", default=None, help="where to create the module caches")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+        src_dir = Path(tmpdir, "src")
+        print(f"Creating a synthetic module cache of {args.modules} modules in {src_dir}")
+        _create_download_dir(src_dir, args.modules, args.zip_kb * 1024)
+        existing_dir = Path(tmpdir, "existing")
+        _create_download_dir(existing_dir, args.modules // 2, args.zip_kb * 1024, seed=7)
+
+        strategies = {
+            "copy": mock.patch.object(gomod, "_transfer_file", shutil.copy2),
+            "link": mock.patch.object(gomod, "_transfer_file", gomod._transfer_file),
+        }
+        for name, patch in strategies.items():
+            dst_dir = Path(tmpdir, f"dst-{name}")
+            shutil.copytree(existing_dir, dst_dir)
+            with patch:
+                start = time.monotonic()
+                gomod._merge_bundle_dirs(str(src_dir), str(dst_dir))
+                elapsed = time.monotonic() - start
+            print(f"{name:>6}: {elapsed:8.2f}s")
+            shutil.rmtree(dst_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compare the size and the load time of the formats of the request packages file.
+
+The synthetic request is a monorepo whose packages share most of their dependencies, as the
+packages of a Go or npm workspace do.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from cachito.common.packages_data import PackagesData
+
+
+def _create_packages_data(packages: int, dependencies: int, per_package: int) -> PackagesData:
+    rng = random.Random(42)
+    all_dependencies = [
+        {
+            "name": f"github.com/org-{i % 100}/dep-{i}",
+            "type": rng.choice(["gomod", "go-package"]),
+            "version": f"v1.{rng.randrange(20)}.0",
+        }
+        for i in range(dependencies)
+    ]
+    packages_data = PackagesData()
+    for i in range(packages):
+        deps = [dict(dep) for dep in rng.sample(all_dependencies, per_package)]
+        pkg_info = {"name": f"github.com/org/repo/pkg-{i}", "type": "gomod", "version": "v1.0.0"}
+        packages_data.add_package(pkg_info, f"pkg-{i}", deps)
+    return packages_data
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packages", type=int, default=20, help="number of packages")
+    parser.add_argument("--dependencies", type=int, default=50000, help="number of dependencies")
+    parser.add_argument("--per-package", type=int, default=5000, help="dependencies per package")
+    parser.add_argument("--tmpdir", default=None, help="where to write the packages files")
+    args = parser.parse_args()
+
+    packages_data = _create_packages_data(args.packages, args.dependencies, args.per_package)
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+        for name, with_dependencies, indexed in (
+            ("without deps", False, False),
+            ("with deps", True, False),
+            ("indexed", True, True),
+        ):
+            path = os.path.join(tmpdir, f"packages-{name.replace(' ', '-')}.json")
+            start = time.monotonic()
+            packages_data.write_to_file(path, with_dependencies=with_dependencies, indexed=indexed)
+            write_elapsed = time.monotonic() - start
+
+            loaded = PackagesData()
+            start = time.monotonic()
+            loaded.load(path)
+            dependencies = loaded.all_dependencies
+            load_elapsed = time.monotonic() - start
+
+            print(
+                f"{name:>12}: {os.path.getsize(path) / 1024 / 1024:6.2f} MiB, "
+                f"write {write_elapsed:6.3f}s, load {load_elapsed:6.3f}s, "
+                f"{len(dependencies)} dependencies"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -33,10 +33,6 @@ $(
     go list -deps -json=ImportPath,Module,Standard,Deps all > \
         "$mocked_data_dir_abspath/non-vendored/go_list_deps_all.json"
 
-    echo "generating $mocked_data_dir/non-vendored/go_list_deps_threedot.json"
-    go list -deps -json=ImportPath,Module,Standard,Deps ./... > \
-        "$mocked_data_dir_abspath/non-vendored/go_list_deps_threedot.json"
-
     echo "generating $mocked_data_dir/vendored/modules.txt"
     go mod vendor
     cp vendor/modules.txt "$mocked_data_dir_abspath/vendored/modules.txt"
@@ -44,10 +40,6 @@ $(
     echo "generating $mocked_data_dir/vendored/go_list_deps_all.json"
     go list -deps -json=ImportPath,Module,Standard,Deps all > \
         "$mocked_data_dir_abspath/vendored/go_list_deps_all.json"
-
-    echo "generating $mocked_data_dir/vendored/go_list_deps_threedot.json"
-    go list -deps -json=ImportPath,Module,Standard,Deps ./... > \
-        "$mocked_data_dir_abspath/vendored/go_list_deps_threedot.json"
 )
 --------------------------------------------------------------------------------
 banner-end
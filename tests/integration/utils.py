@@ -105,12 +105,17 @@ class Client:
         Fetch a list of requests from the Cachito API.
 
         :param dict query_params: Request parameters and values (page, per_page, status, verbose)
-        :param bool all_pages: Flag to get all pages from the Cachito API
+        :param bool all_pages: Flag to get all pages from the Cachito API, with cursor pagination
+            unless a page is specified
         :return: Object that contains response from the Cachito API
         :rtype: list
         """
         if not query_params:
             query_params = {}
+        use_cursor = all_pages and "page" not in query_params
+        if use_cursor:
+            # The next URLs contain all the query parameters
+            query_params = {"after_id": 0, **query_params}
         request_url = f"{self._cachito_api_url}/requests"
         all_items = []
         while request_url:
@@ -120,6 +125,8 @@ class Client:
             if not all_pages:
                 break
             request_url = resp.json()["meta"]["next"]
+            if use_cursor:
+                query_params = None
 
         return Response({"items": all_items}, None, resp.status_code)
 
@@ -1,7 +1,10 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import copy
+import hashlib
+import io
 import json
 import os
+import tarfile
 import urllib.parse
 from datetime import datetime, timedelta
 from http import HTTPStatus
@@ -13,10 +16,15 @@ import flask
 import flask_sqlalchemy
 import kombu.exceptions
 import pytest
+import sqlalchemy
+from celery import Signature, chain, group
+from werkzeug.exceptions import InternalServerError
 
+from cachito.common.bundle_stream import BundleArchiveStream
 from cachito.common.checksum import hash_file
 from cachito.common.packages_data import PackagesData
 from cachito.common.paths import RequestBundleDir
+from cachito.common.utils import b64encode
 from cachito.errors import NoWorkers, RequestErrorOrigin, ValidationError
 from cachito.web.content_manifest import BASE_ICM, BASE_SBOM, Package
 from cachito.web.models import (
@@ -292,6 +300,54 @@ def test_create_request_with_gomod_package_configs(
     mock_chain.assert_called_once_with(expected)
 
 
+@mock.patch("cachito.web.api_v1.chain", wraps=chain)
+def test_create_request_with_parallel_package_managers(
+    mock_chain,
+    app,
+    auth_env,
+    client,
+    db,
+):
+    app.config["CACHITO_PARALLEL_PACKAGE_MANAGERS"] = True
+    package_value = {"npm": [{"path": "client"}], "yarn": [{"path": "web"}]}
+    data = {
+        "repo": "https://github.com/release-engineering/web-terminal.git",
+        "ref": "c50b93a32df1c9d700e3e80996845bc2e13be848",
+        "packages": package_value,
+        "pkg_managers": ["gomod", "npm", "pip", "yarn"],
+    }
+
+    with mock.patch.object(Signature, "delay"):
+        rv = client.post("/api/v1/requests", json=data, environ_base=auth_env)
+    assert rv.status_code == 201
+
+    error_callback = failed_request_callback.s(1)
+    expected = [
+        fetch_app_source.s(
+            "https://github.com/release-engineering/web-terminal.git",
+            "c50b93a32df1c9d700e3e80996845bc2e13be848",
+            1,
+            False,
+            False,
+        ).on_error(error_callback),
+        group(
+            [
+                fetch_gomod_source.si(1, [], []).on_error(error_callback),
+                chain(
+                    [
+                        fetch_npm_source.si(1, package_value["npm"]).on_error(error_callback),
+                        fetch_yarn_source.si(1, package_value["yarn"]).on_error(error_callback),
+                    ]
+                ),
+                fetch_pip_source.si(1, []).on_error(error_callback),
+            ]
+        ),
+        process_fetched_sources.si(1).on_error(error_callback),
+        finalize_request.s(1).on_error(error_callback),
+    ]
+    mock_chain.assert_any_call(expected)
+
+
 @mock.patch("cachito.web.api_v1.chain")
 def test_create_request_with_npm_package_configs(
     mock_chain,
@@ -801,6 +857,157 @@ def test_fetch_paginated_requests(
     assert fetched_requests[0]["packages"] == packages_data["packages"]
 
 
+def test_fetch_requests_with_cursor(app, auth_env, client, db):
+    repo_template = "https://github.com/release-engineering/retrodep{}.git"
+    # flask_login.current_user is used in Request.from_json, which requires a request context
+    with app.test_request_context(environ_base=auth_env):
+        for i in range(12):
+            data = {
+                "repo": repo_template.format(i),
+                "ref": "c50b93a32df1c9d700e3e80996845bc2e13be848",
+                "pkg_managers": ["gomod"],
+            }
+            request = Request.from_json(data)
+            if i % 4 == 0:
+                request.add_state("failed", "Failed")
+            else:
+                request.add_state("complete", "Completed")
+            db.session.add(request)
+    db.session.commit()
+
+    # The requests are returned in ascending order of id, following the next URLs
+    fetched_ids = []
+    url = "/api/v1/requests?after_id=0&per_page=4&state=complete"
+    while url:
+        rv = client.get(url)
+        assert rv.status_code == 200
+        response = rv.json
+        assert response["meta"]["per_page"] == 4
+        assert all(request["state"] == "complete" for request in response["items"])
+        fetched_ids.extend(request["id"] for request in response["items"])
+        url = response["meta"]["next"]
+        if url:
+            assert "state=complete" in url
+            assert f"after_id={fetched_ids[-1]}" in url
+    assert fetched_ids == [2, 3, 4, 6, 7, 8, 10, 11, 12]
+
+    # The last page has no next URL, even if it's full
+    rv = client.get("/api/v1/requests?after_id=8&per_page=4")
+    assert [request["id"] for request in rv.json["items"]] == [9, 10, 11, 12]
+    assert rv.json["meta"]["next"] is None
+
+    # Negative cursors are rejected
+    rv = client.get("/api/v1/requests?after_id=-1")
+    assert rv.status_code == 400
+
+
+def test_fetch_requests_query_count(app, auth_env, client, db):
+    flag = Flag.from_json("valid_flag")
+    env_var = EnvironmentVariable(name="GOFLAGS", value="-mod=vendor", kind="literal")
+    db.session.add_all([flag, env_var])
+    # flask_login.current_user is used in Request.from_json, which requires a request context
+    with app.test_request_context(environ_base=auth_env):
+        for i in range(20):
+            data = {
+                "repo": f"https://github.com/release-engineering/retrodep{i}.git",
+                "ref": "c50b93a32df1c9d700e3e80996845bc2e13be848",
+                "pkg_managers": ["gomod"],
+                "flags": ["valid_flag"],
+            }
+            request = Request.from_json(data)
+            request.environment_variables.append(env_var)
+            request.add_state("complete", "Completed")
+            db.session.add(request)
+    db.session.commit()
+
+    statements = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(db.engine, "before_cursor_execute", count_statements)
+    try:
+        # Without state_history, the verbose JSON only needs the latest state of the requests
+        for query_params in (
+            "verbose=False",
+            "verbose=True",
+            "verbose=True&fields=id,state",
+            "verbose=True&fields=id,packages",
+        ):
+            query_counts = []
+            for per_page in (2, 20):
+                statements.clear()
+                # Make sure the relationships are not already loaded in the session
+                db.session.expire_all()
+                rv = client.get(f"/api/v1/requests?per_page={per_page}&{query_params}")
+                assert rv.status_code == 200
+                assert len(rv.json["items"]) == per_page
+                query_counts.append(len(statements))
+                if "fields" in query_params:
+                    # The state history of the requests is not loaded
+                    assert not [
+                        statement
+                        for statement in statements
+                        if "request_state.request_id IN" in statement
+                    ]
+            # The number of queries doesn't depend on the number of requests
+            assert query_counts[0] == query_counts[1]
+
+        # The detail endpoint doesn't load the state history unless it is selected
+        for query_params, loads_state_history in (
+            ("", True),
+            ("?fields=id,state", False),
+            ("?fields=id,packages", False),
+        ):
+            statements.clear()
+            db.session.expire_all()
+            rv = client.get(f"/api/v1/requests/1{query_params}")
+            assert rv.status_code == 200
+            state_history_statements = [
+                statement for statement in statements if "request_state.request_id IN" in statement
+            ]
+            assert bool(state_history_statements) == loads_state_history
+    finally:
+        sqlalchemy.event.remove(db.engine, "before_cursor_execute", count_statements)
+
+
+@mock.patch("cachito.web.models.Request._get_packages_data")
+def test_fetch_requests_with_fields(mock_get_packages_data, app, auth_env, client, db):
+    mock_get_packages_data.return_value = PackagesData()
+    # flask_login.current_user is used in Request.from_json, which requires a request context
+    with app.test_request_context(environ_base=auth_env):
+        for i in range(3):
+            data = {
+                "repo": f"https://github.com/release-engineering/retrodep{i}.git",
+                "ref": "c50b93a32df1c9d700e3e80996845bc2e13be848",
+                "pkg_managers": ["gomod"],
+            }
+            request = Request.from_json(data)
+            request.add_state("complete", "Completed")
+            db.session.add(request)
+    db.session.commit()
+
+    rv = client.get("/api/v1/requests/1?fields=state,state_reason")
+    assert rv.status_code == 200
+    assert rv.json == {"state": "complete", "state_reason": "Completed"}
+
+    rv = client.get("/api/v1/requests?verbose=true&per_page=2&fields=id,%20state_history")
+    assert rv.status_code == 200
+    assert [sorted(request) for request in rv.json["items"]] == [["id", "state_history"]] * 2
+    assert "fields=id" in rv.json["meta"]["next"]
+    # The packages data is only loaded when the packages or the dependencies are requested
+    mock_get_packages_data.assert_not_called()
+
+    rv = client.get("/api/v1/requests/1?fields=dependencies")
+    assert rv.status_code == 200
+    assert rv.json == {"dependencies": []}
+    mock_get_packages_data.assert_called_once()
+
+    rv = client.get("/api/v1/requests?fields=state,foo")
+    assert rv.status_code == 400
+    assert rv.json["error"].startswith("The following fields are not valid: foo.")
+
+
 def test_create_request_filter_state(app, auth_env, client, db):
     """Test that requests can be filtered by state."""
     repo_template = "https://github.com/release-engineering/retrodep{}.git"
@@ -1485,6 +1692,107 @@ def test_download_archive(app, client, db, tmpdir):
     filename = bundle_dir.bundle_archive_file.name
     assert f"attachment; filename=cachito-{filename}" == resp.headers["Content-Disposition"]
     assert "sha-256=A6xnQhbz4Vx2HuGl4lXwZ5U2I8iziLRFnhP5eNfIRvQ=" == resp.headers["Digest"]
+    assert resp.headers["ETag"] == f'"{hasher.hexdigest()}"'
+    assert resp.headers["Accept-Ranges"] == "bytes"
+
+
+@mock.patch("cachito.web.api_v1.verify_bundle_archive")
+def test_download_archive_conditional(mock_verify, app, client, db, tmpdir):
+    request = Request(repo="https://git.host/ns/tool.git", ref="1234")
+    request.add_state(RequestStateMapping.complete.name, "For testing download.")
+    db.session.add(request)
+    db.session.commit()
+
+    app.config["CACHITO_BUNDLES_DIR"] = str(tmpdir)
+
+    bundle_dir = RequestBundleDir(request.id, str(tmpdir))
+    bundle_dir.bundle_archive_file.write_bytes(b"0123456789")
+    checksum = hash_file(bundle_dir.bundle_archive_file).hexdigest()
+    bundle_dir.bundle_archive_checksum.write_text(checksum, encoding="utf-8")
+    mock_verify.return_value = True
+
+    resp = client.get(
+        f"/api/v1/requests/{request.id}/download", headers={"If-None-Match": f'"{checksum}"'}
+    )
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == f'"{checksum}"'
+    # The client already has the bundle archive, so it is not verified
+    mock_verify.assert_not_called()
+
+    # Resume an interrupted download
+    resp = client.get(
+        f"/api/v1/requests/{request.id}/download",
+        headers={"Range": "bytes=6-", "If-Range": f'"{checksum}"'},
+    )
+    assert resp.status_code == 206
+    assert resp.data == b"6789"
+    assert resp.headers["Content-Range"] == "bytes 6-9/10"
+
+    # The bundle archive changed since the interrupted download
+    resp = client.get(
+        f"/api/v1/requests/{request.id}/download",
+        headers={"Range": "bytes=6-", "If-Range": '"1234"'},
+    )
+    assert resp.status_code == 200
+    assert resp.data == b"0123456789"
+
+
+@pytest.mark.parametrize("checksum_matches", (True, False))
+def test_download_archive_streaming(checksum_matches, app, client, db, tmpdir):
+    request = Request(repo="https://git.host/ns/tool.git", ref="1234")
+    request.add_state(RequestStateMapping.complete.name, "For testing download.")
+    db.session.add(request)
+    db.session.commit()
+
+    app.config["CACHITO_BUNDLES_DIR"] = str(tmpdir)
+
+    bundle_dir = RequestBundleDir(request.id, str(tmpdir))
+    bundle_dir.source_dir.mkdir(parents=True)
+    bundle_dir.source_dir.joinpath("main.go").write_text("package main")
+    bundle_dir.deps_dir.mkdir()
+    # The worker computed the checksum of the archive and marked it as streamed
+    stream = BundleArchiveStream(bundle_dir)
+    data = b"".join(stream)
+    checksum = stream.hexdigest if checksum_matches else hashlib.sha256(b"other").hexdigest()
+    bundle_dir.bundle_archive_checksum.write_text(checksum, encoding="utf-8")
+    bundle_dir.bundle_archive_streamed.touch()
+
+    if not checksum_matches:
+        # The response is aborted before the end of the archive
+        with pytest.raises(InternalServerError, match="has changed"):
+            client.get(f"/api/v1/requests/{request.id}/download")
+        return
+
+    resp = client.get(f"/api/v1/requests/{request.id}/download")
+    assert resp.status_code == 200
+    assert resp.headers["Digest"] == f"sha-256={b64encode(bytes.fromhex(checksum))}"
+    assert resp.headers["Content-Disposition"] == (
+        f"attachment; filename=cachito-{request.id}.tar.gz"
+    )
+    assert resp.data == data
+    with tarfile.open(fileobj=io.BytesIO(resp.data), mode="r:gz") as archive:
+        assert archive.getnames() == ["app/main.go", "deps"]
+
+    resp = client.get(
+        f"/api/v1/requests/{request.id}/download", headers={"If-None-Match": f'"{checksum}"'}
+    )
+    assert resp.status_code == 304
+
+
+def test_download_archive_not_streamed(app, client, db, tmpdir):
+    request = Request(repo="https://git.host/ns/tool.git", ref="1234")
+    request.add_state(RequestStateMapping.complete.name, "For testing download.")
+    db.session.add(request)
+    db.session.commit()
+
+    app.config["CACHITO_BUNDLES_DIR"] = str(tmpdir)
+    # The temporary bundle directory is there, but the worker didn't mark the archive as streamed
+    bundle_dir = RequestBundleDir(request.id, str(tmpdir))
+    bundle_dir.source_dir.mkdir(parents=True)
+    bundle_dir.deps_dir.mkdir()
+
+    resp = client.get(f"/api/v1/requests/{request.id}/download")
+    assert resp.status_code == 500
 
 
 @mock.patch("cachito.web.api_v1.Request")
@@ -1572,6 +1880,30 @@ def test_set_state(state, app, client, db, worker_auth_env, tmpdir):
     assert not bundle_dir.exists()
 
 
+@pytest.mark.parametrize("state", ("complete", "failed"))
+def test_set_state_streaming(state, app, client, db, worker_auth_env, tmpdir):
+    data = {
+        "repo": "https://github.com/release-engineering/retrodep.git",
+        "ref": "c50b93a32df1c9d700e3e80996845bc2e13be848",
+        "pkg_managers": ["gomod"],
+    }
+    with app.test_request_context(environ_base=worker_auth_env):
+        request = Request.from_json(data)
+    db.session.add(request)
+    db.session.commit()
+
+    bundle_dir = RequestBundleDir(1, tmpdir)
+    bundle_dir.mkdir(parents=True)
+    bundle_dir.bundle_archive_streamed.touch()
+    payload = {"state": state, "state_reason": "Some status"}
+    with mock.patch("cachito.web.api_v1.RequestBundleDir", return_value=bundle_dir):
+        patch_rv = client.patch("/api/v1/requests/1", json=payload, environ_base=worker_auth_env)
+
+    assert patch_rv.status_code == 200
+    # The bundle archive of a complete request is streamed from its temporary bundle directory
+    assert bundle_dir.exists() == (state == "complete")
+
+
 @pytest.mark.parametrize("bundle_exists", (True, False))
 @pytest.mark.parametrize("pkg_managers", (["gomod"], ["npm"], ["gomod", "npm"]))
 @mock.patch("cachito.web.api_v1.tasks.cleanup_npm_request")
@@ -1602,6 +1934,9 @@ def test_set_state_stale(
     bundle_dir.packages_data.write_bytes(b"{}")
 
     bundle_dir.bundle_archive_checksum.write_text("1234", encoding="utf-8")
+    bundle_dir.bundle_archive_verification.write_text("{}", encoding="utf-8")
+    bundle_dir.content_manifest.write_text("{}", encoding="utf-8")
+    bundle_dir.sbom_components.write_text("{}", encoding="utf-8")
 
     state = "stale"
     state_reason = "The request has expired"
@@ -1621,6 +1956,9 @@ def test_set_state_stale(
 
     assert not bundle_dir.bundle_archive_file.exists()
     assert not bundle_dir.bundle_archive_checksum.exists()
+    assert not bundle_dir.bundle_archive_verification.exists()
+    assert not bundle_dir.content_manifest.exists()
+    assert not bundle_dir.sbom_components.exists()
     assert not bundle_dir.packages_data.exists()
 
     if "npm" in pkg_managers:
@@ -2034,6 +2372,18 @@ def test_fetch_request_content_manifest_empty(app, client, db, worker_auth_env):
 
     assert rv.json == expected
 
+    # The ETag is derived from the content manifest
+    etag = hashlib.sha256(rv.data).hexdigest()
+    assert rv.headers["ETag"] == f'"{etag}"'
+    content = rv.data
+    rv = client.get("/api/v1/requests/1/content-manifest", headers={"If-None-Match": f'"{etag}"'})
+    assert rv.status_code == 304
+    assert rv.data == b""
+    # Ranges of the content manifest can be requested
+    rv = client.get("/api/v1/requests/1/content-manifest", headers={"Range": "bytes=0-9"})
+    assert rv.status_code == 206
+    assert rv.data == content[:10]
+
 
 def test_request_fetch_request_content_manifest_invalid(client, worker_auth_env):
     rv = client.get("/api/v1/requests/2/content-manifest")
@@ -2625,6 +2975,15 @@ def test_get_content_manifests_by_requests(app, client, db, auth_env, tmpdir):
             deep_sort_icm(assembled_icm)
             assert assembled_icm == json.loads(resp.data)
 
+    # The ETag changes with the requests the content manifest is generated from
+    one_request, two_requests = test_data[2][0], test_data[3][0]
+    resp = client.get(f"/api/v1/content-manifest?{one_request}")
+    etag = resp.headers["ETag"]
+    resp = client.get(f"/api/v1/content-manifest?{one_request}", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    resp = client.get(f"/api/v1/content-manifest?{two_requests}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+
 
 def test_get_content_manifests_sbom_by_requests(
     app: flask.Flask,
@@ -3005,6 +3364,11 @@ def test_fetch_packages_file(app, db, client, auth_env, tmpdir):
     assert response_data["packages"] == packages
     assert response_data["dependencies"] == expected_deps
 
+    etag = rv.headers["ETag"]
+    rv = client.get(f"/api/v1/requests/{request.id}/packages", headers={"If-None-Match": etag})
+    assert rv.status_code == 304
+    assert rv.data == b""
+
 
 @pytest.mark.parametrize(
     "state,expected_status",
@@ -3023,6 +3387,66 @@ def test_fetch_missing_packages_file(app, db, client, auth_env, state, expected_
     assert rv.status_code == expected_status
 
 
+@pytest.mark.parametrize("expected", [None, "checksum"])
+@mock.patch("cachito.web.api_v1.os.listdir")
+def test_fetch_packages_checksum(mock_listdir, expected, app, db, client, auth_env, tmpdir):
+    request = create_request_in_db(app, db, auth_env)
+    db.session.commit()
+
+    cachito_bundles_dir = str(tmpdir)
+    bundle_dir = RequestBundleDir(request.id, root=cachito_bundles_dir)
+    app.config["CACHITO_BUNDLES_DIR"] = cachito_bundles_dir
+    _write_test_packages_data(resolved_packages, bundle_dir.packages_data)
+    checksum = hash_file(bundle_dir.packages_data).hexdigest()
+
+    url = f"/api/v1/requests/{request.id}/packages/checksum"
+    if expected is not None:
+        url += f"?expected={checksum}"
+    rv = client.get(url)
+
+    assert rv.status_code == 200
+    assert rv.json == {"checksum": checksum}
+    mock_listdir.assert_not_called()
+
+
+@mock.patch("cachito.web.api_v1.os.listdir")
+def test_fetch_packages_checksum_mismatch(mock_listdir, app, db, client, auth_env, tmpdir):
+    request = create_request_in_db(app, db, auth_env)
+    db.session.commit()
+
+    cachito_bundles_dir = str(tmpdir)
+    bundle_dir = RequestBundleDir(request.id, root=cachito_bundles_dir)
+    app.config["CACHITO_BUNDLES_DIR"] = cachito_bundles_dir
+    _write_test_packages_data(resolved_packages, bundle_dir.packages_data)
+    checksum = hash_file(bundle_dir.packages_data).hexdigest()
+
+    rv = client.get(f"/api/v1/requests/{request.id}/packages/checksum?expected=other")
+
+    assert rv.status_code == 200
+    assert rv.json == {"checksum": checksum}
+    mock_listdir.assert_called_once_with(bundle_dir.packages_data.parent)
+
+
+@pytest.mark.parametrize(
+    "state,expected_status",
+    [
+        [RequestStateMapping.complete, 500],
+        [RequestStateMapping.in_progress, 404],
+    ],
+)
+@mock.patch("cachito.web.api_v1.os.listdir")
+def test_fetch_missing_packages_checksum(
+    mock_listdir, app, db, client, auth_env, state, expected_status, tmpdir
+):
+    request = create_request_in_db(app, db, auth_env, state)
+    app.config["CACHITO_BUNDLES_DIR"] = str(tmpdir)
+
+    rv = client.get(f"/api/v1/requests/{request.id}/packages/checksum")
+
+    assert rv.status_code == expected_status
+    mock_listdir.assert_called_once()
+
+
 @pytest.mark.parametrize(
     "finished_list,finished_filter,expected_num,response_status",
     [
@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import io
+import os
+import tarfile
+
+import pytest
+
+from cachito.common.bundle_stream import BundleArchiveStream
+from cachito.common.paths import RequestBundleDir
+
+
+@pytest.fixture()
+def bundle_dir(tmp_path):
+    bundle_dir = RequestBundleDir(1, str(tmp_path))
+    bundle_dir.source_dir.joinpath(".git").mkdir(parents=True)
+    bundle_dir.source_dir.joinpath(".git", "HEAD").write_text("ref: refs/heads/main")
+    bundle_dir.source_dir.joinpath("main.go").write_text("package main")
+    bundle_dir.pip_deps_dir.mkdir(parents=True)
+    bundle_dir.pip_deps_dir.joinpath("foo-1.0.tar.gz").write_bytes(os.urandom(1024 * 1024))
+    # Files deduplicated by the blob store are hardlinks to each other
+    os.link(
+        bundle_dir.pip_deps_dir.joinpath("foo-1.0.tar.gz"),
+        bundle_dir.pip_deps_dir.joinpath("foo-copy-1.0.tar.gz"),
+    )
+    return bundle_dir
+
+
+@pytest.mark.parametrize("include_git_dir", (True, False))
+def test_bundle_archive_stream(bundle_dir, include_git_dir):
+    stream = BundleArchiveStream(bundle_dir, include_git_dir=include_git_dir)
+    data = b"".join(stream)
+
+    expected_names = [
+        "app/main.go",
+        "deps",
+        "deps/pip",
+        "deps/pip/foo-1.0.tar.gz",
+        "deps/pip/foo-copy-1.0.tar.gz",
+    ]
+    if include_git_dir:
+        expected_names[:0] = ["app/.git", "app/.git/HEAD"]
+
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        assert archive.getnames() == expected_names
+        assert archive.extractfile("app/main.go").read() == b"package main"
+        content = bundle_dir.pip_deps_dir.joinpath("foo-1.0.tar.gz").read_bytes()
+        assert archive.extractfile("deps/pip/foo-copy-1.0.tar.gz").read() == content
+        assert archive.getmember("deps/pip/foo-copy-1.0.tar.gz").islnk()
+        assert {member.mtime for member in archive.getmembers()} == {0}
+
+    # The output is deterministic so that its checksum can be computed beforehand, even if the
+    # files are touched in the meantime
+    assert len(stream.hexdigest) == 64
+    os.utime(bundle_dir.source_dir.joinpath("main.go"), (0, 0))
+    other_stream = BundleArchiveStream(bundle_dir, include_git_dir=include_git_dir)
+    assert b"".join(other_stream) == data
+    assert other_stream.hexdigest == stream.hexdigest
+
+
+def test_bundle_archive_stream_truncated_file(bundle_dir):
+    stream = iter(BundleArchiveStream(bundle_dir))
+    path = bundle_dir.pip_deps_dir.joinpath("foo-1.0.tar.gz")
+    # The first chunk is yielded while reading the first dependency
+    next(stream)
+    path.write_bytes(b"truncated")
+
+    with pytest.raises(OSError, match="was truncated"):
+        list(stream)
@@ -0,0 +1,65 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import json
+import os
+from unittest import mock
+
+import pytest
+
+from cachito.common.checksum import hash_file
+from cachito.common.paths import RequestBundleDir
+from cachito.web.bundle_verification import verify_bundle_archive
+
+
+@pytest.fixture()
+def bundle_dir(tmp_path):
+    bundle_dir = RequestBundleDir(1, str(tmp_path))
+    bundle_dir.bundle_archive_file.write_bytes(b"1234")
+    checksum = hash_file(bundle_dir.bundle_archive_file).hexdigest()
+    bundle_dir.bundle_archive_checksum.write_text(checksum, encoding="utf-8")
+    return bundle_dir
+
+
+@mock.patch("cachito.web.bundle_verification.hash_file", wraps=hash_file)
+def test_verify_bundle_archive_cached(mock_hash_file, bundle_dir):
+    assert verify_bundle_archive(bundle_dir, 3600)
+    assert verify_bundle_archive(bundle_dir, 3600)
+
+    mock_hash_file.assert_called_once_with(bundle_dir.bundle_archive_file)
+    verification = json.loads(bundle_dir.bundle_archive_verification.read_text())
+    assert verification["st_size"] == 4
+
+
+@mock.patch("cachito.web.bundle_verification.hash_file", wraps=hash_file)
+def test_verify_bundle_archive_always(mock_hash_file, bundle_dir):
+    assert verify_bundle_archive(bundle_dir, 0)
+    assert verify_bundle_archive(bundle_dir, 0)
+
+    assert mock_hash_file.call_count == 2
+
+
+@mock.patch("cachito.web.bundle_verification.time.time")
+def test_verify_bundle_archive_expired(mock_time, bundle_dir):
+    mock_time.return_value = 1000
+    assert verify_bundle_archive(bundle_dir, 3600)
+    # Corrupt the archive without changing its size or mtime
+    stat = bundle_dir.bundle_archive_file.stat()
+    with open(bundle_dir.bundle_archive_file, "r+b") as f:
+        f.write(b"4")
+    os.utime(bundle_dir.bundle_archive_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    # The ctime cannot be set, so pretend the archive was corrupted before it was verified
+    verification = json.loads(bundle_dir.bundle_archive_verification.read_text())
+    verification["st_ctime_ns"] = bundle_dir.bundle_archive_file.stat().st_ctime_ns
+    bundle_dir.bundle_archive_verification.write_text(json.dumps(verification))
+
+    assert verify_bundle_archive(bundle_dir, 3600)
+
+    mock_time.return_value = 1000 + 3600
+    assert not verify_bundle_archive(bundle_dir, 3600)
+    assert not bundle_dir.bundle_archive_verification.exists()
+
+
+def test_verify_bundle_archive_modified(bundle_dir):
+    assert verify_bundle_archive(bundle_dir, 3600)
+    bundle_dir.bundle_archive_file.write_bytes(b"12345")
+
+    assert not verify_bundle_archive(bundle_dir, 3600)
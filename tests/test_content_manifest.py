@@ -6,7 +6,13 @@ from unittest import mock
 import pytest
 
 from cachito.errors import ContentManifestError
-from cachito.web.content_manifest import JSON_SCHEMA_URL, ContentManifest, Package
+from cachito.web.content_manifest import (
+    JSON_SCHEMA_URL,
+    ContentManifest,
+    Package,
+    iter_cached_content,
+    store_cached_content,
+)
 from cachito.web.models import Request
 from cachito.web.purl import PARENT_PURL_PLACEHOLDER, to_purl, to_top_level_purl, to_vcs_purl
 
@@ -1922,3 +1928,26 @@ def test_get_local_go_package_dep_purl_no_dep_module(default_request: Request):
     msg = f"Could not find parent Go module for package: {dependency.name}"
     with pytest.raises(RuntimeError, match=msg):
         cm._get_local_go_package_dep_purl(package, dependency)
+
+
+def test_cached_content(tmp_path):
+    packages_data = tmp_path / "1-packages.json"
+    cache = tmp_path / "1-content-manifest.json"
+    items = [{"purl": "pkg:npm/bar@1"}, {"purl": "pkg:npm/foo@1"}]
+
+    # Nothing is cached without a packages file
+    store_cached_content(cache, packages_data, items)
+    assert not cache.exists()
+    assert iter_cached_content(cache, packages_data) is None
+
+    packages_data.write_text('{"packages": []}')
+    store_cached_content(cache, packages_data, items)
+    assert list(iter_cached_content(cache, packages_data)) == items
+    # One item per line after the header
+    assert len(cache.read_text().splitlines()) == 3
+
+    # The cache is outdated once the packages file is replaced
+    new_packages_data = tmp_path / "new-packages.json"
+    new_packages_data.write_text('{"packages": [], "extra": 1}')
+    new_packages_data.replace(packages_data)
+    assert iter_cached_content(cache, packages_data) is None
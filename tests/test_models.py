@@ -5,6 +5,7 @@ from unittest import mock
 
 import pytest
 
+from cachito.common.paths import RequestBundleDir
 from cachito.web.models import PackageManager, Request, RequestStateMapping
 
 
@@ -54,6 +55,39 @@ class TestRequest:
 
         assert load_mock.call_count == call_count
 
+    @mock.patch("cachito.web.content_manifest.ContentManifest.sbom_components_list")
+    @mock.patch("cachito.web.content_manifest.ContentManifest.to_json")
+    def test_content_manifest_is_cached(self, mock_to_json, mock_sbom, app, auth_env, tmp_path):
+        app.config["CACHITO_BUNDLES_DIR"] = str(tmp_path)
+        request = self._create_request_object()
+        request.id = 1
+        request.add_state(RequestStateMapping.complete.name, "Complete")
+        bundle_dir = RequestBundleDir(1, str(tmp_path))
+        bundle_dir.packages_data.write_text('{"packages": []}')
+        mock_to_json.return_value = {"image_contents": []}
+        mock_sbom.return_value = [
+            {"name": "foo", "purl": "pkg:pypi/foo@2"},
+            {"name": "foo", "purl": "pkg:pypi/foo@1"},
+        ]
+
+        with app.test_request_context(environ_base=auth_env):
+            for _ in range(2):
+                assert request.content_manifest_json()["image_contents"] == []
+                # The components are sorted by purl
+                assert list(request.iter_sbom_components()) == [
+                    {"name": "foo", "purl": "pkg:pypi/foo@1"},
+                    {"name": "foo", "purl": "pkg:pypi/foo@2"},
+                ]
+            assert mock_to_json.call_count == 1
+            assert mock_sbom.call_count == 1
+            assert bundle_dir.content_manifest.exists()
+            assert bundle_dir.sbom_components.exists()
+
+            # A new generator version invalidates the cache
+            with mock.patch("cachito.web.content_manifest.GENERATOR_VERSION", 2):
+                request.content_manifest_json()
+            assert mock_to_json.call_count == 2
+
     def test_utcnow(self, app, auth_env):
         request = self._create_request_object()
         request.add_state(RequestStateMapping.complete.name, "Complete")
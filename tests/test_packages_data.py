@@ -1,9 +1,12 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import json
 import os
+import random
+from unittest import mock
 
 import pytest
 
+from cachito.common import packages_data
 from cachito.common.packages_data import PackagesData, unique_packages
 from cachito.errors import InvalidRequestData
 
@@ -339,3 +342,133 @@ def test_all_dependencies(packages_data, expected_dependencies, tmpdir):
     pd = PackagesData()
     pd.load(filename)
     assert expected_dependencies == pd.all_dependencies
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_load_written_file(indexed, tmpdir):
+    pd = PackagesData()
+    pd.add_package(
+        {"name": "p2", "type": "npm", "version": "2"},
+        "p2",
+        [
+            {"name": "underscore", "type": "npm", "version": "1.13.0"},
+            {"name": "async", "type": "npm", "version": "1.2.0"},
+        ],
+    )
+    pd.add_package(
+        {"name": "p1", "type": "npm", "version": "1"},
+        os.curdir,
+        [{"name": "async", "type": "npm", "version": "1.2.0"}],
+    )
+    filename = os.path.join(tmpdir, "data.json")
+    pd.write_to_file(filename, with_dependencies=True, indexed=indexed)
+    with open(filename, "r") as f:
+        data = json.load(f)
+    assert data["dependencies"] == pd.all_dependencies
+    if indexed:
+        assert data["version"] == 3
+        # The packages refer to the dependencies by index
+        assert [p["dependencies"] for p in data["packages"]] == [[0], [0, 1]]
+    else:
+        # The packages can still be read by the releases which ignore the dependencies table
+        assert data["version"] == 2
+        assert data["packages"] == pd.packages
+
+    loaded = PackagesData()
+    with mock.patch.object(loaded, "add_package") as mock_add_package:
+        loaded.load(filename)
+
+    mock_add_package.assert_not_called()
+    assert loaded.packages == pd.packages
+    assert loaded.all_dependencies == [
+        {"name": "async", "type": "npm", "version": "1.2.0"},
+        {"name": "underscore", "type": "npm", "version": "1.13.0"},
+    ]
+    with pytest.raises(InvalidRequestData, match="Duplicate package"):
+        loaded.add_package({"name": "p1", "type": "npm", "version": "1"}, os.curdir, [])
+
+
+def test_load_written_file_with_distinct_duplicates(tmpdir):
+    replaced = {"name": "foo", "type": "gomod", "version": "v1.0.0", "replaces": None}
+    replacing = {
+        "name": "foo",
+        "type": "gomod",
+        "version": "v1.0.0",
+        "replaces": {"name": "foo", "type": "gomod", "version": "v0.9.0"},
+    }
+    pd = PackagesData()
+    pd.add_package({"name": "a", "type": "gomod", "version": "1"}, "a", [replacing])
+    pd.add_package({"name": "b", "type": "gomod", "version": "1"}, "b", [replaced])
+    filename = os.path.join(tmpdir, "data.json")
+    pd.write_to_file(filename, with_dependencies=True, indexed=True)
+    with open(filename, "r") as f:
+        data = json.load(f)
+    # Both dependencies are kept, so that each package gets its own back
+    assert data["dependencies"] == [replacing, replaced]
+
+    loaded = PackagesData()
+    loaded.load(filename)
+
+    assert loaded.packages == pd.packages
+    assert loaded.all_dependencies == pd.all_dependencies == [replacing]
+
+
+def test_load_written_files_into_same_data(tmpdir):
+    for name in ("a", "b"):
+        pd = PackagesData()
+        pd.add_package(
+            {"name": name, "type": "npm", "version": "1"},
+            os.curdir,
+            [{"name": f"dep-{name}", "type": "npm", "version": "1"}],
+        )
+        pd.write_to_file(os.path.join(tmpdir, f"{name}.json"), with_dependencies=True)
+
+    aggregated = PackagesData()
+    aggregated.load(os.path.join(tmpdir, "a.json"))
+    aggregated.load(os.path.join(tmpdir, "b.json"))
+
+    assert [p["name"] for p in aggregated.packages] == ["a", "b"]
+    assert [d["name"] for d in aggregated.all_dependencies] == ["dep-a", "dep-b"]
+    with pytest.raises(InvalidRequestData, match="Duplicate package"):
+        aggregated.load(os.path.join(tmpdir, "b.json"))
+
+
+def test_all_dependencies_large_monorepo():
+    rand = random.Random(0)
+    pd = PackagesData()
+    for i in range(200):
+        deps = [
+            {
+                "name": f"dep{rand.randrange(5000)}",
+                "type": rand.choice(["gomod", "npm", "pip"]),
+                "version": f"{rand.randrange(3)}.0.0",
+                "dev": rand.choice([False, True]),
+            }
+            for _ in range(250)
+        ]
+        pd.add_package({"name": f"pkg{i}", "type": "npm", "version": "1.0.0"}, f"pkg{i}", deps)
+    pd.sort()
+    naive = list(
+        unique_packages(
+            sorted(
+                (dep for pkg in pd.packages for dep in pkg["dependencies"]),
+                key=packages_data._package_sort_key,
+            )
+        )
+    )
+
+    with mock.patch(
+        "cachito.common.packages_data._package_sort_key", wraps=packages_data._package_sort_key
+    ) as mock_sort_key:
+        assert pd.all_dependencies == naive
+        first_access_calls = mock_sort_key.call_count
+
+        mock_sort_key.reset_mock()
+        assert pd.all_dependencies == naive
+        mock_sort_key.assert_not_called()
+
+        new_dep = {"name": "dep-new", "type": "npm", "version": "1.0.0", "dev": False}
+        pd.add_package({"name": "pkg-new", "type": "npm", "version": "1.0.0"}, "new", [new_dep])
+        mock_sort_key.reset_mock()
+        assert new_dep in pd.all_dependencies
+        assert mock_sort_key.call_count < first_access_calls
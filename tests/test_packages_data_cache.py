@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import os
+from unittest import mock
+
+import pytest
+
+from cachito.common.packages_data import PackagesData
+from cachito.web.packages_data_cache import PackagesDataCache
+
+
+def _write_packages_data(path, name):
+    packages_data = PackagesData()
+    packages_data.add_package({"name": name, "type": "pip", "version": "1.0"}, os.curdir, [])
+    packages_data.write_to_file(path)
+
+
+@pytest.fixture()
+def lookups():
+    return mock.Mock()
+
+
+def _lookup_results(lookups):
+    return [call.kwargs["result"] for call in lookups.labels.call_args_list]
+
+
+@mock.patch("cachito.web.packages_data_cache.PackagesData.load", autospec=True)
+def test_load_cached(mock_load, lookups, tmp_path):
+    path = tmp_path / "packages.json"
+    _write_packages_data(path, "foo")
+    cache = PackagesDataCache(1024 * 1024, lookups)
+
+    first = cache.load(1, path)
+    second = cache.load(1, path)
+
+    assert first is second
+    mock_load.assert_called_once_with(first, path)
+    assert _lookup_results(lookups) == ["miss", "hit"]
+
+
+def test_load_replaced_file(lookups, tmp_path):
+    path = tmp_path / "packages.json"
+    _write_packages_data(path, "foo")
+    cache = PackagesDataCache(1024 * 1024, lookups)
+    assert cache.load(1, path).packages[0]["name"] == "foo"
+
+    replacement = tmp_path / "packages.json.new"
+    _write_packages_data(replacement, "foobar")
+    os.replace(replacement, path)
+
+    assert cache.load(1, path).packages[0]["name"] == "foobar"
+    assert _lookup_results(lookups) == ["miss", "miss"]
+
+
+def test_load_evicts_least_recently_used(lookups, tmp_path):
+    paths = []
+    for request_id in (1, 2, 3):
+        path = tmp_path / f"packages-{request_id}.json"
+        _write_packages_data(path, "foo")
+        paths.append(path)
+    # Room for two of the packages files
+    cache = PackagesDataCache(paths[0].stat().st_size * 2, lookups)
+
+    cache.load(1, paths[0])
+    cache.load(2, paths[1])
+    cache.load(1, paths[0])
+    cache.load(3, paths[2])
+    cache.load(1, paths[0])
+    cache.load(2, paths[1])
+
+    assert _lookup_results(lookups) == ["miss", "miss", "hit", "miss", "hit", "miss"]
+
+
+@pytest.mark.parametrize("max_size", [0, 10])
+def test_load_not_cached(max_size, lookups, tmp_path):
+    path = tmp_path / "packages.json"
+    _write_packages_data(path, "foo")
+    cache = PackagesDataCache(max_size, lookups)
+
+    assert cache.load(1, path) is not cache.load(1, path)
+    assert cache.load(1, path).packages[0]["name"] == "foo"
+
+
+def test_load_missing_file(lookups, tmp_path):
+    cache = PackagesDataCache(1024 * 1024, lookups)
+
+    assert cache.load(1, tmp_path / "packages.json").packages == []
+    lookups.labels.assert_not_called()
@@ -1,8 +1,11 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import json
+from unittest import mock
 
 import pytest
 
-from cachito.web.utils import deep_sort_icm
+from cachito.web.content_manifest import BASE_ICM, BASE_SBOM
+from cachito.web.utils import deep_sort_icm, stream_json_document
 
 
 @pytest.mark.parametrize(
@@ -82,3 +85,27 @@ def test_deep_sort_icm(orig_items):
 def test_deep_sort_icm_raises_error_when_unknown_type_included(error_icm):
     with pytest.raises(TypeError, match="Unknown type is included in the content manifest"):
         deep_sort_icm(error_icm)
+
+
+@pytest.mark.parametrize(
+    "document, list_key, items",
+    [
+        (BASE_ICM, "image_contents", []),
+        (BASE_ICM, "image_contents", [{"purl": "pkg:npm/foo@1", "dependencies": []}]),
+        (BASE_SBOM, "components", [{"name": "foo", "purl": f"pkg:pypi/foo@{i}"} for i in range(5)]),
+    ],
+)
+def test_stream_json_document(document, list_key, items):
+    chunks = list(stream_json_document(document, list_key, iter(items)))
+
+    expected = json.dumps({**document, list_key: items}, sort_keys=True)
+    assert b"".join(chunks).decode("utf-8") == expected
+
+
+@mock.patch("cachito.web.utils.JSON_CHUNK_SIZE", 10)
+def test_stream_json_document_chunks():
+    items = [{"name": "x" * 20}] * 3
+    chunks = list(stream_json_document(BASE_SBOM, "components", iter(items)))
+
+    assert len(chunks) > 3
+    assert json.loads(b"".join(chunks))["components"] == items
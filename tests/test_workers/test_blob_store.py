@@ -0,0 +1,128 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
+import os
+from unittest import mock
+
+import pytest
+
+from cachito.workers import blob_store as blob_store_module
+from cachito.workers.blob_store import BlobStore, get_blob_store
+
+CONTENT = b"lodash-4.17.21"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.fixture()
+def blob_store(tmp_path):
+    return BlobStore(tmp_path / "blobs")
+
+
+def test_blob_path(blob_store):
+    assert blob_store.blob_path(DIGEST) == blob_store.root / "sha256" / DIGEST[:2] / DIGEST
+
+
+@pytest.mark.parametrize("digest", ["", "../../etc/passwd", DIGEST.upper(), DIGEST[:-1]])
+def test_blob_path_invalid_digest(blob_store, digest):
+    with pytest.raises(ValueError, match="Invalid sha256 digest"):
+        blob_store.blob_path(digest)
+
+
+def test_add(blob_store, tmp_path):
+    first = tmp_path / "1" / "lodash.tgz"
+    second = tmp_path / "2" / "lodash.tgz"
+    for path in (first, second):
+        path.parent.mkdir()
+        path.write_bytes(CONTENT)
+
+    assert blob_store.add(first) == DIGEST
+    assert blob_store.add(second) == DIGEST
+    # Adding a file already linked to the store is a no-op
+    assert blob_store.add(second) == DIGEST
+
+    blob = blob_store.blob_path(DIGEST)
+    assert blob.read_bytes() == CONTENT
+    assert os.path.samefile(first, blob)
+    assert os.path.samefile(second, blob)
+    assert blob.stat().st_nlink == 3
+
+
+def test_link(blob_store, tmp_path):
+    dest = tmp_path / "lodash.tgz"
+    assert blob_store.link(DIGEST, dest) is False
+    assert not dest.exists()
+
+    source = tmp_path / "source.tgz"
+    source.write_bytes(CONTENT)
+    blob_store.add(source)
+
+    # An existing destination is replaced
+    dest.write_bytes(b"partial download")
+    assert blob_store.link(DIGEST, dest) is True
+    assert dest.read_bytes() == CONTENT
+    assert os.path.samefile(dest, blob_store.blob_path(DIGEST))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["blobs", "lodash.tgz", "source.tgz"]
+
+
+def test_add_tree(blob_store, tmp_path):
+    deps_dir = tmp_path / "deps"
+    (deps_dir / "npm").mkdir(parents=True)
+    (deps_dir / "npm" / "lodash.tgz").write_bytes(CONTENT)
+    (deps_dir / "npm" / "copy.tgz").write_bytes(CONTENT)
+    (deps_dir / "npm" / "link.tgz").symlink_to("lodash.tgz")
+
+    assert blob_store.add_tree(deps_dir) == 2
+    # The files are already linked to the store
+    assert blob_store.add_tree(deps_dir) == 0
+    assert blob_store.blob_path(DIGEST).stat().st_nlink == 3
+    assert (deps_dir / "npm" / "link.tgz").is_symlink()
+
+
+def test_add_tree_linked_files(blob_store, tmp_path):
+    deps_dir = tmp_path / "deps"
+    deps_dir.mkdir()
+    # A file linked from outside of the tree, like the files of the Go module cache
+    cache_file = tmp_path / "cache.zip"
+    cache_file.write_bytes(CONTENT)
+    os.link(cache_file, deps_dir / "module.zip")
+    os.link(cache_file, deps_dir / "other.zip")
+
+    with mock.patch(
+        "cachito.workers.blob_store.hash_file", wraps=blob_store_module.hash_file
+    ) as mock_hash_file:
+        # Storing the file as a blob links both paths to it
+        assert blob_store.add_tree(deps_dir) == 1
+    # The file is only hashed once for both of its links
+    mock_hash_file.assert_called_once()
+    assert os.path.samefile(deps_dir / "module.zip", blob_store.blob_path(DIGEST))
+    assert os.path.samefile(deps_dir / "other.zip", blob_store.blob_path(DIGEST))
+    assert blob_store.add_tree(deps_dir) == 0
+
+
+def test_prune(blob_store, tmp_path):
+    request_file = tmp_path / "lodash.tgz"
+    request_file.write_bytes(CONTENT)
+    blob_store.add(request_file)
+    other_file = tmp_path / "other.tgz"
+    other_file.write_bytes(b"other")
+    other_digest = blob_store.add(other_file)
+
+    # Recently unlinked blobs are kept
+    other_file.unlink()
+    assert blob_store.prune(3600) == []
+
+    assert blob_store.prune(0) == [blob_store.blob_path(other_digest)]
+    assert blob_store.blob_path(DIGEST).exists()
+    assert not blob_store.blob_path(other_digest).exists()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+@mock.patch("cachito.workers.blob_store.get_worker_config")
+def test_get_blob_store(mock_gwc, enabled, tmp_path):
+    mock_gwc.return_value.cachito_blob_store_enabled = enabled
+    mock_gwc.return_value.cachito_bundles_dir = str(tmp_path)
+
+    blob_store = get_blob_store()
+    if enabled:
+        assert blob_store.root == tmp_path / "blobs"
+    else:
+        assert blob_store is None
@@ -0,0 +1,196 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import gzip
+import io
+import json
+import os
+import random
+import tarfile
+import zlib
+from unittest import mock
+
+import pytest
+
+from cachito.workers import bundle_writer
+from cachito.workers.bundle_writer import (
+    GzipMembersFile,
+    IncrementalBundleArchive,
+    ParallelGzipFile,
+    open_bundle_archive,
+)
+
+
+def setup_module():
+    """Re-enable logging that was disabled at some point in previous tests."""
+    bundle_writer.log.disabled = False
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        b"",
+        b"a",
+        b"cheese pizza " * 10000,
+        random.Random(42).randbytes(300 * 1024),
+    ),
+)
+@pytest.mark.parametrize("threads", (1, 4))
+def test_parallel_gzip_file(data, threads, tmp_path):
+    path = tmp_path / "data.gz"
+    with ParallelGzipFile(path, threads=threads, block_size=64 * 1024) as f:
+        # Write in uneven chunks to exercise the block splitting
+        for i in range(0, len(data), 10000):
+            f.write(data[i : i + 10000])
+        assert f.tell() == len(data)
+
+    assert gzip.decompress(path.read_bytes()) == data
+    # The output is a single gzip member
+    decompressor = zlib.decompressobj(wbits=31)
+    assert decompressor.decompress(path.read_bytes()) == data
+    assert decompressor.eof
+    assert decompressor.unused_data == b""
+
+
+def test_parallel_gzip_file_write_after_close(tmp_path):
+    f = ParallelGzipFile(tmp_path / "data.gz", threads=1)
+    f.close()
+    # Closing twice is a no-op
+    f.close()
+    with pytest.raises(ValueError, match="write to closed file"):
+        f.write(b"foo")
+
+
+@pytest.mark.parametrize("writer", ("gzip", "parallel-gzip"))
+@mock.patch("cachito.workers.bundle_writer.get_worker_config")
+def test_open_bundle_archive(mock_gwc, writer, tmp_path):
+    mock_gwc.return_value.cachito_bundle_writer = writer
+    mock_gwc.return_value.cachito_bundle_compression_threads = 2
+    source = tmp_path / "app"
+    source.mkdir()
+    (source / "main.go").write_text("package main")
+    (source / "big.bin").write_bytes(os.urandom(512 * 1024))
+    bundle = tmp_path / "bundle.tar.gz"
+
+    with open_bundle_archive(bundle) as archive:
+        archive.add(str(source), "app")
+
+    with tarfile.open(bundle, mode="r:gz") as archive:
+        assert sorted(archive.getnames()) == ["app", "app/big.bin", "app/main.go"]
+        extracted = archive.extractfile("app/big.bin")
+        assert extracted.read() == (source / "big.bin").read_bytes()
+
+    # The stream is also readable by streaming gzip readers
+    with tarfile.open(fileobj=io.BytesIO(bundle.read_bytes()), mode="r|gz") as archive:
+        assert len(list(archive)) == 3
+
+
+@mock.patch("cachito.workers.bundle_writer.get_worker_config")
+def test_open_bundle_archive_parallel_gzip_failure(mock_gwc, tmp_path):
+    mock_gwc.return_value.cachito_bundle_writer = "parallel-gzip"
+    mock_gwc.return_value.cachito_bundle_compression_threads = 2
+    bundle = tmp_path / "bundle.tar.gz"
+
+    with pytest.raises(OSError, match="disk failure"):
+        with open_bundle_archive(bundle) as archive:
+            data = os.urandom(512 * 1024)
+            tarinfo = tarfile.TarInfo("app/big.bin")
+            tarinfo.size = len(data)
+            archive.addfile(tarinfo, io.BytesIO(data))
+            raise OSError("disk failure")
+
+    # The truncated archive has no gzip trailer, so it can't be read as a complete one
+    with pytest.raises(EOFError):
+        with gzip.open(bundle) as f:
+            f.read()
+
+
+def test_gzip_members_file(tmp_path):
+    source = tmp_path / "source.gz"
+    with GzipMembersFile(source) as f:
+        # Ending a member before writing anything is a no-op
+        assert f.end_member() is None
+        f.write(b"first ")
+        first = f.end_member()
+        f.write(b"second")
+
+    path = tmp_path / "data.gz"
+    with GzipMembersFile(path) as f, open(source, "rb") as src:
+        f.write(b"fresh ")
+        assert f.copy_member(src, *first) > 0
+        assert f.tell() == len(b"fresh first ")
+
+    assert gzip.decompress(path.read_bytes()) == b"fresh first "
+
+
+def _write_incremental_bundle(tmp_path, name, files, previous=None):
+    source = tmp_path / f"{name}-src"
+    source.mkdir()
+    for filename, content in files.items():
+        source.joinpath(filename).write_bytes(content)
+    archive_path = tmp_path / f"{name}.tar.gz"
+    index_path = tmp_path / f"{name}.index.json"
+    previous_paths = (
+        (tmp_path / f"{previous}.tar.gz", tmp_path / f"{previous}.index.json") if previous else ()
+    )
+    with IncrementalBundleArchive(archive_path, index_path, *previous_paths) as archive:
+        archive.add(str(source), "deps")
+    return archive, archive_path, index_path
+
+
+def test_incremental_bundle_archive(tmp_path):
+    unchanged = os.urandom(64 * 1024)
+    files = {"small": b"small file", "unchanged.tgz": unchanged, "changed.tgz": os.urandom(20000)}
+    _write_incremental_bundle(tmp_path, "1", files)
+
+    files["changed.tgz"] = os.urandom(20000)
+    files["added.tgz"] = os.urandom(20000)
+    archive, archive_path, index_path = _write_incremental_bundle(tmp_path, "2", files, "1")
+
+    assert archive.reused_count == 1
+    with tarfile.open(archive_path, mode="r:gz") as tar:
+        assert sorted(tar.getnames()) == [
+            "deps",
+            "deps/added.tgz",
+            "deps/changed.tgz",
+            "deps/small",
+            "deps/unchanged.tgz",
+        ]
+        for filename, content in files.items():
+            assert tar.extractfile(f"deps/{filename}").read() == content
+
+    index = json.loads(index_path.read_text())
+    assert index["version"] == 1
+    assert index["archive_size"] == archive_path.stat().st_size
+    # Small files are not indexed
+    assert len(index["members"]) == 3
+
+
+def test_incremental_bundle_archive_invalid_previous_index(tmp_path, caplog):
+    files = {"unchanged.tgz": os.urandom(64 * 1024)}
+    _write_incremental_bundle(tmp_path, "1", files)
+    # The previous bundle archive was rewritten after its index
+    with open(tmp_path / "1.tar.gz", "ab") as f:
+        f.write(b"garbage")
+
+    archive, archive_path, _ = _write_incremental_bundle(tmp_path, "2", files, "1")
+
+    assert archive.reused_count == 0
+    assert "doesn't match" in caplog.text
+    with tarfile.open(archive_path, mode="r:gz") as tar:
+        assert tar.extractfile("deps/unchanged.tgz").read() == files["unchanged.tgz"]
+
+
+def test_incremental_bundle_archive_missing_previous(tmp_path, caplog):
+    files = {"unchanged.tgz": os.urandom(64 * 1024)}
+    archive, archive_path, _ = _write_incremental_bundle(tmp_path, "2", files, "1")
+
+    assert archive.reused_count == 0
+    assert "Not reusing the previous bundle archive" in caplog.text
+
+
+def test_incremental_bundle_archive_error(tmp_path):
+    index_path = tmp_path / "1.index.json"
+    with pytest.raises(FileNotFoundError):
+        with IncrementalBundleArchive(tmp_path / "1.tar.gz", index_path) as archive:
+            archive.add(str(tmp_path / "missing"), "deps")
+
+    assert not index_path.exists()
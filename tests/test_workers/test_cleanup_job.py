@@ -1,5 +1,6 @@
 from datetime import datetime
 from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
 import pytest
 import requests
@@ -121,7 +122,7 @@ mock_failed = {
 
 
 class MockRequestsPagination:
-    """Mock pagination behaviour of the /requests endpoint."""
+    """Mock cursor pagination behaviour of the /requests endpoint."""
 
     PER_PAGE = 10
     SELF_URL = "http://example.org/api/v1/requests"
@@ -134,36 +135,34 @@ class MockRequestsPagination:
         """
         self.complete_ids = list(range(1, total_complete_requests + 1))
         self.stale_ids = []
-        self.page = 1
+        self.pages = 0
 
-    @property
-    def _current_index(self):
-        return (self.page - 1) * self.PER_PAGE
-
-    def get(self, *args, params=None, **kwargs):
+    def get(self, url, *args, params=None, **kwargs):
         """
         Get one page of requests data.
 
         If `state` param is anything other than "complete", returns empty response.
         """
-        if params != {"state": "complete"}:
-            response = mock.Mock(ok=True, json=lambda: {"items": [], "meta": {"next": None}})
-            return response
-
-        curr_index = self._current_index
-        if curr_index >= len(self.complete_ids):
-            raise ValueError(f"Page {self.page} does not exist")
-
-        self.page += 1
-        next_index = self._current_index
-
-        request_ids = self.complete_ids[curr_index:next_index]
+        if params is not None:
+            if params != {"state": "complete", "after_id": 0}:
+                response = mock.Mock(ok=True, json=lambda: {"items": [], "meta": {"next": None}})
+                return response
+            after_id = 0
+        else:
+            after_id = int(parse_qs(urlparse(url).query)["after_id"][0])
+
+        self.pages += 1
+        remaining_ids = [request_id for request_id in self.complete_ids if request_id > after_id]
+        request_ids = remaining_ids[: self.PER_PAGE]
+        next_url = None
+        if len(remaining_ids) > self.PER_PAGE:
+            next_url = f"{self.SELF_URL}?after_id={request_ids[-1]}&state=complete"
         json_data = {
             "items": [
                 {"id": request_id, "state": "complete", "updated": "1970-01-01T01:00:00"}
                 for request_id in request_ids
             ],
-            "meta": {"next": self.SELF_URL if next_index < len(self.complete_ids) else None},
+            "meta": {"next": next_url},
         }
 
         response = mock.Mock(ok=True, json=lambda: json_data)
@@ -199,8 +198,8 @@ def test_cleanup_job_pagination_behaviour(mock_basic_session, mock_auth_session,
     # All complete requests should have been marked as stale
     assert mock_paginated_session.complete_ids == []
     assert mock_paginated_session.stale_ids == list(range(1, 12))
-    # We should be past the last page (last page is 2, we should be on page 3)
-    assert mock_paginated_session.page == 3
+    # Marking requests as stale does not shift the pages
+    assert mock_paginated_session.pages == 2
 
 
 @mock.patch("cachito.workers.config.Config.cachito_request_lifetime", 1)
@@ -266,3 +265,17 @@ def test_cleanup_job_request_failed_get(mock_requests):
     with pytest.raises(NetworkError, match=expected):
         main()
     assert mock_requests.call_count == 1
+
+
+@mock.patch("cachito.workers.cleanup_job.get_blob_store")
+@mock.patch("cachito.workers.cleanup_job.find_all_requests_in_state", return_value=[])
+def test_cleanup_job_prunes_blob_store(mock_find_requests, mock_get_blob_store):
+    main()
+    mock_get_blob_store.return_value.prune.assert_called_once_with(86400)
+
+
+@mock.patch("cachito.workers.cleanup_job.prune_git_mirrors", return_value=[])
+@mock.patch("cachito.workers.cleanup_job.find_all_requests_in_state", return_value=[])
+def test_cleanup_job_prunes_git_mirrors(mock_find_requests, mock_prune_git_mirrors):
+    main()
+    mock_prune_git_mirrors.assert_called_once_with(30 * 86400)
@@ -146,6 +146,18 @@ def test_validate_celery_config_invalid_nexus_hoster_config(
         validate_celery_config(celery_app.conf)
 
 
+@patch("os.path.isdir", return_value=True)
+def test_validate_celery_config_invalid_bundle_writer(mock_isdir):
+    celery_app = celery.Celery()
+    celery_app.conf.cachito_api_url = "http://cachito-api/api/v1/"
+    celery_app.conf.cachito_bundles_dir = "/tmp/some-path/bundles"
+    celery_app.conf.cachito_sources_dir = "/tmp/some-path/sources"
+    celery_app.conf.cachito_bundle_writer = "zstd"
+    expected = 'The configuration "cachito_bundle_writer" must be one of "gzip" or "parallel-gzip"'
+    with pytest.raises(ConfigError, match=expected):
+        validate_celery_config(celery_app.conf)
+
+
 @pytest.mark.parametrize("auth_type", ("cert", "kerberos", None))
 @pytest.mark.parametrize("has_cert", (False, True))
 @pytest.mark.parametrize("auth_cert", ("/some/path", None))
@@ -271,3 +283,19 @@ def test_validate_celery_config_request_logs_dir_misconfigured(file_type, access
     error = error.format(logs_dir=cachito_request_file_logs_dir)
     with pytest.raises(ConfigError, match=error):
         validate_celery_config(celery_app.conf)
+
+
+@patch("os.path.isdir", return_value=True)
+def test_validate_celery_config_streaming_and_incremental(mock_isdir):
+    celery_app = celery.Celery()
+    celery_app.conf.cachito_api_url = "http://cachito-api/api/v1/"
+    celery_app.conf.cachito_bundles_dir = "/tmp/some-path/bundles"
+    celery_app.conf.cachito_sources_dir = "/tmp/some-path/sources"
+    celery_app.conf.cachito_bundle_streaming = True
+    celery_app.conf.cachito_bundle_incremental = True
+    expected = (
+        'The configurations "cachito_bundle_streaming" and "cachito_bundle_incremental" '
+        "can't be both set"
+    )
+    with pytest.raises(ConfigError, match=expected):
+        validate_celery_config(celery_app.conf)
@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import errno
+import os
+from unittest import mock
+
+import pytest
+
+from cachito.workers.go_module_cache import GoModuleCache, get_go_module_cache
+from tests.helper_utils import write_file_tree
+
+
+@pytest.fixture()
+def module_cache(tmp_path):
+    return GoModuleCache(tmp_path / "gomod-cache", 100)
+
+
+def _write_download_dir(path, modules):
+    tree = {
+        "github.com": {
+            "foo": {
+                name: {
+                    "@v": {f"{version}{suffix}": content for suffix in (".info", ".mod", ".zip")}
+                }
+                for name, version, content in modules
+            },
+        },
+        "sumdb": {"sum.golang.org": {"lookup": {"github.com": {"foo": {"bar@v1.0.0": "sum"}}}}},
+    }
+    tree["github.com"]["foo"]["bar"]["@v"]["list"] = "v1.0.0\n"
+    path.mkdir()
+    write_file_tree(tree, path)
+
+
+def test_proxy_url(module_cache):
+    assert module_cache.proxy_url == f"file://{module_cache.root}/download"
+
+
+def test_add(module_cache, tmp_path):
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "bar"), ("baz", "v2.0.0", "baz")])
+
+    assert module_cache.add(download_dir) == 6
+    cached = sorted(
+        str(path.relative_to(module_cache.download_dir))
+        for path in module_cache.download_dir.rglob("*")
+        if path.is_file()
+    )
+    # Neither the version lists nor the checksum database are cached
+    assert cached == [
+        "github.com/foo/bar/@v/v1.0.0.info",
+        "github.com/foo/bar/@v/v1.0.0.mod",
+        "github.com/foo/bar/@v/v1.0.0.zip",
+        "github.com/foo/baz/@v/v2.0.0.info",
+        "github.com/foo/baz/@v/v2.0.0.mod",
+        "github.com/foo/baz/@v/v2.0.0.zip",
+    ]
+    # The cache is on the same filesystem, so the files are hardlinked
+    cached_zip = module_cache.download_dir / "github.com/foo/bar/@v/v1.0.0.zip"
+    assert cached_zip.samefile(download_dir / "github.com/foo/bar/@v/v1.0.0.zip")
+    # Adding the same modules again only marks them as recently used
+    os.utime(cached_zip, (0, 0))
+    assert module_cache.add(download_dir) == 0
+    assert cached_zip.stat().st_mtime > 0
+
+
+def test_evict(module_cache, tmp_path):
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "b" * 20), ("baz", "v2.0.0", "z" * 20)])
+    module_cache.add(download_dir)
+    for path in module_cache.download_dir.glob("github.com/foo/baz/@v/*"):
+        os.utime(path, (0, 0))
+
+    evicted = module_cache.evict()
+
+    # The 120 bytes of modules exceed the 100 bytes limit, the least recently used module version
+    # is evicted as a whole, starting with its .info file
+    assert [path.name for path in evicted] == ["v2.0.0.info", "v2.0.0.mod", "v2.0.0.zip"]
+    assert not list(module_cache.download_dir.glob("github.com/foo/baz/@v/*"))
+    assert len(list(module_cache.download_dir.glob("github.com/foo/bar/@v/*"))) == 3
+
+
+def test_evict_uses_latest_use_of_version(module_cache, tmp_path):
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "b" * 20), ("baz", "v2.0.0", "z" * 20)])
+    module_cache.add(download_dir)
+    for path in module_cache.download_dir.glob("github.com/foo/*/@v/*"):
+        os.utime(path, (0, 0))
+    # Only the .zip file of bar was used recently
+    os.utime(module_cache.download_dir / "github.com/foo/bar/@v/v1.0.0.zip", (10, 10))
+
+    evicted = module_cache.evict()
+
+    assert [path.parent.parent.name for path in evicted] == ["baz", "baz", "baz"]
+
+
+def test_use_evicts_while_in_use(module_cache, tmp_path):
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "b" * 50)])
+
+    with module_cache.use():
+        assert module_cache.build_cache_dir.is_dir()
+        module_cache.add(download_dir)
+        with module_cache.use():
+            pass
+        # Another request evicted the modules while this one uses the cache
+        assert not list(module_cache.download_dir.glob("github.com/foo/bar/@v/*"))
+
+
+def test_evict_concurrently(module_cache, tmp_path):
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "b" * 50)])
+    module_cache.add(download_dir)
+
+    with module_cache._evict_lock():
+        # Only one eviction runs at a time
+        with pytest.raises(BlockingIOError):
+            module_cache.evict()
+        with module_cache.use():
+            pass
+
+    assert len(list(module_cache.download_dir.glob("github.com/foo/bar/@v/*"))) == 3
+
+
+@mock.patch("os.link")
+def test_add_copies_across_filesystems(mock_link, module_cache, tmp_path):
+    mock_link.side_effect = OSError(errno.EXDEV, "Invalid cross-device link")
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "bar")])
+
+    assert module_cache.add(download_dir) == 3
+
+    cached_zip = module_cache.download_dir / "github.com/foo/bar/@v/v1.0.0.zip"
+    assert cached_zip.read_text() == "bar"
+    assert not cached_zip.samefile(download_dir / "github.com/foo/bar/@v/v1.0.0.zip")
+
+
+def test_package_list(module_cache):
+    package_list = {"modules": [], "packages": [{"ImportPath": "fmt", "Standard": True}]}
+    assert module_cache.load_package_list("abc") is None
+
+    module_cache.store_package_list("abc", package_list)
+    cached_file = module_cache.package_lists_dir / "abc.json"
+    os.utime(cached_file, (0, 0))
+
+    assert module_cache.load_package_list("abc") == package_list
+    # Loading the package list marks it as recently used
+    assert cached_file.stat().st_mtime > 0
+
+
+def test_evict_package_list(module_cache, tmp_path):
+    download_dir = tmp_path / "download"
+    _write_download_dir(download_dir, [("bar", "v1.0.0", "b" * 30)])
+    module_cache.add(download_dir)
+    module_cache.store_package_list("abc", {"packages": ["x" * 20]})
+    os.utime(module_cache.package_lists_dir / "abc.json", (0, 0))
+
+    evicted = module_cache.evict()
+
+    assert [path.name for path in evicted] == ["abc.json"]
+
+
+@pytest.mark.parametrize("cache_dir", [None, "/var/cache/cachito/gomod"])
+@mock.patch("cachito.workers.go_module_cache.get_worker_config")
+def test_get_go_module_cache(mock_gwc, cache_dir):
+    mock_gwc.return_value.cachito_gomod_cache_dir = cache_dir
+    mock_gwc.return_value.cachito_gomod_cache_max_size = 1024
+
+    module_cache = get_go_module_cache()
+
+    if cache_dir is None:
+        assert module_cache is None
+    else:
+        assert str(module_cache.root) == cache_dir
+        assert module_cache.max_size == 1024
@@ -1,16 +1,24 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
 import logging
+import os
+import threading
+import time
 from unittest import mock
 
 import pytest
 import requests
 
 from cachito.errors import InvalidChecksum, InvalidRequestData, NetworkError
+from cachito.workers.blob_store import BlobStore
 from cachito.workers.pkg_managers import general
 from cachito.workers.pkg_managers.general import (
     ChecksumInfo,
+    copy_file,
     download_binary_file,
+    download_concurrently,
     pkg_requests_session,
+    replace_file,
     update_request_env_vars,
     update_request_with_config_files,
     upload_raw_package,
@@ -117,6 +125,85 @@ def test_download_binary_file(mock_get, auth, insecure, chunk_size, tmpdir):
     mock_response.iter_content.assert_called_with(chunk_size=chunk_size)
 
 
+@pytest.mark.parametrize("blob_exists", [True, False])
+@mock.patch("cachito.workers.pkg_managers.general.get_blob_store")
+@mock.patch.object(pkg_requests_session, "get")
+def test_download_binary_file_blob_store(mock_get, mock_get_blob_store, blob_exists, tmp_path):
+    url = "http://example.org/example.tar.gz"
+    sha256 = "a" * 64
+    mock_get.return_value.iter_content.return_value = [b"file content"]
+    mock_blob_store = mock_get_blob_store.return_value
+    mock_blob_store.link.return_value = blob_exists
+
+    download_path = tmp_path / "example.tar.gz"
+    download_binary_file(url, download_path, sha256=sha256)
+
+    mock_blob_store.link.assert_called_once_with(sha256, download_path)
+    if blob_exists:
+        mock_get.assert_not_called()
+        mock_blob_store.add.assert_not_called()
+    else:
+        assert download_path.read_bytes() == b"file content"
+        mock_blob_store.add.assert_called_once_with(download_path)
+
+
+@mock.patch("cachito.workers.pkg_managers.general.get_blob_store")
+@mock.patch.object(pkg_requests_session, "get")
+def test_download_binary_file_twice_keeps_blob(mock_get, mock_get_blob_store, tmp_path):
+    url = "http://example.org/example.tar.gz"
+    blob_store = BlobStore(tmp_path / "blobs")
+    mock_get_blob_store.return_value = blob_store
+    download_path = tmp_path / "deps" / "example.tar.gz"
+    download_path.parent.mkdir()
+
+    mock_get.return_value.iter_content.return_value = [b"old content"]
+    download_binary_file(url, download_path)
+    old_blob = blob_store.blob_path(hashlib.sha256(b"old content").hexdigest())
+    assert os.path.samefile(download_path, old_blob)
+
+    # The same path is downloaded again, but the content changed in the meantime
+    mock_get.return_value.iter_content.return_value = [b"new content"]
+    download_binary_file(url, download_path)
+
+    assert old_blob.read_bytes() == b"old content"
+    assert download_path.read_bytes() == b"new content"
+    assert not os.path.samefile(download_path, old_blob)
+    assert [path.name for path in download_path.parent.iterdir()] == ["example.tar.gz"]
+
+
+def test_copy_file_keeps_blob(tmp_path):
+    blob_store = BlobStore(tmp_path / "blobs")
+    deps_dir = tmp_path / "deps"
+    deps_dir.mkdir()
+    dest = deps_dir / "repo.tar.gz"
+    dest.write_bytes(b"old content")
+    blob_store.add_tree(deps_dir)
+    blob = blob_store.blob_path(hashlib.sha256(b"old content").hexdigest())
+    assert os.path.samefile(dest, blob)
+
+    # The deduplicated path is written again
+    source = tmp_path / "archive.tar.gz"
+    source.write_bytes(b"new content")
+    copy_file(source, dest)
+
+    assert blob.read_bytes() == b"old content"
+    assert dest.read_bytes() == b"new content"
+    assert [path.name for path in deps_dir.iterdir()] == ["repo.tar.gz"]
+
+
+def test_replace_file_failure(tmp_path):
+    dest = tmp_path / "repo.tar.gz"
+    dest.write_bytes(b"old content")
+
+    with pytest.raises(OSError, match="disk failure"):
+        with replace_file(dest) as f:
+            f.write(b"new")
+            raise OSError("disk failure")
+
+    assert dest.read_bytes() == b"old content"
+    assert [path.name for path in tmp_path.iterdir()] == ["repo.tar.gz"]
+
+
 @mock.patch.object(pkg_requests_session, "get")
 def test_download_binary_file_failed(mock_get):
     mock_get.side_effect = [requests.RequestException("Something went wrong")]
@@ -126,6 +213,45 @@ def test_download_binary_file_failed(mock_get):
         download_binary_file("http://example.org/example.tar.gz", "/example.tar.gz")
 
 
+@pytest.mark.parametrize("concurrency_limit", [0, 1, 3])
+def test_download_concurrently(concurrency_limit):
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def download(item):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return item * 2
+
+    assert download_concurrently(download, range(10), concurrency_limit) == list(range(0, 20, 2))
+    assert max_running <= max(concurrency_limit, 1)
+
+
+def test_download_concurrently_failed():
+    started = []
+
+    def download(item):
+        started.append(item)
+        if item in (2, 3):
+            # The later item fails first, the error of the earlier item is still reported
+            time.sleep(0.05 if item == 2 else 0)
+            raise NetworkError(f"Could not download {item}")
+        time.sleep(0.01)
+        return item
+
+    with pytest.raises(NetworkError, match="Could not download 2"):
+        download_concurrently(download, range(20), 4)
+
+    # No download is started after a failure
+    assert len(started) < 20
+
+
 @mock.patch.object(requests_auth_session, "patch")
 def test_update_request_env_vars(mock_patch):
     mock_patch.return_value.ok = True
@@ -202,9 +202,8 @@ def test_download_dependencies_skip_deps(
     download_dir = tmpdir.join("deps")
     download_dir.mkdir()
 
-    general_js.download_dependencies(
-        Path(download_dir), deps, proxy_repo_url, {"@angular/animations@8.2.14"}
-    )
+    skip_deps = {"@angular/animations@8.2.14"}
+    general_js.download_dependencies(Path(download_dir), deps, proxy_repo_url, skip_deps)
 
     # dep_1
     dep1_source_path = os.path.join(
@@ -235,6 +234,12 @@ def test_download_dependencies_skip_deps(
             mock.call(dep2_source_path, dep2_dest_path),
         ],
     )
+    # The downloaded dependencies are skipped by the next calls sharing the set
+    assert skip_deps == {
+        "@angular-devkit/architect@0.803.26",
+        "@angular/animations@8.2.14",
+        "rxjs@6.5.5-external-gitcommit-78032157f5c1655436829017bbda787565b48c30",
+    }
 
 
 @pytest.mark.parametrize(
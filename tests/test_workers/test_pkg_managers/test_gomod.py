@@ -1,4 +1,5 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import errno
 import json
 import os
 import re
@@ -13,11 +14,14 @@ from unittest import mock
 
 import git
 import pytest
+import semver
 from packaging.version import Version
 
 from cachito.errors import GoModError, InvalidFileFormat, UnsupportedFeature, ValidationError
 from cachito.workers import safe_extract
+from cachito.workers.config import get_worker_config
 from cachito.workers.errors import CachitoCalledProcessError
+from cachito.workers.go_module_cache import GoModuleCache
 from cachito.workers.paths import RequestBundleDir
 from cachito.workers.pkg_managers import gomod
 from tests.helper_utils import assert_directories_equal, write_file_tree
@@ -68,10 +72,13 @@ RETRODEP_POST_REPLACE = "github.com/cachito-testing/retrodep/v2"
 )
 @pytest.mark.parametrize("cgo_disable", [False, True])
 @pytest.mark.parametrize("force_gomod_tidy", [False, True])
+@pytest.mark.parametrize("use_module_cache", [False, True])
 @mock.patch("cachito.workers.pkg_managers.gomod._disable_telemetry")
 @mock.patch("cachito.workers.pkg_managers.gomod.Go.release", new_callable=mock.PropertyMock)
 @mock.patch("cachito.workers.pkg_managers.gomod._get_gomod_version")
+@mock.patch("cachito.workers.pkg_managers.gomod.GitTagIndex")
 @mock.patch("cachito.workers.pkg_managers.gomod.get_golang_version")
+@mock.patch("cachito.workers.pkg_managers.gomod.get_go_module_cache")
 @mock.patch("cachito.workers.pkg_managers.gomod.GoCacheTemporaryDirectory")
 @mock.patch("cachito.workers.pkg_managers.gomod._merge_bundle_dirs")
 @mock.patch("cachito.workers.pkg_managers.gomod._vet_local_file_dep_paths")
@@ -83,7 +90,9 @@ def test_resolve_gomod(
     mock_vet_local_file_dep_paths: mock.Mock,
     mock_merge_tree: mock.Mock,
     mock_temp_dir: mock.Mock,
+    mock_get_go_module_cache: mock.Mock,
     mock_golang_version: mock.Mock,
+    mock_tag_index: mock.Mock,
     mock_get_gomod_version: mock.Mock,
     mock_go_release: mock.PropertyMock,
     mock_disable_telemetry: mock.Mock,
@@ -91,6 +100,7 @@ def test_resolve_gomod(
     expected_replace: Optional[str],
     cgo_disable: bool,
     force_gomod_tidy: bool,
+    use_module_cache: bool,
     tmp_path: Path,
 ):
     module_dir = tmp_path / "path/to/module"
@@ -98,6 +108,22 @@ def test_resolve_gomod(
     # Mock the tempfile.TemporaryDirectory context manager
     mock_temp_dir.return_value.__enter__.return_value = str(tmp_path)
 
+    module_file = Path("github.com/foo/bar/@v/v1.0.0.mod")
+    if use_module_cache:
+        # The go list cache key is computed from the checked out commit
+        module_dir.mkdir(parents=True)
+        module_dir.joinpath("go.mod").write_text("module github.com/cachito-testing/gomod\n")
+        repo = git.Repo.init(module_dir)
+        repo.index.add(["go.mod"])
+        repo.index.commit("first commit", author=git.Actor("tester", "tester@localhost"))
+        module_cache = GoModuleCache(tmp_path / "module-cache", 1024 * 1024)
+        mock_get_go_module_cache.return_value = module_cache
+        tmp_download_dir = tmp_path / RequestBundleDir.go_mod_cache_download_part
+        (tmp_download_dir / module_file).parent.mkdir(parents=True)
+        (tmp_download_dir / module_file).write_text("module github.com/foo/bar\n")
+    else:
+        mock_get_go_module_cache.return_value = None
+
     mock_disable_telemetry.return_value = None
 
     # Mock the "subprocess.run" calls
@@ -123,10 +149,6 @@ def test_resolve_gomod(
         # go list -deps -json all
         mock.Mock(returncode=0, stdout=get_mocked_data("non-vendored/go_list_deps_all.json"))
     )
-    run_side_effects.append(
-        # go list -deps -json ./...
-        mock.Mock(returncode=0, stdout=get_mocked_data("non-vendored/go_list_deps_threedot.json"))
-    )
     mock_run.side_effect = run_side_effects
 
     mock_golang_version.return_value = "v0.1.0"
@@ -177,8 +199,7 @@ def test_resolve_gomod(
         "-deps",
         "-json=ImportPath,Module,Standard,Deps",
     ]
-    assert mock_run.call_args_list[-2][0][0] == [*listdeps_cmd, "all"]
-    assert mock_run.call_args_list[-1][0][0] == [*listdeps_cmd, "./..."]
+    assert mock_run.call_args_list[-1][0][0] == [*listdeps_cmd, "all"]
 
     for call in mock_run.call_args_list:
         env = call.kwargs["env"]
@@ -186,6 +207,16 @@ def test_resolve_gomod(
             assert env["CGO_ENABLED"] == "0"
         else:
             assert "CGO_ENABLED" not in env
+        athens_url = get_worker_config().cachito_athens_url
+        if use_module_cache:
+            assert env["GOPROXY"] == f"{module_cache.proxy_url},{athens_url}|{athens_url}"
+            assert env["GOCACHE"] == str(module_cache.build_cache_dir)
+        else:
+            assert env["GOPROXY"] == f"{athens_url}|{athens_url}"
+            assert env["GOCACHE"] == str(tmp_path)
+
+    if use_module_cache:
+        assert (module_cache.download_dir / module_file).is_file()
 
     mock_merge_tree.assert_called_once_with(
         str(tmp_path / RequestBundleDir.go_mod_cache_download_part),
@@ -207,11 +238,22 @@ def test_resolve_gomod(
     )
     mock_set_full_relpaths.assert_called_once_with(expect_pkg_deps, expect_module_deps)
 
+    if use_module_cache:
+        assert len(list(module_cache.package_lists_dir.glob("*.json"))) == 1
+
+        # Resolving the same sources again reuses the cached go list output
+        mock_run.reset_mock()
+        mock_run.side_effect = run_side_effects[:-2]
+        dep_replacements = [dep_replacement] if dep_replacement else None
+        assert gomod.resolve_gomod(module_dir, request, dep_replacements) == expect_gomod
+        assert not [call for call in mock_run.call_args_list if call[0][0][1] == "list"]
+
 
 @pytest.mark.parametrize("force_gomod_tidy", [False, True])
 @mock.patch("cachito.workers.pkg_managers.gomod._disable_telemetry")
 @mock.patch("cachito.workers.pkg_managers.gomod.Go.release", new_callable=mock.PropertyMock)
 @mock.patch("cachito.workers.pkg_managers.gomod._get_gomod_version")
+@mock.patch("cachito.workers.pkg_managers.gomod.GitTagIndex")
 @mock.patch("cachito.workers.pkg_managers.gomod.get_golang_version")
 @mock.patch("cachito.workers.pkg_managers.gomod.GoCacheTemporaryDirectory")
 @mock.patch("subprocess.run")
@@ -223,6 +265,7 @@ def test_resolve_gomod_vendor_dependencies(
     mock_run: mock.Mock,
     mock_temp_dir: mock.Mock,
     mock_golang_version: mock.Mock,
+    mock_tag_index: mock.Mock,
     mock_get_gomod_version: mock.Mock,
     mock_go_release: mock.PropertyMock,
     mock_disable_telemetry: mock.Mock,
@@ -254,10 +297,6 @@ def test_resolve_gomod_vendor_dependencies(
         # go list -deps -json all
         mock.Mock(returncode=0, stdout=get_mocked_data("vendored/go_list_deps_all.json"))
     )
-    run_side_effects.append(
-        # go list -deps -json ./...
-        mock.Mock(returncode=0, stdout=get_mocked_data("vendored/go_list_deps_threedot.json"))
-    )
     mock_run.side_effect = run_side_effects
 
     mock_golang_version.return_value = "v0.1.0"
@@ -279,7 +318,7 @@ def test_resolve_gomod_vendor_dependencies(
 
     assert mock_run.call_args_list[0][0][0] == ["go", "mod", "vendor"]
     # when vendoring, go list should be called without -mod readonly
-    assert mock_run.call_args_list[-2][0][0] == [
+    assert mock_run.call_args_list[-1][0][0] == [
         "go",
         "list",
         "-e",
@@ -381,8 +420,11 @@ def test_parse_modules_from_json_stream(
     assert result == expected_modules
 
 
+@mock.patch("cachito.workers.pkg_managers.gomod.GitTagIndex")
 @mock.patch("cachito.workers.pkg_managers.gomod.get_golang_version")
-def test_set_local_modules_versions(mock_get_golang_version: mock.Mock) -> None:
+def test_set_local_modules_versions(
+    mock_get_golang_version: mock.Mock, mock_tag_index: mock.Mock
+) -> None:
     git_dir_path = Path("/home/user/mymod")
     request = {"ref": "abc123"}
     main_module = gomod.GoModule(
@@ -404,10 +446,18 @@ def test_set_local_modules_versions(mock_get_golang_version: mock.Mock) -> None:
     assert local_modules.main.version == "v1.0.1"
     assert local_modules.workspaces[0].version == "v0.0.1"
 
+    # The tag index is shared by all the modules
+    mock_tag_index.load.assert_called_once_with(git_dir_path)
+    tag_index = mock_tag_index.load.return_value
     mock_get_golang_version.assert_has_calls(
         [
             mock.call(
-                main_module.path, git_dir_path, request["ref"], update_tags=True, subpath=None
+                main_module.path,
+                git_dir_path,
+                request["ref"],
+                update_tags=True,
+                subpath=None,
+                tag_index=tag_index,
             ),
             mock.call(
                 workspace.path,
@@ -415,6 +465,7 @@ def test_set_local_modules_versions(mock_get_golang_version: mock.Mock) -> None:
                 request["ref"],
                 update_tags=True,
                 subpath="workspace",
+                tag_index=tag_index,
             ),
         ]
     )
@@ -425,12 +476,14 @@ def test_set_local_modules_versions(mock_get_golang_version: mock.Mock) -> None:
 @mock.patch("cachito.workers.pkg_managers.gomod._get_gomod_version")
 @mock.patch("cachito.workers.pkg_managers.gomod.GoCacheTemporaryDirectory")
 @mock.patch("subprocess.run")
+@mock.patch("cachito.workers.pkg_managers.gomod.GitTagIndex")
 @mock.patch("cachito.workers.pkg_managers.gomod.get_golang_version")
 @mock.patch("cachito.workers.pkg_managers.gomod.get_worker_config")
 @pytest.mark.parametrize("strict_vendor", [True, False])
 def test_resolve_gomod_strict_mode_raise_error(
     mock_gwc: mock.Mock,
     mock_golang_version: mock.Mock,
+    mock_tag_index: mock.Mock,
     mock_run: mock.Mock,
     mock_temp_dir: mock.Mock,
     mock_get_gomod_version: mock.Mock,
@@ -465,7 +518,6 @@ def test_resolve_gomod_strict_mode_raise_error(
         mock.Mock(returncode=0, stdout=""),  # go mod download
         mock.Mock(returncode=0, stdout=mock_main_module_json),  # go list -m -json
         mock.Mock(returncode=0, stdout=""),  # go list -deps -json all
-        mock.Mock(returncode=0, stdout=""),  # go list -deps -json ./...
     ]
 
     tmp_path.joinpath("vendor").mkdir()
@@ -483,6 +535,7 @@ def test_resolve_gomod_strict_mode_raise_error(
 @mock.patch("cachito.workers.pkg_managers.gomod._disable_telemetry")
 @mock.patch("cachito.workers.pkg_managers.gomod.Go.release", new_callable=mock.PropertyMock)
 @mock.patch("cachito.workers.pkg_managers.gomod._get_gomod_version")
+@mock.patch("cachito.workers.pkg_managers.gomod.GitTagIndex")
 @mock.patch("cachito.workers.pkg_managers.gomod.get_golang_version")
 @mock.patch("cachito.workers.pkg_managers.gomod.GoCacheTemporaryDirectory")
 @mock.patch("cachito.workers.pkg_managers.gomod._merge_bundle_dirs")
@@ -494,6 +547,7 @@ def test_resolve_gomod_no_deps(
     mock_merge_tree: mock.Mock,
     mock_temp_dir: mock.Mock,
     mock_golang_version: mock.Mock,
+    mock_tag_index: mock.Mock,
     mock_get_gomod_version: mock.Mock,
     mock_go_release: mock.PropertyMock,
     mock_disable_telemetry: mock.Mock,
@@ -537,10 +591,6 @@ def test_resolve_gomod_no_deps(
         # go list -deps -json all
         mock.Mock(returncode=0, stdout=mock_pkg_deps_no_deps)
     )
-    run_side_effects.append(
-        # go list -deps -json ./...
-        mock.Mock(returncode=0, stdout=mock_pkg_deps_no_deps)
-    )
     mock_run.side_effect = run_side_effects
 
     mock_golang_version.return_value = "v1.21.4"
@@ -579,6 +629,79 @@ def test_resolve_gomod_no_deps(
     )
 
 
+@pytest.mark.parametrize(
+    "changes, expect_same_key",
+    [
+        ({}, True),
+        ({"README.md": "hello"}, True),
+        ({"main.go": 'package main\nimport "os"\n'}, False),
+        ({"pkg/util/util.go": "package util\n"}, False),
+        ({"go.sum": "example.com/foo v1.0.0 h1:abc=\n"}, False),
+        # The ignored files are read by go list as well
+        ({"vendor/modules.txt": "# example.com/foo v1.0.0\n"}, False),
+    ],
+)
+def test_go_list_cache_key(changes: dict[str, str], expect_same_key: bool, tmp_path: Path) -> None:
+    files = {
+        ".gitignore": "vendor/\n",
+        "go.mod": "module example.com/app\n",
+        "main.go": 'package main\nimport "fmt"\n',
+        "README.md": "app",
+    }
+    write_file_tree(files, tmp_path)
+    repo = git.Repo.init(tmp_path)
+    repo.index.add(list(files))
+    repo.index.commit("first commit", author=git.Actor("tester", "tester@localhost"))
+    go = mock.Mock(release="go1.21.0")
+    run_params = {"env": {}}
+    go_list = ["list", "-e", "-mod", "readonly"]
+
+    key = gomod._go_list_cache_key(go, go_list, run_params, tmp_path, tmp_path)
+    for path, content in changes.items():
+        tmp_path.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.joinpath(path).write_text(content)
+    new_key = gomod._go_list_cache_key(go, go_list, run_params, tmp_path, tmp_path)
+
+    assert (new_key == key) == expect_same_key
+    # The Go release and the build options are part of the key as well
+    go.release = "go1.22.0"
+    assert gomod._go_list_cache_key(go, go_list, run_params, tmp_path, tmp_path) != new_key
+    run_params["env"]["CGO_ENABLED"] = "0"
+    go_list = ["list", "-e"]
+    go.release = "go1.21.0"
+    assert gomod._go_list_cache_key(go, go_list, run_params, tmp_path, tmp_path) != new_key
+
+
+def test_go_list_cache_key_deleted_file(tmp_path: Path) -> None:
+    files = {"go.mod": "module example.com/app\n", "main.go": "package main\n"}
+    write_file_tree(files, tmp_path)
+    repo = git.Repo.init(tmp_path)
+    repo.index.add(list(files))
+    repo.index.commit("first commit", author=git.Actor("tester", "tester@localhost"))
+    go = mock.Mock(release="go1.21.0")
+    go_list = ["list", "-e", "-mod", "readonly"]
+
+    key = gomod._go_list_cache_key(go, go_list, {"env": {}}, tmp_path, tmp_path)
+    tmp_path.joinpath("main.go").unlink()
+
+    assert gomod._go_list_cache_key(go, go_list, {"env": {}}, tmp_path, tmp_path) != key
+
+
+@pytest.mark.parametrize(
+    "package_list, valid",
+    [
+        ({"version": gomod.GO_LIST_CACHE_VERSION, "modules": [], "packages": []}, True),
+        # Stored by a worker using a previous format
+        ({"modules": [], "packages": []}, False),
+        ({"version": gomod.GO_LIST_CACHE_VERSION + 1, "modules": [], "packages": []}, False),
+        ({"version": gomod.GO_LIST_CACHE_VERSION, "packages": []}, False),
+        ([], False),
+    ],
+)
+def test_is_valid_cached_package_list(package_list: Any, valid: bool) -> None:
+    assert gomod._is_valid_cached_package_list(package_list) == valid
+
+
 @pytest.mark.parametrize(("go_mod_rc", "go_list_rc"), ((0, 1), (1, 0)))
 @mock.patch("cachito.workers.pkg_managers.gomod._disable_telemetry")
 @mock.patch("cachito.workers.pkg_managers.gomod.Go.release", new_callable=mock.PropertyMock)
@@ -745,6 +868,84 @@ def test_get_golang_version(tmpdir, module_suffix, ref, expected, subpath):
     assert version == expected
 
 
+def test_git_tag_index(fake_repo):
+    repo_dir, _ = fake_repo
+    repo = git.Repo(repo_dir)
+    first_commit, second_commit = repo.iter_commits(reverse=True)
+    repo.create_tag("v1.0.0", ref=first_commit)
+    repo.create_tag("v1.1.0-rc1", ref=second_commit, message="annotated")
+    repo.create_tag("v2.0.0", ref=second_commit)
+    repo.create_tag("sub/v1.2.0", ref=first_commit)
+    repo.create_tag("not-a-version", ref=second_commit)
+    git_dir_files = set(Path(repo.git_dir).rglob("*"))
+
+    tag_index = gomod.GitTagIndex.load(repo_dir)
+
+    assert tag_index.get_highest_semver_tag(second_commit, 1).name == "v1.1.0-rc1"
+    assert tag_index.get_highest_semver_tag(second_commit, 2).name == "v2.0.0"
+    assert tag_index.get_highest_semver_tag(first_commit, 2) is None
+    assert tag_index.get_highest_semver_tag(first_commit, 2, all_reachable=True) is None
+    assert tag_index.get_highest_semver_tag(first_commit, 1, subpath="sub").name == "sub/v1.2.0"
+    assert (
+        tag_index.get_highest_semver_tag(second_commit, 1, all_reachable=True, subpath="sub").name
+        == "sub/v1.2.0"
+    )
+    # Nothing is written into the .git directory, which may be included in the source archive
+    assert set(Path(repo.git_dir).rglob("*")) == git_dir_files
+
+
+def test_get_semver_precedence():
+    versions = [
+        "1.0.0-alpha",
+        "1.0.0-alpha.1",
+        "1.0.0-alpha.beta",
+        "1.0.0-beta",
+        "1.0.0-beta.2",
+        "1.0.0-beta.11",
+        "1.0.0-rc.1",
+        "1.0.0",
+        "1.0.1-0",
+        "1.0.1",
+        "1.2.0",
+        "1.10.0",
+        "2.0.0",
+    ]
+    semantic_versions = [semver.VersionInfo.parse(version) for version in reversed(versions)]
+
+    by_precedence = sorted(semantic_versions, key=gomod._get_semver_precedence)
+
+    assert by_precedence == sorted(semantic_versions)
+    assert [str(version) for version in by_precedence] == versions
+
+
+@mock.patch("cachito.workers.pkg_managers.gomod._get_semantic_version_from_tag")
+def test_git_tag_index_incremental_update(mock_get_semantic_version, fake_repo):
+    mock_get_semantic_version.side_effect = lambda tag_name, subpath: semver.VersionInfo.parse(
+        tag_name[1:]
+    )
+    repo_dir, _ = fake_repo
+    repo = git.Repo(repo_dir)
+    first_commit, second_commit = repo.iter_commits(reverse=True)
+    repo.create_tag("v1.0.0", ref=first_commit)
+
+    tag_index = gomod.GitTagIndex.load(repo_dir)
+    assert tag_index.get_highest_semver_tag(second_commit, 1, all_reachable=True).name == "v1.0.0"
+
+    # The unchanged tags are kept, including the tags merged into the second commit
+    with mock.patch("git.Git.execute", wraps=git.Git(repo_dir).execute) as mock_execute:
+        assert not tag_index.update()
+        assert tag_index.get_highest_semver_tag(second_commit, 1, all_reachable=True)
+    assert mock_execute.call_count == 1
+    assert mock_get_semantic_version.call_count == 1
+
+    # Only the new tag is parsed, and the merged tags are listed again
+    repo.create_tag("v1.1.0", ref=second_commit)
+    assert tag_index.update()
+    assert mock_get_semantic_version.call_count == 2
+    assert tag_index.get_highest_semver_tag(second_commit, 1, all_reachable=True).name == "v1.1.0"
+    assert tag_index.get_highest_semver_tag(first_commit, 1, all_reachable=True).name == "v1.0.0"
+
+
 @pytest.mark.parametrize(
     "tree_1, tree_2, result_tree, merge_file_executions",
     (
@@ -855,6 +1056,81 @@ def test_merge_files(file_1_content, file_2_content, result_file_content):
         assert_directories_equal(dir_2, dir_3)
 
 
+def test_merge_files_keeps_linked_source(tmp_path):
+    src_file = tmp_path / "src" / "list"
+    dst_file = tmp_path / "dst" / "list"
+    src_file.parent.mkdir()
+    dst_file.parent.mkdir()
+    src_file.write_text("v1.1.0\nv1.0.0\n")
+    other_src_file = tmp_path / "list"
+    other_src_file.write_text("v1.2.0\n")
+    os.link(src_file, dst_file)
+
+    gomod._merge_files(str(other_src_file), str(dst_file))
+
+    assert dst_file.read_text() == "v1.0.0\nv1.1.0\nv1.2.0\n"
+    # The merged file replaced the hardlink instead of being written through it
+    assert src_file.read_text() == "v1.1.0\nv1.0.0\n"
+    assert os.listdir(dst_file.parent) == ["list"]
+
+
+@pytest.mark.parametrize("can_link, can_reflink", [(True, False), (False, True), (False, False)])
+@mock.patch("fcntl.ioctl")
+@mock.patch("os.link")
+def test_transfer_file(mock_link, mock_ioctl, can_link, can_reflink, tmp_path):
+    src_file = tmp_path / "v1.0.0.zip"
+    src_file.write_bytes(b"zip")
+    dst_file = tmp_path / "dst.zip"
+
+    def link(src, dst):
+        if not can_link:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        Path(dst).write_bytes(Path(src).read_bytes())
+
+    def ioctl(fd, request, arg):
+        if not can_reflink:
+            raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+        os.write(fd, os.read(arg, 1024))
+
+    mock_link.side_effect = link
+    mock_ioctl.side_effect = ioctl
+
+    gomod._transfer_file(str(src_file), str(dst_file))
+
+    assert dst_file.read_bytes() == b"zip"
+    assert src_file.exists()
+    mock_link.assert_called_once_with(str(src_file), str(dst_file))
+    if can_link:
+        mock_ioctl.assert_not_called()
+    else:
+        mock_ioctl.assert_called_once_with(mock.ANY, gomod._FICLONE, mock.ANY)
+
+
+@pytest.mark.parametrize("file_name", ["list", "list.lock"])
+@pytest.mark.parametrize("can_reflink", [True, False])
+@mock.patch("fcntl.ioctl")
+@mock.patch("os.link")
+def test_transfer_file_never_links_list(mock_link, mock_ioctl, file_name, can_reflink, tmp_path):
+    src_file = tmp_path / file_name
+    src_file.write_text("v1.0.0\n")
+    dst_file = tmp_path / f"dst-{file_name}"
+
+    def ioctl(fd, request, arg):
+        if not can_reflink:
+            raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+        os.write(fd, os.read(arg, 1024))
+
+    mock_ioctl.side_effect = ioctl
+
+    gomod._transfer_file(str(src_file), str(dst_file))
+
+    # Go may append to the list later, which must not change the other file
+    mock_link.assert_not_called()
+    with open(src_file, "a") as f:
+        f.write("v1.1.0\n")
+    assert dst_file.read_text() == "v1.0.0\n"
+
+
 def test_vet_local_file_dep_paths():
     dependencies = [
         {"name": "stdlib-dep", "version": None},
@@ -1,6 +1,9 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import concurrent.futures
 import logging
 import re
+import threading
+import time
 from pathlib import Path
 from textwrap import dedent
 from unittest import mock
@@ -2450,7 +2453,7 @@ class TestDownload:
                 "https://pypi-proxy.org/simple/aiowsgi/../../packages/aiowsgi-0.7.tar.gz"
             )
             mock_download_file.assert_called_once_with(
-                proxied_file_url, download_info["path"], auth=("user", "password")
+                proxied_file_url, download_info["path"], auth=("user", "password"), sha256=None
             )
         else:
             with pytest.raises((InvalidRequestData, NetworkError)) as exc_info:
@@ -2622,10 +2625,10 @@ class TestDownload:
     @mock.patch("cachito.workers.pkg_managers.pip.nexus.get_raw_component_asset_url")
     @mock.patch("cachito.workers.pkg_managers.general.download_binary_file")
     @mock.patch("cachito.workers.pkg_managers.pip.Git")
-    @mock.patch("shutil.copy")
+    @mock.patch("cachito.workers.pkg_managers.pip.copy_file")
     def test_download_vcs_package(
         self,
-        mock_shutil_copy,
+        mock_copy_file,
         mock_git,
         mock_download_file,
         mock_get_component_url,
@@ -2677,13 +2680,13 @@ class TestDownload:
                 raw_url, download_path, auth=("username", "password")
             )
             mock_git.assert_not_called()
-            mock_shutil_copy.assert_not_called()
+            mock_copy_file.assert_not_called()
         else:
             assert "Raw component not found, will fetch from git" in caplog.text
             mock_download_file.assert_not_called()
             mock_git.assert_called_once_with("https://github.com/spam/eggs", GIT_REF)
             mock_git.return_value.fetch_source.assert_called_once_with(gitsubmodule=False)
-            mock_shutil_copy.assert_called_once_with(git_archive_path, download_path)
+            mock_copy_file.assert_called_once_with(git_archive_path, download_path)
 
     @pytest.mark.parametrize("have_raw_component", [True, False])
     @pytest.mark.parametrize("hash_as_qualifier", [True, False])
@@ -2980,6 +2983,7 @@ class TestDownload:
         msg = "Not a valid hash specifier: 'malformed' (expected algorithm:digest)"
         assert str(exc_info.value) == msg
 
+    @pytest.mark.parametrize("concurrency_limit", [1, 3])
     @pytest.mark.parametrize("use_hashes", [True, False])
     @pytest.mark.parametrize("have_vcs_raw_component", [True, False])
     @pytest.mark.parametrize("have_url_raw_component", [True, False])
@@ -3008,6 +3012,7 @@ class TestDownload:
         have_vcs_raw_component,
         have_url_raw_component,
         trusted_hosts,
+        concurrency_limit,
         tmp_path,
         caplog,
     ):
@@ -3086,7 +3091,9 @@ class TestDownload:
 
         mock_request_bundle_dir.return_value = mock_bundle_dir
         mock_get_config.return_value = mock.Mock(
-            cachito_nexus_pypi_proxy_url=proxy_url, cachito_nexus_pip_raw_repo_name=raw_repo
+            cachito_nexus_pypi_proxy_url=proxy_url,
+            cachito_nexus_pip_raw_repo_name=raw_repo,
+            cachito_pip_concurrency_limit=concurrency_limit,
         )
         mock_get_nexus_creds.return_value = ("username", "password")
         mock_pypi_download.return_value = pypi_info
@@ -3137,7 +3144,7 @@ class TestDownload:
             # Hashes for URL dependencies should be verified no matter what
             verify_checksum_calls = [verify_url_checksum_call]
 
-        mock_verify_checksum.assert_has_calls(verify_checksum_calls)
+        mock_verify_checksum.assert_has_calls(verify_checksum_calls, any_order=True)
         assert mock_verify_checksum.call_count == len(verify_checksum_calls)
 
         if use_hashes:
@@ -3256,6 +3263,65 @@ class TestDownload:
         assert log_msg in caplog.text
         mock_upload.assert_called_once_with(name, "pypi", path, to_nexus_hoster=False)
 
+    @mock.patch("cachito.workers.pkg_managers.pip.RequestBundleDir")
+    @mock.patch("cachito.workers.pkg_managers.pip.get_worker_config")
+    @mock.patch("cachito.workers.pkg_managers.pip.nexus.get_nexus_hoster_credentials")
+    @mock.patch("cachito.workers.pkg_managers.pip._download_vcs_package")
+    @mock.patch("cachito.workers.pkg_managers.pip.upload_raw_package")
+    def test_download_dependencies_same_vcs_package_in_subpaths(
+        self,
+        mock_upload_raw_package,
+        mock_vcs_download,
+        mock_get_nexus_creds,
+        mock_get_config,
+        mock_request_bundle_dir,
+        tmp_path,
+    ):
+        mock_bundle_dir = MockBundleDir(tmp_path)
+        mock_request_bundle_dir.return_value = mock_bundle_dir
+        mock_get_config.return_value.cachito_pip_concurrency_limit = 1
+        mock_get_nexus_creds.return_value = ("username", "password")
+
+        lock = threading.Lock()
+        running = 0
+        overlapped = False
+
+        def download_vcs_package(req, *args):
+            nonlocal running, overlapped
+            with lock:
+                overlapped = overlapped or running > 0
+                running += 1
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            # The first subpath uploads the archive, the second one finds it in Nexus
+            return {
+                "package": "eggs",
+                "path": mock_bundle_dir.pip_deps_dir / "eggs.tar.gz",
+                "raw_component_name": f"/eggs/eggs-external-gitcommit-{GIT_REF}.tar.gz",
+                "have_raw_component": mock_upload_raw_package.called,
+            }
+
+        mock_vcs_download.side_effect = download_vcs_package
+
+        # The subpaths of a request are processed concurrently and share the locks
+        raw_component_locks = {}
+
+        def download_subpath(subpath):
+            git_url = f"https://github.com/spam/eggs@{GIT_REF}"
+            vcs_req = self.mock_requirement(
+                "eggs", "vcs", download_line=f"eggs @ git+{git_url}", url=f"git+{git_url}"
+            )
+            req_file = self.mock_requirements_file(requirements=[vcs_req])
+            return pip.download_dependencies(1, req_file, raw_component_locks)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            downloads = list(executor.map(download_subpath, ["foo", "bar"]))
+
+        assert [[download["package"] for download in d] for d in downloads] == [["eggs"], ["eggs"]]
+        assert not overlapped
+        mock_upload_raw_package.assert_called_once()
+
     @mock.patch("cachito.workers.pkg_managers.pip.RequestBundleDir")
     @mock.patch("cachito.workers.pkg_managers.pip.nexus.get_nexus_hoster_credentials")
     @mock.patch("cachito.workers.pkg_managers.pip._download_pypi_package")
@@ -1,5 +1,8 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import concurrent.futures
 import logging
+import threading
+import time
 from pathlib import Path
 from textwrap import dedent
 from unittest import mock
@@ -520,10 +523,10 @@ class TestDownload:
     @mock.patch("cachito.workers.pkg_managers.rubygems.nexus.get_raw_component_asset_url")
     @mock.patch("cachito.workers.pkg_managers.general.download_binary_file")
     @mock.patch("cachito.workers.pkg_managers.rubygems.Git")
-    @mock.patch("shutil.copy")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.copy_file")
     def test_download_git_package(
         self,
-        mock_shutil_copy,
+        mock_copy_file,
         mock_git,
         mock_download_file,
         mock_get_component_url,
@@ -571,14 +574,15 @@ class TestDownload:
                 raw_url, download_info["path"], auth=("username", "password")
             )
             mock_git.assert_not_called()
-            mock_shutil_copy.assert_not_called()
+            mock_copy_file.assert_not_called()
         else:
             assert "Raw component not found, will fetch from git" in caplog.text
             mock_download_file.assert_not_called()
             mock_git.assert_called_once_with("https://github.com/org/json.git", GIT_REF)
             mock_git.return_value.fetch_source.assert_called_once_with(gitsubmodule=False)
-            mock_shutil_copy.assert_called_once_with(git_archive_path, download_info["path"])
+            mock_copy_file.assert_called_once_with(git_archive_path, download_info["path"])
 
+    @pytest.mark.parametrize("concurrency_limit", [1, 3])
     @pytest.mark.parametrize("have_raw_component", [True, False])
     @mock.patch("cachito.workers.pkg_managers.rubygems.RequestBundleDir")
     @mock.patch("cachito.workers.pkg_managers.rubygems.get_worker_config")
@@ -597,6 +601,7 @@ class TestDownload:
         mock_get_config,
         mock_request_bundle_dir,
         have_raw_component,
+        concurrency_limit,
         tmp_path,
         caplog,
     ):
@@ -640,6 +645,7 @@ class TestDownload:
         mock_get_config.return_value = mock.Mock(
             cachito_nexus_rubygems_proxy_url=proxy_url,
             cachito_nexus_rubygems_raw_repo_name=raw_repo,
+            cachito_rubygems_concurrency_limit=concurrency_limit,
         )
 
         mock_get_nexus_creds.return_value = ("username", "password")
@@ -707,6 +713,115 @@ class TestDownload:
         # </check basic logging output>
         # </verify>
 
+    @mock.patch("cachito.workers.pkg_managers.rubygems.RequestBundleDir")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.get_worker_config")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.nexus.get_nexus_hoster_credentials")
+    @mock.patch("cachito.workers.pkg_managers.rubygems._download_git_package")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.upload_raw_package")
+    def test_download_dependencies_same_git_repo(
+        self,
+        mock_upload_raw,
+        mock_git_download,
+        mock_get_nexus_creds,
+        mock_get_config,
+        mock_rbd,
+        tmp_path,
+    ):
+        git_url = "https://github.com/baz/bar.git"
+        dependencies = [
+            GemMetadata("bar", GIT_REF, "GIT", git_url),
+            GemMetadata("bar-core", GIT_REF, "GIT", git_url),
+        ]
+        mock_bundle_dir = MockBundleDir(tmp_path)
+        mock_rbd.return_value = mock_bundle_dir
+        mock_get_config.return_value.cachito_rubygems_concurrency_limit = 2
+        mock_get_nexus_creds.return_value = ("username", "password")
+
+        lock = threading.Lock()
+        running = []
+        overlapped = False
+
+        def download_git_package(gem, *args):
+            nonlocal overlapped
+            with lock:
+                overlapped = overlapped or bool(running)
+                running.append(gem.name)
+            time.sleep(0.05)
+            with lock:
+                running.remove(gem.name)
+            # The first gem uploads the archive, the second one finds it in Nexus
+            return {
+                "name": gem.name,
+                "path": mock_bundle_dir.rubygems_deps_dir / "bar.tar.gz",
+                "raw_component_name": "/bar/bar.tar.gz",
+                "have_raw_component": mock_upload_raw.called,
+            }
+
+        mock_git_download.side_effect = download_git_package
+
+        downloads = rubygems.download_dependencies(1, dependencies, mock_bundle_dir.source_root_dir)
+
+        assert [download["name"] for download in downloads] == ["bar", "bar-core"]
+        assert not overlapped
+        mock_upload_raw.assert_called_once()
+
+    @mock.patch("cachito.workers.pkg_managers.rubygems.RequestBundleDir")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.get_worker_config")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.nexus.get_nexus_hoster_credentials")
+    @mock.patch("cachito.workers.pkg_managers.rubygems._download_git_package")
+    @mock.patch("cachito.workers.pkg_managers.rubygems.upload_raw_package")
+    def test_download_dependencies_same_git_repo_in_subpaths(
+        self,
+        mock_upload_raw,
+        mock_git_download,
+        mock_get_nexus_creds,
+        mock_get_config,
+        mock_rbd,
+        tmp_path,
+    ):
+        git_url = "https://github.com/baz/bar.git"
+        mock_bundle_dir = MockBundleDir(tmp_path)
+        mock_rbd.return_value = mock_bundle_dir
+        mock_get_config.return_value.cachito_rubygems_concurrency_limit = 1
+        mock_get_nexus_creds.return_value = ("username", "password")
+
+        lock = threading.Lock()
+        running = []
+        overlapped = False
+
+        def download_git_package(gem, *args):
+            nonlocal overlapped
+            with lock:
+                overlapped = overlapped or bool(running)
+                running.append(gem.name)
+            time.sleep(0.05)
+            with lock:
+                running.remove(gem.name)
+            return {
+                "name": gem.name,
+                "path": mock_bundle_dir.rubygems_deps_dir / "bar.tar.gz",
+                "raw_component_name": "/bar/bar.tar.gz",
+                "have_raw_component": mock_upload_raw.called,
+            }
+
+        mock_git_download.side_effect = download_git_package
+
+        # The subpaths of a request are processed concurrently and share the locks
+        git_locks = {}
+
+        def download_subpath(subpath):
+            dependencies = [GemMetadata(f"bar-{subpath}", GIT_REF, "GIT", git_url)]
+            return rubygems.download_dependencies(
+                1, dependencies, mock_bundle_dir.source_root_dir / subpath, git_locks
+            )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            downloads = list(executor.map(download_subpath, ["a", "b"]))
+
+        assert [[download["name"] for download in d] for d in downloads] == [["bar-a"], ["bar-b"]]
+        assert not overlapped
+        mock_upload_raw.assert_called_once()
+
 
 def test_get_path_package_info(tmp_path):
     bundle_dir = MockBundleDir(tmp_path)
@@ -273,7 +273,8 @@ def test_process_stale_archives_limit(
 
     _process_stale_archives(older_than, api_calls_per_second, delete=True, limit=limit)
     mock_get_stale.assert_called_once_with(older_than, api_calls_per_second)
-    assert mock_unlink.call_count == expected_deletions
+    # The archives are deleted along with their verification
+    assert mock_unlink.call_count == 2 * expected_deletions
 
 
 @mock.patch(
@@ -5,7 +5,6 @@ import re
 import subprocess
 import tarfile
 import zlib
-from datetime import datetime
 from pathlib import Path
 from unittest import mock
 
@@ -37,95 +36,64 @@ def test_repo_name():
 
 
 @pytest.mark.parametrize("gitsubmodule", [True, False])
-@mock.patch("tarfile.open")
 @mock.patch("tempfile.TemporaryDirectory")
-@mock.patch("tempfile.NamedTemporaryFile")
-@mock.patch("git.repo.Repo.clone_from")
-@mock.patch("cachito.workers.scm.run_cmd")
-@mock.patch("os.path.exists")
+@mock.patch("cachito.workers.scm.Git._create_archive")
+@mock.patch("cachito.workers.scm.Git._clone_from_mirror")
+@mock.patch("cachito.workers.scm.Git._update_mirror")
 @mock.patch("cachito.workers.scm.Git.update_git_submodules")
-@mock.patch("os.link")
-@mock.patch("os.fsync")
 def test_clone_and_archive(
-    mock_fsync,
-    mock_link,
     mock_ugs,
-    mock_exists,
-    mock_fsck,
-    mock_clone,
-    mock_temp_file,
+    mock_update_mirror,
+    mock_clone_from_mirror,
+    mock_create_archive,
     mock_temp_dir,
-    mock_tarfile_open,
     gitsubmodule,
 ):
-    # Mock the archive being created
-    mock_exists.return_value = True
-    mock_tarfile = mock.Mock()
-    mock_tarfile.getmembers.return_value = []
-    mock_tarfile_open.return_value.__enter__.return_value = mock_tarfile
-    # Mock the commit being returned from repo.commit(self.ref)
-    mock_commit = mock.Mock()
-    mock_clone.return_value.commit.return_value = mock_commit
     # Mock the tempfile.TemporaryDirectory context manager
     mock_temp_dir.return_value.__enter__.return_value = "/tmp/cachito-temp"
-    # Mock the tempfile.NamedTemporaryFile context manager
-    mock_temp_file.return_value.__enter__.return_value = mock.Mock(
-        name="/dev/null", fileno=lambda: -1
-    )
+    repo = mock_clone_from_mirror.return_value
 
-    git_obj = scm.Git(url, ref)
+    scm.Git(url, ref).clone_and_archive(gitsubmodule)
 
-    with mock.patch.object(git_obj.sources_dir, "archive_path", new=archive_path):
-        git_obj.clone_and_archive(gitsubmodule)
-
-    # Verify the tempfile.TemporaryDirectory context manager was used twice:
-    # once for _clone_and_archive and once for _verify_archive
-    assert mock_temp_dir.return_value.__enter__.call_count == 2
-    # Verify the repo was cloned and checked out properly
-    mock_clone.assert_called_once_with(
-        url,
-        "/tmp/cachito-temp/repo",
-        no_checkout=True,
-        filter="blob:none",
-        env={"GIT_TERMINAL_PROMPT": "0"},
-    )
-    assert mock_clone.return_value.head.reference == mock_commit
-    mock_clone.return_value.head.reset.assert_called_once_with(index=True, working_tree=True)
-    # Verfiy the archive was created
-    mock_tarfile.add.assert_called_once_with(mock_clone.return_value.working_dir, "app")
-    # Verify the archive was verified
-    mock_fsck.assert_called_once()
+    # Verify the mirror was updated and cloned
+    mock_update_mirror.assert_called_once_with()
+    mock_clone_from_mirror.assert_called_once_with("/tmp/cachito-temp/repo")
+    # Verify the repo was checked out properly
+    repo.commit.assert_called_once_with(ref)
+    assert repo.head.reference == repo.commit.return_value
+    repo.head.reset.assert_called_once_with(index=True, working_tree=True)
+    # Verify the remote is the original repository and the repository was garbage collected
+    repo.remote.return_value.set_url.assert_called_once_with(url)
+    repo.git.gc.assert_called_once_with("--prune=now")
+    # Verify the archive was created
+    mock_create_archive.assert_called_once_with(repo.working_dir)
     # Verify the update_git_submodules was called correctly(if applicable)
     if gitsubmodule:
-        mock_ugs.assert_called_once_with(mock_clone.return_value)
+        mock_ugs.assert_called_once_with(repo)
     else:
         mock_ugs.assert_not_called()
 
-    mock_clone.return_value.git.gc.assert_called_once_with("--prune=now")
-
 
-@pytest.mark.parametrize("gitsubmodule", [True, False])
-@mock.patch("tempfile.TemporaryDirectory")
-@mock.patch("git.repo.Repo.clone_from")
-def test_clone_and_archive_clone_failed(mock_git_clone, mock_temp_dir, gitsubmodule):
-    # Mock the tempfile.TemporaryDirectory context manager
-    mock_temp_dir.return_value.__enter__.return_value = "/tmp/cachito-temp"
-    # Mock the git clone call
-    mock_git_clone.side_effect = git.GitCommandError("some error", 1)
-
-    git_obj = scm.Git(url, ref)
-    with pytest.raises(RepositoryAccessError, match="Failed cloning the Git repository"):
-        git_obj.clone_and_archive(gitsubmodule)
+def test_update_mirror_failed(tmp_path: Path) -> None:
+    git_obj = scm.Git(f"file://{tmp_path}/missing", ref)
+    with pytest.raises(
+        RepositoryAccessError, match="Failed to fetch from the remote Git repository"
+    ):
+        git_obj._update_mirror()
+    # The empty mirror is kept, the next request fetches to it again
+    assert git.Repo(git_obj.sources_dir.mirror_path).bare
 
 
 @pytest.mark.parametrize("gitsubmodule", [True, False])
-@mock.patch("tempfile.TemporaryDirectory")
-@mock.patch("git.repo.Repo.clone_from")
-def test_clone_and_archive_checkout_failed(mock_git_clone, mock_temp_dir, gitsubmodule):
-    # Mock the tempfile.TemporaryDirectory context manager
-    mock_temp_dir.return_value.__enter__.return_value = "/tmp/cachito-temp"
+@mock.patch("cachito.workers.scm.Git._clone_from_mirror")
+@mock.patch("cachito.workers.scm.Git._update_mirror")
+def test_clone_and_archive_checkout_failed(
+    mock_update_mirror, mock_clone_from_mirror, gitsubmodule
+):
     # Mock the git calls
-    mock_git_clone.return_value.commit.side_effect = git.GitCommandError("commit is invalid", 1)
+    mock_clone_from_mirror.return_value.commit.side_effect = git.GitCommandError(
+        "commit is invalid", 1
+    )
 
     git_obj = scm.Git(url, ref)
     expected = (
@@ -139,13 +107,14 @@ def test_clone_and_archive_checkout_failed(mock_git_clone, mock_temp_dir, gitsub
 
 @pytest.mark.parametrize("gitsubmodule", [True, False])
 @mock.patch("cachito.workers.scm.Git._verify_archive")
-def test_fetch_source_archive_exists(mock_verify, gitsubmodule):
+@mock.patch("cachito.workers.scm.Git.clone_and_archive")
+def test_fetch_source_archive_exists(mock_clone_and_archive, mock_verify, gitsubmodule):
     scm_git = scm.Git(url, ref)
 
     with mock.patch("pathlib.Path.exists", return_value=True):
-        with mock.patch("pathlib.Path.glob") as glob:
-            scm_git.fetch_source(gitsubmodule)
-            glob.assert_not_called()
+        scm_git.fetch_source(gitsubmodule)
+
+    mock_clone_and_archive.assert_not_called()
 
 
 @pytest.mark.parametrize("gitsubmodule", [True, False])
@@ -159,158 +128,16 @@ def test_fetch_source_clone_if_no_archive_yet(mock_clone_and_archive, gitsubmodu
             scm_git_submodule = scm.Git(url, f"{ref}-with-submodules")
             mock_scr.return_value = scm_git_submodule.sources_dir
             with po(scm_git_submodule.sources_dir.archive_path, "exists", return_value=False):
-                with po(scm_git_submodule.sources_dir.package_dir, "glob", return_value=[]):
-                    scm_git_submodule.fetch_source(gitsubmodule)
+                scm_git_submodule.fetch_source(gitsubmodule)
     else:
         with po(scm_git.sources_dir.archive_path, "exists", return_value=False):
-            with po(scm_git.sources_dir.package_dir, "glob", return_value=[]):
-                scm_git.fetch_source(gitsubmodule)
+            scm_git.fetch_source(gitsubmodule)
 
     mock_clone_and_archive.assert_called_once_with(gitsubmodule=gitsubmodule)
 
 
-@pytest.mark.parametrize("gitsubmodule", [True, False])
-@mock.patch("os.path.getctime")
-@mock.patch("cachito.workers.scm.Git.update_and_archive")
-def test_fetch_source_by_pull(mock_update_and_archive, mock_getctime, gitsubmodule):
-    mock_getctime.side_effect = [
-        datetime(2020, 3, 1, 20, 0, 0).timestamp(),
-        datetime(2020, 3, 4, 10, 13, 30).timestamp(),
-        datetime(2020, 3, 6, 10, 13, 30).timestamp(),
-    ]
-
-    scm_git = scm.Git(url, ref)
-
-    po = mock.patch.object
-    if gitsubmodule:
-        with mock.patch("cachito.workers.scm.SourcesDir") as mock_scr:
-            scm_git_submodule = scm.Git(url, f"{ref}-with-submodules")
-            mock_scr.return_value = scm_git_submodule.sources_dir
-            with po(scm_git_submodule.sources_dir.archive_path, "exists", return_value=False):
-                with po(
-                    scm_git_submodule.sources_dir.package_dir,
-                    "glob",
-                    return_value=[
-                        "29eh2a.tar.gz",
-                        "a8c2d2.tar.gz",
-                        "a8c2d2-with-submodules.tar.gz",
-                    ],
-                ):
-                    scm_git_submodule.fetch_source(gitsubmodule)
-    else:
-        with po(scm_git.sources_dir.archive_path, "exists", return_value=False):
-            with po(
-                scm_git.sources_dir.package_dir,
-                "glob",
-                return_value=["29eh2a.tar.gz", "a8c2d2.tar.gz", "a8c2d2-with-submodules.tar.gz"],
-            ):
-                scm_git.fetch_source(gitsubmodule)
-    mock_update_and_archive.assert_called_once_with("a8c2d2.tar.gz", gitsubmodule=gitsubmodule)
-
-
-@pytest.mark.parametrize(
-    "gitsubmodule, all_corrupt", ((True, True), (True, False), (False, True), (False, False))
-)
-@mock.patch("os.path.getctime")
-@mock.patch("cachito.workers.scm.Git.update_and_archive")
-@mock.patch("cachito.workers.scm.Git.clone_and_archive")
-def test_fetch_source_by_pull_corrupt_archive(
-    mock_clone_and_archive, mock_update_and_archive, mock_getctime, all_corrupt, gitsubmodule
-):
-    if all_corrupt:
-        mock_update_and_archive.side_effect = [git.exc.InvalidGitRepositoryError, OSError]
-    else:
-        mock_update_and_archive.side_effect = [tarfile.ExtractError, None]
-
-    mock_getctime.side_effect = [
-        datetime(2020, 3, 1, 20, 0, 0).timestamp(),
-        datetime(2020, 3, 4, 10, 13, 30).timestamp(),
-        datetime(2020, 3, 1, 20, 0, 0).timestamp(),
-    ]
-
-    scm_git = scm.Git(url, ref)
-
-    po = mock.patch.object
-    if gitsubmodule:
-        with mock.patch("cachito.workers.scm.SourcesDir") as mock_scr:
-            scm_git_submodule = scm.Git(url, f"{ref}-with-submodules")
-            mock_scr.return_value = scm_git_submodule.sources_dir
-            with po(scm_git_submodule.sources_dir.archive_path, "exists", return_value=False):
-                with po(
-                    scm_git_submodule.sources_dir.package_dir,
-                    "glob",
-                    return_value=["29eh2a.tar.gz", "a8c2d2.tar.gz"],
-                ):
-                    scm_git_submodule.fetch_source(gitsubmodule)
-    else:
-        with po(scm_git.sources_dir.archive_path, "exists", return_value=False):
-            with po(
-                scm_git.sources_dir.package_dir,
-                "glob",
-                return_value=["29eh2a.tar.gz", "a8c2d2.tar.gz"],
-            ):
-                scm_git.fetch_source(gitsubmodule)
-
-    assert mock_update_and_archive.call_count == 2
-    calls = [
-        mock.call("a8c2d2.tar.gz", gitsubmodule=gitsubmodule),
-        mock.call("29eh2a.tar.gz", gitsubmodule=gitsubmodule),
-    ]
-    mock_update_and_archive.assert_has_calls(calls)
-    if all_corrupt:
-        mock_clone_and_archive.assert_called_once_with(gitsubmodule=gitsubmodule)
-    else:
-        mock_clone_and_archive.assert_not_called()
-
-
-@pytest.mark.parametrize("gitsubmodule", [True, False])
-@mock.patch("tarfile.open")
-@mock.patch("tempfile.TemporaryDirectory")
-@mock.patch("git.Repo")
-@mock.patch("cachito.workers.scm.run_cmd")
-@mock.patch("os.path.exists")
-@mock.patch("cachito.workers.scm.Git.update_git_submodules")
-def test_update_and_archive(
-    mock_ugs, mock_exists, mock_fsck, mock_repo, mock_temp_dir, mock_tarfile_open, gitsubmodule
-):
-    # Mock the archive being created
-    mock_exists.return_value = True
-    mock_tarfile = mock.Mock()
-    mock_tarfile.getmembers.return_value = []
-    mock_tarfile_open.return_value.__enter__.return_value = mock_tarfile
-
-    # Mock the tempfile.TemporaryDirectory context manager
-    mock_temp_dir.return_value.__enter__.return_value = "/tmp/cachito-temp"
-
-    # Test does not really extract this archive file. The filename could be arbitrary.
-    scm.Git(url, ref).update_and_archive("/tmp/1234567.tar.gz", gitsubmodule)
-
-    # Verify the tempfile.TemporaryDirectory context manager was used twice:
-    # once for _update_and_archive and once for _verify_archive
-    assert mock_temp_dir.return_value.__enter__.call_count == 2
-
-    repo = mock_repo.return_value
-    # Verify the changes are pulled.
-    repo.remote.return_value.fetch.assert_called_once_with(refspec=ref, tags=True, force=True)
-    # Verify the repo is reset to specific ref
-    repo.commit.assert_called_once_with(ref)
-    assert repo.commit.return_value == repo.head.reference
-    repo.head.reset.assert_called_once_with(index=True, working_tree=True)
-
-    mock_tarfile.add.assert_called_once_with(mock_repo.return_value.working_dir, "app")
-    # Verify the archive was verified
-    mock_fsck.assert_called_once()
-    # Verify the update_git_submodules was called correctly(if applicable)
-    if gitsubmodule:
-        mock_ugs.assert_called_once_with(repo)
-    else:
-        mock_ugs.assert_not_called()
-
-    mock_repo.return_value.git.gc.assert_called_once_with("--prune=now")
-
-
-def test_update_and_archive_update_tags(tmp_path: Path, fake_repo: tuple[str, str]) -> None:
-    """Tests that source archives created from existing source archives will have updated tags."""
+def test_clone_and_archive_reuses_mirror(tmp_path: Path, fake_repo: tuple[str, str]) -> None:
+    """Tests that source archives created from an existing mirror will have updated tags."""
     # Add a 1.0.0 tag to the first commit
     source_repo_dir, _ = fake_repo
     source_repo = git.Repo(source_repo_dir)
@@ -318,53 +145,140 @@ def test_update_and_archive_update_tags(tmp_path: Path, fake_repo: tuple[str, st
     source_repo.create_tag("1.0.0", first_commit)
 
     # Create a source archive from the source repo and first commit ref
-    git_obj = scm.Git(f"file://{source_repo_dir}", first_commit)
+    git_obj = scm.Git(f"file://{source_repo_dir}", first_commit.hexsha)
     git_obj.clone_and_archive()
-    first_archive_path = git_obj.sources_dir.archive_path
+    assert git_obj.sources_dir.mirror_path.is_dir()
 
     # Add a 2.0.0 tag to the second commit in the source repo
     source_repo.create_tag("2.0.0", second_commit)
 
     # Create a source archive from the source repo and second commit ref
-    # Since we already have an initial source archive, use update_and_archive
+    # Since the mirror already exists, it is only updated
     git_obj = scm.Git(f"file://{source_repo_dir}", second_commit.hexsha)
-    git_obj.update_and_archive(first_archive_path)
-    second_archive_path = git_obj.sources_dir.archive_path
+    with mock.patch.object(scm.Git, "_create_mirror") as mock_create_mirror:
+        git_obj.clone_and_archive()
+    mock_create_mirror.assert_not_called()
 
     # Extract the second source archive
     extracted_archive_dir = tmp_path / "extracted"
-    with tarfile.open(second_archive_path, mode="r:gz") as tar:
+    with tarfile.open(git_obj.sources_dir.archive_path, mode="r:gz") as tar:
         safe_extract(tar, extracted_archive_dir)
 
     # Verify that the 2.0.0 tag is in the "updated" source archive
     extracted_archive_repo = git.Repo(extracted_archive_dir / "app")
     assert extracted_archive_repo.head.commit.hexsha == second_commit.hexsha
     assert "2.0.0" in [tag.name for tag in extracted_archive_repo.tags]
+    # The remote of the source archive is the original repository, not the mirror
+    assert extracted_archive_repo.remote().url == f"file://{source_repo_dir}"
+
+
+def test_clone_and_archive_from_mirror(tmp_path: Path, fake_repo: tuple[str, str]) -> None:
+    repo_dir, _ = fake_repo
+    source_repo = git.Repo(repo_dir)
+    second_commit, first_commit = list(source_repo.iter_commits("master", max_count=2))
+    # Add a commit which is not part of a branch and a pull request reference
+    source_repo.git.checkout("--detach")
+    for file_name in ("readme.rst", "main.py"):
+        Path(repo_dir, file_name).write_text(f"{file_name} content")
+    source_repo.index.add(["readme.rst", "main.py"])
+    source_repo.index.commit("Detached commit")
+    detached_commit = source_repo.head.commit
+    source_repo.git.update_ref("refs/pull/1/head", detached_commit.hexsha)
+    source_repo.git.checkout("master")
+    source_repo.git.update_ref("-d", "refs/pull/1/head")
+    source_repo.git.update_ref("refs/pull/2/head", first_commit.hexsha)
+    source_repo.create_tag("1.0.0", first_commit)
+    git_obj = scm.Git(f"file://{repo_dir}", detached_commit.hexsha)
+
+    git_obj.clone_and_archive()
+
+    # The mirror only has the branches and the tags, and all their objects
+    mirror = git.Repo(git_obj.sources_dir.mirror_path)
+    assert mirror.git.for_each_ref("--format=%(refname)").splitlines() == [
+        "refs/heads/master",
+        "refs/tags/1.0.0",
+    ]
+    missing = mirror.git.rev_list("--all", "--objects", "--missing=print")
+    assert not [line for line in missing.splitlines() if line.startswith("?")]
+
+    # The archived repository is a blob-less clone of the original repository
+    with tarfile.open(git_obj.sources_dir.archive_path, mode="r:gz") as tar:
+        safe_extract(tar, tmp_path)
+    archived_repo = git.Repo(tmp_path / "app")
+    assert archived_repo.head.commit.hexsha == detached_commit.hexsha
+    assert archived_repo.remote().url == f"file://{repo_dir}"
+    assert archived_repo.config_reader().get_value('remote "origin"', "partialclonefilter") == (
+        "blob:none"
+    )
+    assert [tag.name for tag in archived_repo.tags] == ["1.0.0"]
+    # Only the blobs of the checked out commit are included, in a single pack
+    missing = archived_repo.git.rev_list(
+        "--objects", "--missing=print", first_commit.hexsha, "--"
+    ).splitlines()
+    assert [line for line in missing if line.startswith("?")]
+    assert archived_repo.git.count_objects("-v").splitlines()[0] == "count: 0"
+
+
+@pytest.mark.parametrize("clone_kwargs", [{"filter": "blob:none"}, {}])
+def test_update_mirror_previous_clone(clone_kwargs, fake_repo, caplog):
+    repo_dir, _ = fake_repo
+    git_obj = scm.Git(f"file://{repo_dir}", "master")
+    mirror_path = git_obj.sources_dir.mirror_path
+    git.Repo.clone_from(f"file://{repo_dir}", mirror_path, mirror=True, **clone_kwargs)
+
+    git_obj._update_mirror()
+
+    assert f'The mirror at "{mirror_path}" is invalid and will be re-created' in caplog.text
+    config = git.Repo(mirror_path).config_reader()
+    assert not config.has_option('remote "origin"', "promisor")
+    assert not config.has_option('remote "origin"', "mirror")
+
+
+def test_update_mirror_invalid(fake_repo, caplog):
+    repo_dir, _ = fake_repo
+    git_obj = scm.Git(f"file://{repo_dir}", "master")
+    git_obj.sources_dir.mirror_path.mkdir()
+
+    git_obj._update_mirror()
+
+    mirror_path = git_obj.sources_dir.mirror_path
+    assert f'The mirror at "{mirror_path}" is invalid and will be re-created' in caplog.text
+    assert git.Repo(mirror_path).bare
 
 
-@pytest.mark.parametrize("gitsubmodule", [True, False])
-@mock.patch("tarfile.open")
 @mock.patch("git.Repo")
-def test_update_and_archive_pull_error(mock_repo, mock_tarfile_open, gitsubmodule):
+def test_update_mirror_fetch_error(mock_repo):
     repo = mock_repo.return_value
+    repo.config_reader.return_value.has_option.return_value = False
+    repo.remote.return_value.url = url
     repo.remote.return_value.fetch.side_effect = OSError
 
     with pytest.raises(
         RepositoryAccessError, match="Failed to fetch from the remote Git repository"
     ):
-        scm.Git(url, ref).update_and_archive("/tmp/1234567.tar.gz", gitsubmodule)
+        scm.Git(url, ref)._update_mirror()
+
+    repo.remote.return_value.set_url.assert_not_called()
+    repo.remote.return_value.fetch.assert_called_once_with(
+        refspec=["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*", ref],
+        force=True,
+        prune=True,
+    )
 
 
 def test_create_and_verify_archive(fake_repo, caplog):
     repo_dir, _ = fake_repo
     git_obj = scm.Git(f"file://{repo_dir}", "master")
+    verify_repo_log_msg = f"Verifying the Git repository at {repo_dir}"
     verify_log_msg = f"Verifying the archive at {git_obj.sources_dir.archive_path}"
     already_created_log_msg = (
         f"{git_obj.sources_dir.archive_path} was created while this task was running. "
         "Will proceed with that archive"
     )
     git_obj._create_archive(repo_dir)
-    assert verify_log_msg in caplog.text
+    # The new archive isn't extracted to be verified
+    assert verify_repo_log_msg in caplog.text
+    assert verify_log_msg not in caplog.text
     assert already_created_log_msg not in caplog.text
     caplog.clear()
     # create archive again to simulate race condition. This should not generate errors
@@ -377,16 +291,8 @@ def test_clone_and_verify_archive(fake_repo, caplog):
     repo_dir, _ = fake_repo
     git_obj = scm.Git(f"file://{repo_dir}", "master")
     git_obj.clone_and_archive()
-    assert f"Verifying the archive at {git_obj.sources_dir.archive_path}" in caplog.text
-
-
-def test_update_and_verify_archive(fake_repo, caplog):
-    repo_dir, _ = fake_repo
-    git_obj = scm.Git(f"file://{repo_dir}", "master")
-    git_obj.clone_and_archive()
-    caplog.clear()
-    git_obj.update_and_archive(git_obj.sources_dir.archive_path)
-    assert f"Verifying the archive at {git_obj.sources_dir.archive_path}" in caplog.text
+    assert "Verifying the Git repository at " in caplog.text
+    assert git_obj.sources_dir.archive_path.with_name("master.tar.gz.verified").exists()
 
 
 @mock.patch("tarfile.is_tarfile")
@@ -400,7 +306,7 @@ def test_verify_invalid_archive(mock_istar, fake_repo):
 
 
 @pytest.mark.parametrize("exception_type", [OSError, zlib.error, tarfile.ExtractError])
-@mock.patch("tarfile.TarFile.extractall")
+@mock.patch("tarfile.TarFile.extract")
 def test_verify_corrupted_archive(mock_extract, fake_repo, exception_type, tmp_path):
     mock_extract.side_effect = exception_type("Something wrong with the tar archive")
     repo_dir, _ = fake_repo
@@ -410,7 +316,7 @@ def test_verify_corrupted_archive(mock_extract, fake_repo, exception_type, tmp_p
         f.write("stub\n")
 
     with tarfile.open(git_obj.sources_dir.archive_path, "w:gz") as tar:
-        tar.add(stub_file)
+        tar.add(stub_file, "app/.git/HEAD")
 
     err_msg = f"Invalid archive at {git_obj.sources_dir.archive_path}"
     with pytest.raises(SubprocessCallError, match=err_msg):
@@ -455,17 +361,62 @@ def test_verify_invalid_repo(fake_repo, tmp_path):
         git_obj._verify_archive()
 
 
+@mock.patch("cachito.workers.scm.run_cmd")
+def test_verify_archive_only_extracts_git_dir(mock_fsck, fake_repo):
+    repo_dir, _ = fake_repo
+    git_obj = scm.Git(f"file://{repo_dir}", "master")
+    with tarfile.open(git_obj.sources_dir.archive_path, mode="w:gz") as bundle_archive:
+        bundle_archive.add(repo_dir, "app")
+
+    def check_extracted(cmd, params):
+        extracted = os.listdir(os.path.join(params["cwd"], "app"))
+        assert extracted == [".git"]
+        assert cmd == ["git", "--git-dir", os.path.join(params["cwd"], "app", ".git"), "fsck"]
+
+    mock_fsck.side_effect = check_extracted
+    git_obj._verify_archive()
+    mock_fsck.assert_called_once()
+
+
+def test_verify_archive_is_cached(fake_repo, caplog):
+    repo_dir, _ = fake_repo
+    git_obj = scm.Git(f"file://{repo_dir}", "master")
+    git_obj._create_archive(repo_dir)
+    archive_path = git_obj.sources_dir.archive_path
+    assert archive_path.with_name(f"{archive_path.name}.verified").exists()
+
+    # The archive didn't change, it isn't verified again
+    with mock.patch("cachito.workers.scm.hash_file") as mock_hash_file:
+        git_obj._verify_archive()
+    mock_hash_file.assert_not_called()
+    assert f"The archive at {archive_path} was already verified" in caplog.text
+
+    # The archive was modified but its content is the same, git fsck isn't run again
+    os.utime(archive_path)
+    with mock.patch("cachito.workers.scm.run_cmd") as mock_fsck:
+        git_obj._verify_archive()
+    mock_fsck.assert_not_called()
+    assert f"The archive at {archive_path} is unchanged" in caplog.text
+
+    # The archive was replaced, git fsck is run again
+    with tarfile.open(archive_path, mode="w:gz") as bundle_archive:
+        bundle_archive.add(os.path.join(repo_dir, "readme.rst"), "app/readme.rst")
+    with pytest.raises(SubprocessCallError, match=f"Invalid archive at {archive_path}"):
+        git_obj._verify_archive()
+
+
 def test_create_archive_verify_fails(fake_repo, caplog):
     repo_dir, _ = fake_repo
     git_obj = scm.Git(f"file://{repo_dir}", "master")
     # substitute the archive with a broken git repository
     os.unlink(os.path.join(repo_dir, ".git", "HEAD"))
-    err_msg = f"Invalid archive at {git_obj.sources_dir.archive_path}"
+    err_msg = f"Invalid Git repository for {git_obj.sources_dir.archive_path}"
     with pytest.raises(SubprocessCallError, match=err_msg):
         git_obj._create_archive(repo_dir)
     # verify the archive was not created
-    assert f"Removing invalid archive at {git_obj.sources_dir.archive_path}" in caplog.text
+    assert f"error when verifying the Git repository at {repo_dir}" in caplog.text
     assert not os.path.exists(git_obj.sources_dir.archive_path)
+    assert not os.path.exists(f"{git_obj.sources_dir.archive_path}.verified")
 
 
 @pytest.mark.parametrize("gitsubmodule", [True, False])
@@ -480,17 +431,13 @@ def test_fetch_source_invalid_archive_exists(mock_clone, mock_verify, caplog, gi
             scm_git_submodule = scm.Git(url, f"{ref}-with-submodules")
             mock_scr.return_value = scm_git_submodule.sources_dir
             with po(scm_git_submodule.sources_dir.archive_path, "exists", return_value=True):
-                with po(scm_git_submodule.sources_dir.package_dir, "glob") as glob:
-                    scm_git_submodule.fetch_source(gitsubmodule)
-        glob.assert_called_once()
+                scm_git_submodule.fetch_source(gitsubmodule)
         msg = f'The archive at "{scm_git_submodule.sources_dir.archive_path}" is '
         "invalid and will be re-created"
         assert msg in caplog.text
     else:
         with po(scm_git.sources_dir.archive_path, "exists", return_value=True):
-            with po(scm_git.sources_dir.package_dir, "glob") as glob:
-                scm_git.fetch_source(gitsubmodule)
-        glob.assert_called_once()
+            scm_git.fetch_source(gitsubmodule)
         msg = (
             f'The archive at "{scm_git.sources_dir.archive_path}" is invalid and will be re-created'
         )
@@ -518,3 +465,38 @@ def test_update_git_submodules_failed(mock_git_submodule_update: mock.Mock, mock
     git_obj = scm.Git(url, ref)
     with pytest.raises(SubprocessCallError, match=expected):
         git_obj.update_git_submodules(repo)
+
+
+@mock.patch("cachito.workers.scm.get_worker_config")
+def test_prune_git_mirrors(mock_get_config: mock.Mock, tmp_path: Path) -> None:
+    mock_get_config.return_value.cachito_sources_dir = str(tmp_path)
+    mirrors = {}
+    for name in ("old", "recent", "locked"):
+        package_dir = tmp_path / "namespace" / name
+        (package_dir / "mirror.git").mkdir(parents=True)
+        (package_dir / "mirror.lock").touch()
+        mirrors[name] = package_dir / "mirror.git"
+    for name in ("old", "locked"):
+        os.utime(mirrors[name].with_name("mirror.lock"), (0, 0))
+
+    with open(mirrors["locked"].with_name("mirror.lock")) as lock_file:
+        scm.fcntl.flock(lock_file, scm.fcntl.LOCK_EX)
+        pruned = scm.prune_git_mirrors(3600)
+
+    assert pruned == [mirrors["old"]]
+    assert not mirrors["old"].exists()
+    assert mirrors["recent"].exists()
+    assert mirrors["locked"].exists()
+    # The lock files are kept
+    assert mirrors["old"].with_name("mirror.lock").exists()
+
+
+def test_clone_and_archive_marks_mirror_as_used(fake_repo: tuple[str, str]) -> None:
+    repo_dir, _ = fake_repo
+    git_obj = scm.Git(f"file://{repo_dir}", "master")
+    git_obj.sources_dir.mirror_lock_path.touch()
+    os.utime(git_obj.sources_dir.mirror_lock_path, (0, 0))
+
+    git_obj.clone_and_archive()
+
+    assert git_obj.sources_dir.mirror_lock_path.stat().st_mtime > 0
@@ -12,6 +12,7 @@ from unittest import mock
 import pytest
 from requests import Timeout
 
+from cachito.common.bundle_stream import BundleArchiveStream
 from cachito.common.checksum import hash_file
 from cachito.errors import (
     FileAccessError,
@@ -145,12 +146,22 @@ def test_failed_request_callback_unknown_error(mock_set_request_state):
 
 @pytest.mark.parametrize("deps_present", (True, False))
 @pytest.mark.parametrize("include_git_dir", (True, False))
+@pytest.mark.parametrize("bundle_writer", ("gzip", "parallel-gzip"))
 @mock.patch("cachito.workers.tasks.general.set_request_state")
+@mock.patch("cachito.workers.bundle_writer.get_worker_config")
 @mock.patch("cachito.workers.paths.get_worker_config")
 def test_create_bundle_archive(
-    mock_gwc, mock_set_request_state, deps_present, include_git_dir, tmpdir
+    mock_gwc,
+    mock_bundle_writer_gwc,
+    mock_set_request_state,
+    bundle_writer,
+    deps_present,
+    include_git_dir,
+    tmpdir,
 ):
     flags = ["include-git-dir"] if include_git_dir else []
+    mock_bundle_writer_gwc.return_value.cachito_bundle_writer = bundle_writer
+    mock_bundle_writer_gwc.return_value.cachito_bundle_compression_threads = 2
 
     # Make the bundles and sources dir configs point to under the pytest managed temp dir
     bundles_dir = tmpdir.mkdir("bundles")
@@ -249,21 +260,37 @@ GIT_SUBMODULE_PKG = {
 @pytest.mark.parametrize(
     "packages_data,expected",
     [
-        [{"gomod": {"packages": []}}, {"packages": []}],
-        [{"gomod": {"packages": [GOMOD_PKG1]}}, {"packages": [GOMOD_PKG1]}],
+        [{"gomod": {"packages": []}}, {"version": 2, "packages": [], "dependencies": []}],
+        [
+            {"gomod": {"packages": [GOMOD_PKG1]}},
+            {
+                "version": 2,
+                "packages": [GOMOD_PKG1],
+                "dependencies": GOMOD_PKG1["dependencies"],
+            },
+        ],
         [
             {"gomod": {"packages": [GOMOD_PKG1]}, "npm": {"packages": [NPM_PKG1]}},
-            {"packages": [GOMOD_PKG1, NPM_PKG1]},
+            {
+                "version": 2,
+                "packages": [GOMOD_PKG1, NPM_PKG1],
+                "dependencies": GOMOD_PKG1["dependencies"] + NPM_PKG1["dependencies"],
+            },
+        ],
+        [
+            {"git-submodule": {"packages": [GIT_SUBMODULE_PKG]}},
+            {"version": 2, "packages": [GIT_SUBMODULE_PKG], "dependencies": []},
         ],
-        [{"git-submodule": {"packages": [GIT_SUBMODULE_PKG]}}, {"packages": [GIT_SUBMODULE_PKG]}],
     ],
 )
 @mock.patch("cachito.workers.tasks.general.set_request_state")
+@mock.patch("cachito.workers.tasks.general.get_worker_config")
 @mock.patch("cachito.workers.paths.get_worker_config")
 def test_aggregate_packages_data(
-    get_worker_config, set_request_state, packages_data, expected, tmpdir
+    get_worker_config, mock_gwc, set_request_state, packages_data, expected, tmpdir
 ):
     get_worker_config.return_value.cachito_bundles_dir = tmpdir
+    mock_gwc.return_value.cachito_packages_data_indexed = False
 
     request_id = 1
     bundle_dir: RequestBundleDir = RequestBundleDir(request_id)
@@ -283,12 +310,42 @@ def test_aggregate_packages_data(
         assert expected == json.load(f)
 
 
+@mock.patch("cachito.workers.tasks.general.set_request_state")
+@mock.patch("cachito.workers.tasks.general.get_worker_config")
+@mock.patch("cachito.workers.paths.get_worker_config")
+def test_aggregate_packages_data_indexed(get_worker_config, mock_gwc, set_request_state, tmpdir):
+    get_worker_config.return_value.cachito_bundles_dir = tmpdir
+    mock_gwc.return_value.cachito_packages_data_indexed = True
+
+    bundle_dir: RequestBundleDir = RequestBundleDir(1)
+    for data_file, pkg in (
+        (bundle_dir.gomod_packages_data, GOMOD_PKG1),
+        (bundle_dir.npm_packages_data, NPM_PKG1),
+    ):
+        with open(data_file, "w", encoding="utf-8") as f:
+            json.dump({"packages": [pkg]}, f)
+
+    tasks.aggregate_packages_data(1, ["gomod", "npm"])
+
+    with open(bundle_dir.packages_data, "r", encoding="utf-8") as f:
+        assert json.load(f) == {
+            "version": 3,
+            "packages": [
+                {**GOMOD_PKG1, "dependencies": [0]},
+                {**NPM_PKG1, "dependencies": [1]},
+            ],
+            "dependencies": GOMOD_PKG1["dependencies"] + NPM_PKG1["dependencies"],
+        }
+
+
 @mock.patch("cachito.workers.tasks.general.get_request")
 @mock.patch("cachito.workers.tasks.general.create_bundle_archive")
 @mock.patch("cachito.workers.tasks.general.aggregate_packages_data")
 @mock.patch("cachito.workers.tasks.general.set_packages_and_deps_counts")
 @mock.patch("cachito.workers.tasks.general.save_bundle_archive_checksum")
+@mock.patch("cachito.workers.tasks.general.hash_file")
 def test_process_fetched_sources(
+    mock_hash_file,
     mock_save_bundle_archive_checksum,
     mock_set_counts,
     mock_aggregate_data,
@@ -305,16 +362,144 @@ def test_process_fetched_sources(
     }
 
     mock_aggregate_data.return_value = mock.Mock(packages=[pkg], all_dependencies=[pkg, pkg])
+    mock_hash_file.return_value.hexdigest.return_value = "abc"
 
-    tasks.process_fetched_sources(42)
+    assert tasks.process_fetched_sources(42) == (1, 2, "abc")
 
     mock_get_request.assert_called_once_with(42)
-    mock_create_archive.assert_called_once_with(42, ["some-flag"])
+    mock_create_archive.assert_called_once_with(42, ["some-flag"], None)
     mock_save_bundle_archive_checksum.assert_called_once_with(42)
     mock_aggregate_data.assert_called_once_with(42, ["pip"])
     mock_set_counts.assert_called_once_with(42, 1, 2)
 
 
+@pytest.mark.parametrize(
+    "latest_request, expected_previous_id",
+    [
+        ({"id": 41}, 41),
+        (None, None),
+        (NetworkError("Failed to get the latest complete request"), None),
+    ],
+)
+@mock.patch("cachito.workers.tasks.general.get_worker_config")
+@mock.patch("cachito.workers.tasks.general.get_latest_complete_request")
+@mock.patch("cachito.workers.tasks.general.get_request")
+@mock.patch("cachito.workers.tasks.general.create_bundle_archive")
+@mock.patch("cachito.workers.tasks.general.aggregate_packages_data")
+@mock.patch("cachito.workers.tasks.general.set_packages_and_deps_counts")
+@mock.patch("cachito.workers.tasks.general.save_bundle_archive_checksum")
+@mock.patch("cachito.workers.tasks.general.hash_file")
+def test_process_fetched_sources_incremental(
+    mock_hash_file,
+    mock_save_bundle_archive_checksum,
+    mock_set_counts,
+    mock_aggregate_data,
+    mock_create_archive,
+    mock_get_request,
+    mock_get_latest_request,
+    mock_gwc,
+    latest_request,
+    expected_previous_id,
+    task_passes_state_check,
+):
+    mock_gwc.return_value.cachito_bundle_incremental = True
+    mock_gwc.return_value.cachito_bundle_streaming = False
+    mock_get_request.return_value = {
+        "flags": [],
+        "pkg_managers": ["pip"],
+        "repo": "https://github.com/org/repo.git",
+    }
+    mock_get_latest_request.side_effect = [latest_request]
+    mock_aggregate_data.return_value = mock.Mock(packages=[], all_dependencies=[])
+
+    tasks.process_fetched_sources(42)
+
+    mock_get_latest_request.assert_called_once_with("https://github.com/org/repo.git")
+    mock_create_archive.assert_called_once_with(42, [], expected_previous_id)
+
+
+@mock.patch("cachito.workers.tasks.general.get_worker_config")
+@mock.patch("cachito.workers.tasks.general.get_request")
+@mock.patch("cachito.workers.tasks.general.create_bundle_archive")
+@mock.patch("cachito.workers.tasks.general.aggregate_packages_data")
+@mock.patch("cachito.workers.tasks.general.set_packages_and_deps_counts")
+@mock.patch("cachito.workers.tasks.general.save_bundle_archive_checksum")
+@mock.patch("cachito.workers.tasks.general.save_streamed_bundle_archive_checksum")
+@mock.patch("cachito.workers.tasks.general.hash_file")
+def test_process_fetched_sources_streaming(
+    mock_hash_file,
+    mock_save_streamed_checksum,
+    mock_save_bundle_archive_checksum,
+    mock_set_counts,
+    mock_aggregate_data,
+    mock_create_archive,
+    mock_get_request,
+    mock_gwc,
+    task_passes_state_check,
+):
+    mock_gwc.return_value.cachito_bundle_streaming = True
+    mock_get_request.return_value = {"flags": [], "pkg_managers": ["pip"]}
+    mock_aggregate_data.return_value = mock.Mock(packages=[], all_dependencies=[])
+
+    tasks.process_fetched_sources(42)
+
+    mock_create_archive.assert_not_called()
+    mock_save_bundle_archive_checksum.assert_not_called()
+    mock_save_streamed_checksum.assert_called_once_with(42, [])
+    mock_set_counts.assert_called_once_with(42, 0, 0)
+
+
+@mock.patch("cachito.workers.tasks.general.set_request_state")
+@mock.patch("cachito.workers.paths.get_worker_config")
+def test_save_streamed_bundle_archive_checksum(mock_gwc, mock_set_request_state, tmp_path):
+    mock_gwc.return_value.cachito_bundles_dir = str(tmp_path)
+    bundle_dir = RequestBundleDir(42)
+    bundle_dir.source_root_dir.mkdir()
+    bundle_dir.source_root_dir.joinpath("main.go").write_text("package main")
+
+    tasks.save_streamed_bundle_archive_checksum(42, [])
+
+    expected = BundleArchiveStream(bundle_dir)
+    for _ in expected:
+        pass
+    assert bundle_dir.bundle_archive_checksum.read_text() == expected.hexdigest
+    assert bundle_dir.bundle_archive_streamed.exists()
+    assert not bundle_dir.bundle_archive_file.exists()
+
+
+@pytest.mark.parametrize("previous_exists", (True, False))
+@mock.patch("cachito.workers.tasks.general.set_request_state")
+@mock.patch("cachito.workers.tasks.general.get_worker_config")
+@mock.patch("cachito.workers.paths.get_worker_config")
+def test_create_bundle_archive_incremental(
+    mock_paths_gwc, mock_gwc, mock_set_request_state, previous_exists, tmp_path
+):
+    for gwc in (mock_paths_gwc, mock_gwc):
+        gwc.return_value.cachito_bundles_dir = str(tmp_path)
+    mock_gwc.return_value.cachito_bundle_incremental = True
+
+    dep = os.urandom(64 * 1024)
+
+    def create_request_tree(request_id):
+        bundle_dir = RequestBundleDir(request_id)
+        bundle_dir.source_root_dir.mkdir()
+        bundle_dir.source_root_dir.joinpath("main.go").write_text(f"request {request_id}")
+        bundle_dir.deps_dir.joinpath("dep.tar.gz").write_bytes(dep)
+        return bundle_dir
+
+    if previous_exists:
+        create_request_tree(1)
+        tasks.create_bundle_archive(1, [])
+
+    bundle_dir = create_request_tree(2)
+    tasks.create_bundle_archive(2, [], 1)
+
+    assert bundle_dir.bundle_archive_index.exists()
+    with tarfile.open(bundle_dir.bundle_archive_file, mode="r:gz") as bundle_archive:
+        assert bundle_archive.extractfile("app/main.go").read() == b"request 2"
+        assert bundle_archive.extractfile("deps/dep.tar.gz").read() == dep
+
+
 @mock.patch("cachito.workers.tasks.general.get_request_packages_and_dependencies")
 @mock.patch("cachito.workers.tasks.general.set_request_state")
 @pytest.mark.parametrize("expected_counts,raise_error", [[(1, 2), False], [(2, 3), True]])
@@ -366,6 +551,33 @@ def test_finalize_request_with_error_when_fetching_api(
     mock_set_state.assert_not_called()
 
 
+@pytest.mark.parametrize("actual_checksum,raise_error", [["abc", False], ["def", True]])
+@mock.patch("cachito.workers.tasks.general.get_request_packages_and_dependencies")
+@mock.patch("cachito.workers.tasks.general.get_request_packages_checksum")
+@mock.patch("cachito.workers.tasks.general.set_request_state")
+def test_finalize_request_checksum(
+    mock_set_state,
+    mock_get_checksum,
+    mock_get_request_packages_and_dependencies,
+    task_passes_state_check,
+    actual_checksum,
+    raise_error,
+):
+    request_id = 42
+    mock_get_checksum.return_value = actual_checksum
+    error_message = f"Error checking packages data for request {request_id}."
+
+    with raise_error and pytest.raises(InvalidRequestData, match=error_message) or nullcontext():
+        tasks.finalize_request((1, 2, "abc"), request_id)
+
+    mock_get_checksum.assert_called_once_with(request_id, "abc")
+    mock_get_request_packages_and_dependencies.assert_not_called()
+    if raise_error:
+        mock_set_state.assert_not_called()
+    else:
+        mock_set_state.assert_called_once_with(request_id, "complete", "Completed successfully")
+
+
 @pytest.mark.parametrize("bundle_archive_exists", [True, False])
 @mock.patch("cachito.workers.paths.get_worker_config")
 def test_save_bundle_archive_checksum(get_worker_config, bundle_archive_exists, tmpdir):
@@ -270,15 +270,18 @@ def test_fetch_npm_source_multiple_paths(
     mock_rn.assert_has_calls(
         (
             mock.call(
-                str(mock_rbd().app_subpath("old-client").source_dir), request, skip_deps=set()
+                str(mock_rbd().app_subpath("old-client").source_dir), request, skip_deps=mock.ANY
             ),
             mock.call(
                 str(mock_rbd().app_subpath("new-client/client").source_dir),
                 request,
-                skip_deps={"@angular/animations@8.2.14", "tslib@1.11.1"},
+                skip_deps=mock.ANY,
             ),
         )
     )
+    # The subpaths share the set of the downloaded dependencies
+    first_call, second_call = mock_rn.call_args_list
+    assert first_call.kwargs["skip_deps"] is second_call.kwargs["skip_deps"]
     mock_gnc.assert_has_calls(
         (
             mock.call(mock.ANY, mock.ANY, mock.ANY, custom_ca_path="../registry-ca.pem"),
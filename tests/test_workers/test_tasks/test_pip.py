@@ -127,6 +127,99 @@ def test_fetch_pip_source(
     )
 
 
+@mock.patch("cachito.workers.tasks.utils.get_worker_config")
+@mock.patch("cachito.workers.tasks.pip._get_custom_requirement_config_file")
+@mock.patch("cachito.workers.tasks.pip.resolve_pip")
+@mock.patch("cachito.workers.tasks.pip.finalize_nexus_for_pip_request")
+@mock.patch("cachito.workers.tasks.pip.prepare_nexus_for_pip_request")
+@mock.patch("cachito.workers.tasks.pip.set_request_state")
+@mock.patch("cachito.workers.tasks.pip.get_request")
+@mock.patch("cachito.workers.tasks.pip.update_request_env_vars")
+@mock.patch("cachito.workers.tasks.pip.update_request_with_config_files")
+@mock.patch("cachito.workers.tasks.pip.nexus.get_ca_cert")
+def test_fetch_pip_source_multiple_paths(
+    mock_cert,
+    mock_update_cfg,
+    mock_update_env_vars,
+    mock_get_request,
+    mock_set_state,
+    mock_prepare_nexus,
+    mock_finalize_nexus,
+    mock_resolve,
+    mock_get_config_file,
+    mock_utils_gwc,
+    task_passes_state_check,
+):
+    mock_utils_gwc.return_value.cachito_subpaths_concurrency_limit = 2
+    request = {"id": 1}
+    mock_get_request.return_value = request
+    mock_cert.return_value = None
+    mock_finalize_nexus.return_value = "password"
+
+    def resolve_pip(
+        source_dir,
+        request,
+        requirement_files=None,
+        build_requirement_files=None,
+        raw_component_locks=None,
+    ):
+        name = source_dir.name
+        return {
+            "package": {"name": name, "version": "1", "type": "pip"},
+            "dependencies": [{"name": f"{name}-dep", "version": "2.0", "type": "pip"}],
+            "requirements": [str(source_dir / "requirements.txt")],
+        }
+
+    mock_resolve.side_effect = resolve_pip
+    mock_get_config_file.side_effect = lambda path, *args: {"path": path}
+    package_configs = [
+        {"path": "foo", "requirements_files": ["foo.txt"]},
+        {"path": "bar", "requirements_build_files": ["bar-build.txt"]},
+    ]
+
+    pip.fetch_pip_source(request["id"], package_configs=package_configs)
+
+    mock_get_request.assert_called_once_with(request["id"])
+    bundle_dir = RequestBundleDir(request["id"])
+    mock_resolve.assert_has_calls(
+        [
+            mock.call(
+                bundle_dir.app_subpath("foo").source_dir,
+                request,
+                requirement_files=["foo.txt"],
+                build_requirement_files=None,
+                raw_component_locks={},
+            ),
+            mock.call(
+                bundle_dir.app_subpath("bar").source_dir,
+                request,
+                requirement_files=None,
+                build_requirement_files=["bar-build.txt"],
+                raw_component_locks={},
+            ),
+        ],
+        any_order=True,
+    )
+    # The packages share the locks of the VCS and URL dependencies
+    first_locks, second_locks = (
+        call.kwargs["raw_component_locks"] for call in mock_resolve.call_args_list
+    )
+    assert first_locks is second_locks
+    # The config files are in the order of the package configurations
+    mock_update_cfg.assert_called_once_with(
+        request["id"],
+        [
+            {"path": str(bundle_dir.app_subpath("foo").source_dir / "requirements.txt")},
+            {"path": str(bundle_dir.app_subpath("bar").source_dir / "requirements.txt")},
+        ],
+    )
+    packages = json.loads(bundle_dir.pip_packages_data.read_bytes())["packages"]
+    assert sorted((package["name"], package["path"]) for package in packages) == [
+        ("bar", "bar"),
+        ("foo", "foo"),
+    ]
+
+
 @pytest.mark.parametrize(
     "original, component_name",
     [
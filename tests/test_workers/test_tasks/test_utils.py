@@ -1,4 +1,6 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import threading
+import time
 from pathlib import Path
 from unittest import mock
 
@@ -128,6 +130,49 @@ def test_get_request(mock_get_request_or_fail):
     )
 
 
+@mock.patch("cachito.workers.tasks.utils._get_request_or_fail")
+def test_get_request_packages_checksum(mock_get_request_or_fail):
+    mock_get_request_or_fail.return_value = {"checksum": "abc"}
+
+    assert utils.get_request_packages_checksum(42, "def") == "abc"
+    mock_get_request_or_fail.assert_called_once_with(
+        42,
+        connect_error_msg=(
+            "The connection failed while getting the packages file checksum for request 42: {exc}"
+        ),
+        status_error_msg="Packages file checksum could not be loaded for request 42: {exc}",
+        endpoint="packages/checksum?expected=def",
+    )
+
+
+@pytest.mark.parametrize(
+    "items, expected",
+    [
+        ([{"id": 41, "state": "complete"}], {"id": 41, "state": "complete"}),
+        ([], None),
+    ],
+)
+@mock.patch.object(requests_session, "get")
+def test_get_latest_complete_request(mock_requests_get, items, expected):
+    mock_requests_get.return_value.json.return_value = {"items": items}
+
+    assert utils.get_latest_complete_request("https://github.com/org/repo.git") == expected
+    mock_requests_get.assert_called_once_with(
+        "http://cachito.domain.local/api/v1/requests",
+        params={"repo": "https://github.com/org/repo.git", "state": "complete", "per_page": 1},
+        timeout=60,
+    )
+
+
+@mock.patch.object(requests_session, "get")
+def test_get_latest_complete_request_failed(mock_requests_get):
+    mock_requests_get.side_effect = requests.ConnectionError("Connection refused")
+
+    expected = "Failed to get the latest complete request for https://github.com/org/repo.git"
+    with pytest.raises(NetworkError, match=expected):
+        utils.get_latest_complete_request("https://github.com/org/repo.git")
+
+
 @pytest.mark.parametrize("id, state", [(2, "stale"), (3, "complete"), (1, "in-progress")])
 @mock.patch("cachito.workers.tasks.utils._get_request_or_fail")
 def test_get_request_state(mock_get_request_or_fail, id, state):
@@ -312,3 +357,47 @@ def test_runs_if_request_in_progress(mock_get_state, id, state):
     else:
         assert dummy_task(id) is None
     mock_get_state.assert_called_once_with(id)
+
+
+@pytest.mark.parametrize("concurrency_limit", [1, 2, 10])
+@mock.patch("cachito.workers.tasks.utils.get_worker_config")
+def test_map_subpaths(mock_gwc, concurrency_limit):
+    mock_gwc.return_value.cachito_subpaths_concurrency_limit = concurrency_limit
+    subpaths = [f"path{i}" for i in range(6)]
+
+    assert utils.map_subpaths(lambda subpath: subpath.upper(), subpaths) == [
+        subpath.upper() for subpath in subpaths
+    ]
+
+
+@mock.patch("cachito.workers.tasks.utils.get_worker_config")
+def test_map_subpaths_concurrently(mock_gwc):
+    mock_gwc.return_value.cachito_subpaths_concurrency_limit = 2
+    # Only passed if both subpaths are processed at the same time
+    barrier = threading.Barrier(2, timeout=10)
+
+    def func(subpath):
+        barrier.wait()
+        return subpath
+
+    assert utils.map_subpaths(func, ["foo", "bar"]) == ["foo", "bar"]
+
+
+@pytest.mark.parametrize("concurrency_limit", [1, 2])
+@mock.patch("cachito.workers.tasks.utils.get_worker_config")
+def test_map_subpaths_failure(mock_gwc, concurrency_limit):
+    mock_gwc.return_value.cachito_subpaths_concurrency_limit = concurrency_limit
+    processed = []
+
+    def func(subpath):
+        if subpath == "bad":
+            raise ValidationError("bad subpath")
+        time.sleep(0.01)
+        processed.append(subpath)
+        return subpath
+
+    with pytest.raises(ValidationError, match="bad subpath"):
+        utils.map_subpaths(func, ["bad"] + [f"path{i}" for i in range(20)])
+
+    # The subpaths not started yet are skipped
+    assert len(processed) < 20
@@ -244,15 +244,18 @@ def test_fetch_yarn(
             mock.call(1, "in_progress", "Finalizing the Nexus configuration for yarn"),
         ]
     )
-    mock_get_request.assert_has_calls(mock.call(1) for _ in range(2))
+    mock_get_request.assert_called_once_with(1)
     mock_get_yarn_repo_name.assert_called_once_with(1)
     mock_prepare_nexus.assert_called_once_with(mock_get_yarn_repo_name.return_value)
     mock_resolve_yarn.assert_has_calls(
         [
-            mock.call(str(root), mock_get_request.return_value, skip_deps=set()),
-            mock.call(str(sub), mock_get_request.return_value, skip_deps=rv1["downloaded_deps"]),
+            mock.call(str(root), mock_get_request.return_value, skip_deps=mock.ANY),
+            mock.call(str(sub), mock_get_request.return_value, skip_deps=mock.ANY),
         ]
     )
+    # The subpaths share the set of the downloaded dependencies
+    first_call, second_call = mock_resolve_yarn.call_args_list
+    assert first_call.kwargs["skip_deps"] is second_call.kwargs["skip_deps"]
     mock_worker_config.assert_called_once()
     mock_update_env_vars.assert_called_once_with(1, {"A": "1", "B": "3", "C": "4"})
     mock_get_yarn_username.assert_called_once_with(1)